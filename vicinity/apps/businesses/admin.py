@@ -1,34 +1,47 @@
 from django.contrib import admin
+from apps.common.admin import LargeTableAdmin, LimitedInlineFormSet, TypeaheadFilter
 from .models import Business, BusinessImage
 
 # Register your models here.
 
 class BusinessImageInline(admin.TabularInline):
+    """The latest images of a business; older ones are left out of the form."""
     model = BusinessImage
+    formset = LimitedInlineFormSet
     extra = 1
 
+
+class CityFilter(TypeaheadFilter):
+    title = 'city'
+    parameter_name = 'city'
+    field_name = 'city'
+
+
 @admin.register(Business)
-class BusinessAdmin(admin.ModelAdmin):
+class BusinessAdmin(LargeTableAdmin):
     list_display = ('name', 'category', 'city', 'owner', 'is_verified', 'average_rating')
-    list_filter = ('category', 'city', 'is_verified', 'is_active')
+    list_filter = ('category', CityFilter, 'is_verified', 'is_active')
+    list_select_related = ('owner',)
+    autocomplete_fields = ('owner',)
     search_fields = ('name', 'description', 'address', 'city')
-    readonly_fields = ('created_at', 'updated_at', 'average_rating', 'review_count')
+    readonly_fields = ('created_at', 'updated_at', 'average_rating', 'review_count', 'rating_sum')
 
     fieldsets = (
         ('Basic Information', {
             'fields': ('name', 'owner', 'category', 'description')
         }),
         ('Contact & Location', {
-            'fields': ('email', 'phone', 'website', 'address', 'city', 'state', 'zip_code')
+            'fields': ('email', 'phone', 'website', 'address', 'city', 'state', 'zip_code',
+                       'latitude', 'longitude')
         }),
         ('Business Details', {
-            'fields': ('hours_of_operation', 'logo')
+            'fields': ('hours_of_operation', 'timezone', 'logo')
         }),
         ('Status', {
             'fields': ('is_verified', 'is_active')
         }),
         ('Metrics', {
-            'fields': ('average_rating', 'review_count')
+            'fields': ('average_rating', 'review_count', 'rating_sum')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -0,0 +1,371 @@
+import bisect
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import Collate, Lower
+from .models import Business
+
+logger = logging.getLogger(__name__)
+
+# most suggestions of each kind a request may ask for
+MAX_LIMIT = 20
+
+# prefixes matching more keys than this have their top keys memoized
+SCAN_LIMIT = 256
+
+# past this many changed businesses, the index is rebuilt rather than patched
+MAX_PATCH = 1000
+
+# numbers the changes shared by every process, each stored under its number
+CHANGES_KEY = 'vicinity:autocomplete:changes'
+CHANGE_KEY_PREFIX = 'vicinity:autocomplete:change:'
+
+
+def normalize(text):
+    """Key of a name or city, as LOWER() in the database."""
+    return text.lower()
+
+
+class PrefixIndex:
+    """
+    Keys in a sorted array, searched with bisect for the top ranked keys
+    starting with a prefix.
+
+    Entries are (key, id) pairs with a rank and a value each. Ranges
+    larger than SCAN_LIMIT entries, which only short prefixes match,
+    keep their top MAX_LIMIT entries memoized until an entry under the
+    prefix changes.
+    """
+
+    def __init__(self, entries=()):
+        # entries as (key, id, rank, value)
+        self.keys = sorted((key, id) for key, id, _, _ in entries)
+        self.ranks = {(key, id): rank for key, id, rank, _ in entries}
+        self.values = {(key, id): value for key, id, _, value in entries}
+        self.top = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, key, id, default=None):
+        return self.values.get((key, id), default)
+
+    def set(self, key, id, rank, value):
+        entry = (key, id)
+        if entry not in self.ranks:
+            bisect.insort(self.keys, entry)
+        self.ranks[entry] = rank
+        self.values[entry] = value
+        self.forget(key)
+
+    def remove(self, key, id):
+        entry = (key, id)
+        if entry not in self.ranks:
+            return
+        del self.keys[bisect.bisect_left(self.keys, entry)]
+        del self.ranks[entry]
+        del self.values[entry]
+        self.forget(key)
+
+    def forget(self, key):
+        for length in range(len(key) + 1):
+            self.top.pop(key[:length], None)
+
+    def search(self, prefix, limit):
+        """Values of the `limit` best ranked keys starting with `prefix`."""
+        entries = self.top.get(prefix)
+        if entries is None:
+            start = bisect.bisect_left(self.keys, (prefix,))
+            # past every key starting with the prefix
+            end = bisect.bisect_left(self.keys, (prefix + '\U0010ffff',), start)
+            # ties in key order, as nlargest is stable
+            entries = heapq.nlargest(
+                MAX_LIMIT, self.keys[start:end], key=self.ranks.__getitem__
+            )
+            if end - start > SCAN_LIMIT:
+                self.top[prefix] = entries
+        return [self.values[entry] for entry in entries[:limit]]
+
+
+class AutocompleteIndex:
+    """
+    In-process prefix index of the names and cities of the public
+    businesses, ranked by review count.
+
+    A background thread of each process, started by the first lookup,
+    builds the index and swaps it in once ready; lookups made until
+    then return None, for the caller to use the database. The thread
+    then patches in the businesses logged as changed by any process
+    (see `changed`) every AUTOCOMPLETE_REFRESH_SECONDS, or as soon as
+    this process logs one, and rebuilds the index every
+    AUTOCOMPLETE_REBUILD_SECONDS. Lookups never query the database.
+    """
+
+    def __init__(self):
+        # guards the structures below, held briefly
+        self.lock = threading.Lock()
+        # held while building or patching the index
+        self.refreshing = threading.Lock()
+        # set to have the background thread refresh the index now
+        self.wake = threading.Event()
+        self.thread = None
+        self.stopping = False
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.names = self.cities = None
+            self.businesses = {}
+            self.city_spellings = {}
+            self.built_at = None
+            # number of the last change patched in
+            self.position = None
+
+    def suggest(self, prefix, limit):
+        """{'businesses': [...], 'cities': [...]} for `prefix`, or None."""
+        with self.lock:
+            if self.names is None:
+                return None
+            return {
+                'businesses': self.names.search(prefix, limit),
+                'cities': [
+                    {'city': min(self.city_spellings[city]), **totals}
+                    for city, totals in self.cities.search(prefix, limit)
+                ],
+            }
+
+    def start(self):
+        """
+        Start the background thread refreshing the index, unless it runs
+        already or AUTOCOMPLETE_REFRESH_SECONDS is 0.
+        """
+        if not settings.AUTOCOMPLETE_REFRESH_SECONDS:
+            return
+        with self.lock:
+            # threads don't survive a fork, so workers start their own
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stopping = False
+            self.thread = threading.Thread(target=self.run, name='autocomplete', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the background thread and wait for it to exit."""
+        thread = self.thread
+        if thread is None:
+            return
+        self.stopping = True
+        self.wake.set()
+        thread.join()
+
+    def run(self):
+        while not self.stopping:
+            # the thread holds its own connection between refreshes
+            close_old_connections()
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Refreshing the autocomplete index failed.")
+            finally:
+                close_old_connections()
+            self.wake.wait(settings.AUTOCOMPLETE_REFRESH_SECONDS)
+            self.wake.clear()
+
+    def is_old(self):
+        return time.monotonic() - self.built_at > settings.AUTOCOMPLETE_REBUILD_SECONDS
+
+    def refresh(self):
+        """Build the index, or patch in the businesses changed since it was."""
+        with self.refreshing:
+            if self.built_at is None or self.is_old():
+                self.build()
+                return
+
+            position, changed = read_changes(self.position)
+            if changed is None:
+                self.build()
+                return
+            if changed:
+                rows = {row['id']: row for row in _rows(Business.public.filter(pk__in=changed))}
+                with self.lock:
+                    for business_id in changed:
+                        self.patch(business_id, rows.get(business_id))
+            self.position = position
+
+    def build(self):
+        built_at = time.monotonic()
+        # changes logged while the rows are read are patched in again next time
+        position = last_change()
+        businesses, city_spellings, cities = {}, {}, {}
+        for row in _rows(Business.public.all()):
+            businesses[row['id']] = row
+            city = normalize(row['city'])
+            city_spellings.setdefault(city, Counter())[row['city']] += 1
+            totals = cities.setdefault(city, {'businesses': 0, 'review_count': 0})
+            totals['businesses'] += 1
+            totals['review_count'] += row['review_count']
+
+        names = PrefixIndex([
+            (normalize(row['name']), row['id'], row['review_count'], row)
+            for row in businesses.values()
+        ])
+        cities = PrefixIndex([
+            (city, city, totals['review_count'], (city, totals))
+            for city, totals in cities.items()
+        ])
+        with self.lock:
+            self.names, self.cities = names, cities
+            self.businesses, self.city_spellings = businesses, city_spellings
+            self.built_at = built_at
+            self.position = position
+
+    def patch(self, business_id, row):
+        """Replace the entries of a business by those of `row`, None to remove them."""
+        old = self.businesses.pop(business_id, None)
+        if old is not None:
+            self.names.remove(normalize(old['name']), business_id)
+            self.move_city(old, -1)
+        if row is not None:
+            self.businesses[business_id] = row
+            self.names.set(normalize(row['name']), business_id, row['review_count'], row)
+            self.move_city(row, 1)
+
+    def move_city(self, row, sign):
+        """Add a business to its city's totals, or take it out with `sign` -1."""
+        city = normalize(row['city'])
+        spellings = self.city_spellings.setdefault(city, Counter())
+        spellings[row['city']] += sign
+        if spellings[row['city']] <= 0:
+            del spellings[row['city']]
+
+        _, totals = self.cities.get(city, city, (city, {'businesses': 0, 'review_count': 0}))
+        totals = {
+            'businesses': totals['businesses'] + sign,
+            'review_count': totals['review_count'] + sign * row['review_count'],
+        }
+        if totals['businesses'] > 0:
+            self.cities.set(city, city, totals['review_count'], (city, totals))
+        else:
+            del self.city_spellings[city]
+            self.cities.remove(city, city)
+
+    def changed(self, business_id):
+        """
+        Log a business as changed for the index of every process, once
+        the current transaction commits.
+        """
+        transaction.on_commit(lambda: self.mark_changed(business_id))
+
+    def mark_changed(self, business_id):
+        log_change(business_id)
+        self.wake.set()
+
+
+def last_change():
+    """Number of the last change logged by any process."""
+    # evicted counters restart from the clock, past every number handed out
+    cache.add(CHANGES_KEY, time.time_ns(), None)
+    return cache.get(CHANGES_KEY)
+
+
+def log_change(business_id):
+    """Log a business as changed, for the index of every process to patch in."""
+    try:
+        number = cache.incr(CHANGES_KEY)
+    except ValueError:
+        last_change()
+        number = cache.incr(CHANGES_KEY)
+    # kept until every index has been rebuilt since
+    cache.set(f'{CHANGE_KEY_PREFIX}{number}', business_id, settings.AUTOCOMPLETE_REBUILD_SECONDS)
+
+
+def read_changes(position):
+    """
+    Number of the last change and the ids of the businesses changed
+    after change `position`, or None in place of the ids when some of
+    these changes are gone or there are more than MAX_PATCH of them.
+    """
+    last = last_change()
+    if last - position > MAX_PATCH:
+        return last, None
+    keys = [f'{CHANGE_KEY_PREFIX}{number}' for number in range(position + 1, last + 1)]
+    changes = cache.get_many(keys)
+    # missing too are changes numbered but not yet stored by their process
+    if len(changes) < len(keys):
+        return last, None
+    return last, set(changes.values())
+
+
+index = AutocompleteIndex()
+
+
+def suggest(prefix, limit):
+    """
+    The `limit` best businesses and cities by review count whose name,
+    respectively city, starts with `prefix`, case insensitively.
+    """
+    prefix = normalize(prefix.lstrip())
+    if not prefix:
+        return {'businesses': [], 'cities': []}
+    if settings.AUTOCOMPLETE_IN_PROCESS:
+        index.start()
+        suggestions = index.suggest(prefix, limit)
+        if suggestions is not None:
+            return suggestions
+    return suggest_from_database(prefix, limit)
+
+
+async def asuggest(prefix, limit):
+    """Async version of `suggest`, staying on the event loop once the index is built."""
+    if prefix.strip() and settings.AUTOCOMPLETE_IN_PROCESS:
+        index.start()
+        suggestions = index.suggest(normalize(prefix.lstrip()), limit)
+        if suggestions is not None:
+            return suggestions
+    return await sync_to_async(suggest)(prefix, limit)
+
+
+def suggest_from_database(prefix, limit):
+    """
+    `suggest` read through the text_pattern_ops indexes on LOWER(name)
+    and LOWER(city), for a normalized `prefix`.
+    """
+    # ties in byte order, as the keys of the in-process index
+    businesses = (
+        Business.public.alias(key=Lower('name'))
+        .filter(key__startswith=prefix)
+        .order_by('-review_count', Collate('key', 'C'), 'id')
+    )
+    cities = (
+        Business.public.annotate(key=Lower('city'))
+        .filter(key__startswith=prefix)
+        .values('key')
+        .annotate(
+            spelling=Min(Collate('city', 'C')),
+            total_businesses=Count('pk'),
+            total_reviews=Sum('review_count'),
+        )
+        .order_by('-total_reviews', Collate('key', 'C'))
+    )
+    return {
+        'businesses': list(_rows(businesses[:limit])),
+        'cities': [
+            {
+                'city': row['spelling'],
+                'businesses': row['total_businesses'],
+                'review_count': row['total_reviews'],
+            }
+            for row in cities[:limit]
+        ],
+    }
+
+
+def _rows(queryset):
+    return queryset.values('id', 'name', 'city', 'review_count')
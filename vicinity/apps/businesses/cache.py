@@ -0,0 +1,45 @@
+from apps.common.cache import bump_generations_on_commit
+from . import autocomplete
+from .cards import invalidate_business_cards
+
+# generation shared by every business list response, bumped by changes
+# to what lists filter, search or sort on; the businesses a cached list
+# shows are checked against their own generations (see
+# BusinessViewSet.get_embedded_generations)
+BUSINESS_LIST_GENERATION = 'businesses'
+
+# generation of the lists sorted on the rating counters, which every
+# review write moves
+BUSINESS_RATING_LIST_GENERATION = 'businesses:ratings'
+RATING_ORDERING_FIELDS = frozenset({'average_rating', 'review_count'})
+
+
+def business_generation(business_id):
+    """Name of the generation covering responses about one business."""
+    return f'business:{business_id}'
+
+
+def invalidate_business(business_id, listed=False):
+    """
+    Drop cached responses and the card that include the given business,
+    and refresh its autocomplete entries. `listed` drops every cached
+    list too, for changes to what lists filter, search or sort on.
+    """
+    invalidate_businesses([business_id], listed)
+
+
+def invalidate_businesses(business_ids, listed=False):
+    """`invalidate_business` for many businesses at once."""
+    generations = [business_generation(business_id) for business_id in business_ids]
+    if listed:
+        generations.append(BUSINESS_LIST_GENERATION)
+    bump_generations_on_commit(*generations)
+    invalidate_business_cards(business_ids)
+    for business_id in business_ids:
+        autocomplete.index.changed(business_id)
+
+
+def invalidate_business_rating(business_id):
+    """`invalidate_business` for a change to the rating counters of a business."""
+    bump_generations_on_commit(BUSINESS_RATING_LIST_GENERATION)
+    invalidate_business(business_id)
@@ -0,0 +1,78 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from .models import Business, BusinessImage
+
+CARD_KEY_PREFIX = 'vicinity:business-card:'
+CARD_TIMEOUT = 60 * 60 * 24
+
+# Business fields copied into a card as they are
+CARD_FIELDS = ('id', 'name', 'city', 'category', 'average_rating', 'review_count')
+
+
+def card_key(business_id):
+    return f'{CARD_KEY_PREFIX}{business_id}'
+
+
+def build_business_cards(business_ids):
+    """
+    Build the compact card of each business in one query, reading the
+    primary image through the denormalized Business.primary_image.
+    """
+    storage = BusinessImage._meta.get_field('image').storage
+    rows = Business.objects.filter(pk__in=business_ids).order_by().values(
+        *CARD_FIELDS, primary_image_name=F('primary_image__image'),
+    )
+    cards = {}
+    for row in rows:
+        row['average_rating'] = str(row['average_rating'])
+        name = row.pop('primary_image_name')
+        row['primary_image'] = storage.url(name) if name else None
+        cards[row['id']] = row
+    return cards
+
+
+def get_business_cards(business_ids):
+    """
+    Return {business_id: card} for the given businesses, reading cached
+    cards and building only the missing ones.
+    """
+    keys = {business_id: card_key(business_id) for business_id in business_ids}
+    cached = cache.get_many(keys.values())
+    cards = {
+        business_id: cached[key]
+        for business_id, key in keys.items() if key in cached
+    }
+
+    missing = [business_id for business_id in keys if business_id not in cards]
+    if missing:
+        built = build_business_cards(missing)
+        cache.set_many({card_key(business_id): card for business_id, card in built.items()}, CARD_TIMEOUT)
+        cards.update(built)
+    return cards
+
+
+async def aget_business_cards(business_ids):
+    """Async version of `get_business_cards`."""
+    keys = {business_id: card_key(business_id) for business_id in business_ids}
+    cached = await cache.aget_many(keys.values())
+    cards = {
+        business_id: cached[key]
+        for business_id, key in keys.items() if key in cached
+    }
+
+    missing = [business_id for business_id in keys if business_id not in cards]
+    if missing:
+        built = await sync_to_async(build_business_cards)(missing)
+        await cache.aset_many(
+            {card_key(business_id): card for business_id, card in built.items()}, CARD_TIMEOUT
+        )
+        cards.update(built)
+    return cards
+
+
+def invalidate_business_cards(business_ids):
+    """Drop the cached cards of the given businesses once the current transaction commits."""
+    keys = [card_key(business_id) for business_id in business_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,65 @@
+import math
+from django.db.models import F, FloatField, Func, Sum, Value
+from django.db.models.functions import Ln, Power
+
+# Bayesian average: every business starts with PRIOR_WEIGHT ratings of PRIOR_RATING
+PRIOR_RATING = 3.5
+PRIOR_WEIGHT = 5
+
+# a review's weight halves every HALF_LIFE_DAYS, and each doubling of one
+# plus the decayed review volume is worth VOLUME_WEIGHT stars
+HALF_LIFE_DAYS = 90
+VOLUME_WEIGHT = 0.25
+
+# stars taken off per kilometer from the caller, when coordinates are given
+DISTANCE_WEIGHT = 0.05
+
+# Business.review_volume is the sum of the review weights decayed to the
+# row's volume_at, which every rating delta moves to the time of the write
+# and the rebuild_rating_counters command moves to now for every row.
+# Weights are at most 1, so a volume stays within its review count and a
+# score is a rating in stars, stale by at most the decay since volume_at.
+
+_HALF_LIFE_SECONDS = HALF_LIFE_DAYS * 24 * 60 * 60
+
+
+class EpochSeconds(Func):
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+    output_field = FloatField()
+
+
+def review_weight(created_at, now):
+    """Weight at `now` of a review written at `created_at`."""
+    return 2 ** ((created_at - now).total_seconds() / _HALF_LIFE_SECONDS)
+
+
+def review_volume(created_at, now):
+    """Aggregate of the weights at `now` of the review timestamps in `created_at`."""
+    half_lives = (EpochSeconds(created_at) - now.timestamp()) / _HALF_LIFE_SECONDS
+    return Sum(Power(Value(2.0), half_lives))
+
+
+def decayed_volume(volume, volume_at, now):
+    """Expression of a review volume as of `volume_at`, decayed to `now`."""
+    half_lives = (EpochSeconds(volume_at) - now.timestamp()) / _HALF_LIFE_SECONDS
+    return volume * Power(Value(2.0), half_lives)
+
+
+def discovery_score(rating_sum, review_count, volume):
+    """
+    Score expression for the given rating counters and review volume:
+    the Bayesian average rating plus VOLUME_WEIGHT times log2(1 + volume).
+    A business with one fresh review gets 0.25 stars for it, with fifteen
+    fresh reviews 1 star.
+    """
+    bayesian_rating = (
+        (rating_sum + Value(PRIOR_RATING * PRIOR_WEIGHT)) * 1.0 /
+        (review_count + Value(PRIOR_WEIGHT))
+    )
+    doublings = Ln(volume + Value(1.0)) / math.log(2)
+    return bayesian_rating + doublings * VOLUME_WEIGHT
+
+
+def discovery_rank(distance):
+    """Per-request rank of a nearby business: its score less a distance penalty."""
+    return F('discovery_score') - distance * DISTANCE_WEIGHT
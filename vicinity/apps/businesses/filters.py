@@ -0,0 +1,72 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db.models import DateTimeField, Exists, F, FloatField, OuterRef, Q, Value
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+from django_filters import rest_framework as django_filters
+from rest_framework import filters
+from .hours import LocalMinuteOfWeek
+from .models import Business, BusinessHours
+from .search import SEARCH_CONFIG
+
+
+def is_open_at(moment):
+    """
+    Condition matching the businesses open at `moment`, evaluated in SQL
+    against BusinessHours in each business's own time zone.
+    """
+    local_minute = LocalMinuteOfWeek(Value(moment, output_field=DateTimeField()), OuterRef('timezone'))
+    return Exists(BusinessHours.objects.filter(
+        business=OuterRef('pk'),
+        start_minute__lte=local_minute,
+        end_minute__gt=local_minute,
+    ))
+
+
+class BusinessFilterSet(django_filters.FilterSet):
+    """
+    Field filters of the business list, plus ?open_now=true|false and
+    ?open_at=<ISO 8601 datetime>.
+    """
+    open_now = django_filters.BooleanFilter(method='filter_open_now')
+    open_at = django_filters.IsoDateTimeFilter(method='filter_open_at')
+
+    class Meta:
+        model = Business
+        fields = ['category', 'city', 'state', 'is_verified']
+
+    def filter_open_now(self, queryset, name, value):
+        condition = is_open_at(timezone.now())
+        return queryset.filter(condition if value else ~condition)
+
+    def filter_open_at(self, queryset, name, value):
+        return queryset.filter(is_open_at(value))
+
+
+class BusinessSearchFilter(filters.SearchFilter):
+    """
+    Full-text search over the stored Business.search_vector, with trigram
+    matching on the name to tolerate typos.
+
+    Results are ordered by relevance unless the client asked for an
+    explicit ordering, so this backend should run after OrderingFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+
+        text = ' '.join(search_terms)
+        query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+        # as double precision, for cursors to hold the exact values, and
+        # never NULL, which keyset pagination can't seek past
+        queryset = queryset.annotate(
+            rank=Coalesce(Cast(SearchRank(F('search_vector'), query), FloatField()), 0.0),
+            similarity=Cast(TrigramSimilarity('name', text), FloatField()),
+        ).filter(
+            Q(search_vector=query) | Q(name__trigram_similar=text)
+        )
+
+        if filters.OrderingFilter.ordering_param not in request.query_params:
+            queryset = queryset.order_by('-rank', '-similarity', '-pk')
+        return queryset
@@ -0,0 +1,77 @@
+import math
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Least, Power, Radians, Sin, Sqrt
+
+# Mean radius of the earth in kilometers
+EARTH_RADIUS_KM = 6371.0
+
+
+def bounding_box(latitude, longitude, radius):
+    """
+    Return the (min_lat, max_lat, min_lng, max_lng) box enclosing a circle
+    of `radius` kilometers around the given point.
+
+    Longitudes may fall outside [-180, 180] when the box crosses the
+    antimeridian; `bounding_box_filter` takes care of wrapping them.
+    """
+    latitude = float(latitude)
+    longitude = float(longitude)
+    delta_lat = math.degrees(radius / EARTH_RADIUS_KM)
+    min_lat = latitude - delta_lat
+    max_lat = latitude + delta_lat
+
+    # near the poles the box covers every longitude
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+
+    delta_lng = math.degrees(
+        math.asin(math.sin(radius / EARTH_RADIUS_KM) / math.cos(math.radians(latitude)))
+    )
+    return min_lat, max_lat, longitude - delta_lng, longitude + delta_lng
+
+
+def bounding_box_filter(latitude, longitude, radius):
+    """
+    Build a Q object that restricts rows to the bounding box of the circle,
+    so the (latitude, longitude) index can be used before any trigonometry.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius)
+    query = Q(latitude__gte=min_lat, latitude__lte=max_lat)
+
+    if min_lng < -180:
+        return query & (Q(longitude__gte=min_lng + 360) | Q(longitude__lte=max_lng))
+    if max_lng > 180:
+        return query & (Q(longitude__gte=min_lng) | Q(longitude__lte=max_lng - 360))
+    return query & Q(longitude__gte=min_lng, longitude__lte=max_lng)
+
+
+def distance_expression(latitude, longitude):
+    """
+    Haversine great-circle distance in kilometers between each row's
+    coordinates and the given point, as a database expression.
+    """
+    lat = Radians(Cast(F('latitude'), FloatField()))
+    lng = Radians(Cast(F('longitude'), FloatField()))
+    origin_lat = Value(math.radians(float(latitude)), output_field=FloatField())
+    origin_lng = Value(math.radians(float(longitude)), output_field=FloatField())
+
+    a = (
+        Power(Sin((lat - origin_lat) / 2), 2) +
+        Cos(origin_lat) * Cos(lat) * Power(Sin((lng - origin_lng) / 2), 2)
+    )
+    # clamp rounding noise so asin stays inside its domain
+    return 2 * EARTH_RADIUS_KM * ASin(Least(Sqrt(a), Value(1.0)))
+
+
+def within_radius(queryset, latitude, longitude, radius):
+    """
+    Restrict `queryset` to rows within `radius` kilometers of the point,
+    annotated with `distance` and ordered nearest first.
+    """
+    return queryset.filter(
+        bounding_box_filter(latitude, longitude, radius)
+    ).annotate(
+        distance=distance_expression(latitude, longitude)
+    ).filter(
+        distance__lte=radius
+    ).order_by('distance', 'id')
@@ -0,0 +1,95 @@
+import re
+import zoneinfo
+from django.core.exceptions import ValidationError
+from django.db.models import Func, IntegerField
+
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+TIME_PATTERN = re.compile(r'^(?:([01]\d|2[0-3]):([0-5]\d)|24:00)$')
+
+
+def _minutes(value):
+    match = TIME_PATTERN.match(value) if isinstance(value, str) else None
+    if match is None:
+        raise ValidationError(f'{value!r} is not a time in HH:MM format.')
+    if value == '24:00':
+        return MINUTES_PER_DAY
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+def weekly_intervals(hours):
+    """
+    Validate opening hours and return them as sorted, merged
+    [start, end) minute-of-week intervals, Monday 00:00 being minute 0.
+
+    Hours map lowercase day names to lists of {"open": "HH:MM",
+    "close": "HH:MM"} periods, in the business's local time. A period
+    closing before it opens runs past midnight into the next day, and
+    "24:00" closes at the end of the day. Days that are missing or have
+    no periods are closed.
+    """
+    if not isinstance(hours, dict):
+        raise ValidationError('Opening hours must be an object keyed by day.')
+
+    intervals = []
+    for day, periods in hours.items():
+        if day not in DAYS:
+            raise ValidationError(f'{day!r} is not a day, use one of {", ".join(DAYS)}.')
+        if not isinstance(periods, list):
+            raise ValidationError(f'Opening hours of {day} must be a list of periods.')
+
+        day_start = DAYS.index(day) * MINUTES_PER_DAY
+        for period in periods:
+            if not isinstance(period, dict) or set(period) != {'open', 'close'}:
+                raise ValidationError(f'Periods of {day} must have exactly "open" and "close".')
+            opens, closes = _minutes(period['open']), _minutes(period['close'])
+            if opens == closes or opens == MINUTES_PER_DAY:
+                raise ValidationError(f'{period["open"]}-{period["close"]} on {day} is not a period.')
+            if closes < opens:
+                closes += MINUTES_PER_DAY
+
+            start, end = day_start + opens, day_start + closes
+            # Sunday night periods wrap around to Monday morning
+            if end > MINUTES_PER_WEEK:
+                intervals.append((0, end - MINUTES_PER_WEEK))
+                end = MINUTES_PER_WEEK
+            intervals.append((start, end))
+
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def validate_hours(value):
+    weekly_intervals(value)
+
+
+def validate_timezone(value):
+    try:
+        zoneinfo.ZoneInfo(value)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f'{value!r} is not a known time zone.')
+
+
+class LocalMinuteOfWeek(Func):
+    """
+    Minute of the week, Monday 00:00 being 0, of a timestamp in the time
+    zone named by the second expression (usually the business timezone).
+    """
+    arity = 2
+    output_field = IntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        (moment, moment_params), (zone, zone_params) = (
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        )
+        local = f'({moment} AT TIME ZONE {zone})'
+        sql = f"FLOOR(EXTRACT(EPOCH FROM {local} - date_trunc('week', {local})) / 60)::integer"
+        return sql, (*moment_params, *zone_params) * 2
@@ -0,0 +1,89 @@
+from django.core.management.base import CommandError
+from apps.accounts.models import User
+from apps.businesses.cache import invalidate_businesses
+from apps.businesses.models import Business, BusinessHours, BusinessRatingStats
+from apps.businesses.search import business_search_vector
+from apps.businesses.serializers import BusinessImportSerializer
+from apps.common.importing import ImportCommand
+
+# columns a re-imported business takes from its row, when the row has them
+UPDATE_FIELDS = [
+    'name', 'owner', 'category', 'description', 'email', 'phone', 'website',
+    'address', 'city', 'state', 'zip_code', 'latitude', 'longitude',
+    'hours_of_operation', 'timezone', 'is_verified', 'is_active',
+]
+
+
+class Command(ImportCommand):
+    help = (
+        "Import businesses from a CSV or NDJSON file, keyed on external_id: "
+        "new ids are inserted and known ones updated in place."
+    )
+    json_fields = ('hours_of_operation',)
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--owner', help="Username owning the rows without an owner column.")
+
+    def handle(self, *args, **options):
+        self.default_owner = None
+        if options['owner']:
+            self.default_owner = User.objects.filter(username=options['owner']).values_list(
+                'pk', flat=True
+            ).first()
+            if self.default_owner is None:
+                raise CommandError(f"No user named {options['owner']!r}.")
+        super().handle(*args, **options)
+
+    def validate_batch(self, batch):
+        valid, errors = self.validate_rows(BusinessImportSerializer(), batch)
+
+        owner_ids = {data['owner'] for data in valid.values() if 'owner' in data}
+        known_owners = set(User.objects.filter(pk__in=owner_ids).values_list('pk', flat=True))
+
+        items = {}
+        for number, data in valid.items():
+            # an update only takes the columns of the row, not the model
+            # defaults of the others
+            given = tuple(field for field in UPDATE_FIELDS if field in data)
+            owner = data.pop('owner', self.default_owner)
+            if owner is None:
+                errors[number] = {'owner': ["This field is required without --owner."]}
+            elif owner not in known_owners and owner != self.default_owner:
+                errors[number] = {'owner': [f"No user with id {owner}."]}
+            else:
+                # a later row for the same business supersedes earlier ones
+                items.pop(data['external_id'], None)
+                items[data['external_id']] = (number, (given, dict(data, owner_id=owner)))
+        return list(items.values()), errors
+
+    def save_batch(self, items):
+        # one upsert per set of given columns
+        groups = {}
+        for given, item in items:
+            groups.setdefault(given, []).append(item)
+        businesses, rehoured = [], []
+        for given, group in groups.items():
+            upserted = Business.objects.bulk_create(
+                [Business(**item) for item in group],
+                update_conflicts=True,
+                unique_fields=['external_id'],
+                update_fields=[*given, 'updated_at'],
+            )
+            businesses.extend(upserted)
+            # new businesses without hours have no intervals to build
+            if 'hours_of_operation' in given:
+                rehoured.extend(upserted)
+        business_ids = [business.pk for business in businesses]
+
+        # bulk_create skips Business.save(), which maintains these
+        Business.objects.filter(pk__in=business_ids).update(search_vector=business_search_vector())
+        BusinessHours.objects.filter(business__in=rehoured).delete()
+        BusinessHours.objects.bulk_create([
+            interval for business in rehoured for interval in BusinessHours.for_business(business)
+        ])
+        BusinessRatingStats.objects.bulk_create(
+            [BusinessRatingStats(business_id=business_id) for business_id in business_ids],
+            ignore_conflicts=True,
+        )
+        invalidate_businesses(business_ids, listed=True)
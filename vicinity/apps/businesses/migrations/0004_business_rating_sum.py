@@ -0,0 +1,45 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:27
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+
+
+def populate_rating_counters(apps, schema_editor):
+    # counters from before rating_sum may have drifted; the deltas need them exact
+    Business = apps.get_model('businesses', 'Business')
+    Review = apps.get_model('reviews', 'Review')
+
+    published = Review.objects.filter(
+        business=OuterRef('pk'),
+        is_published=True,
+    ).order_by().values('business')
+    Business.objects.update(
+        rating_sum=Coalesce(Subquery(published.annotate(total=Sum('rating')).values('total')), 0),
+        review_count=Coalesce(Subquery(published.annotate(total=Count('pk')).values('total')), 0),
+        average_rating=Coalesce(
+            Cast(
+                Subquery(published.annotate(average=Avg('rating')).values('average')),
+                models.DecimalField(max_digits=3, decimal_places=2),
+            ),
+            Decimal('0.00'),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0003_business_coordinates'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_rating_counters, migrations.RunPython.noop),
+    ]
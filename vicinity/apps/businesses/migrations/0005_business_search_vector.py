@@ -0,0 +1,44 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:29
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def populate_search_vector(apps, schema_editor):
+    # apps.businesses.search.business_search_vector as of this migration
+    Business = apps.get_model('businesses', 'Business')
+    Business.objects.update(search_vector=(
+        SearchVector('name', weight='A', config='english') +
+        SearchVector('address', 'city', weight='B', config='english') +
+        SearchVector('description', weight='C', config='english')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0004_business_rating_sum'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='business',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='business_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='business_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
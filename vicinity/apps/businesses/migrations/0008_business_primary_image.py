@@ -0,0 +1,48 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+
+def single_primary_image(apps, schema_editor):
+    Business = apps.get_model('businesses', 'Business')
+    BusinessImage = apps.get_model('businesses', 'BusinessImage')
+
+    # keep only the newest primary image of each business
+    newer_primary = BusinessImage.objects.filter(
+        Q(created_at__gt=OuterRef('created_at')) |
+        Q(created_at=OuterRef('created_at'), pk__gt=OuterRef('pk')),
+        business=OuterRef('business'),
+        is_primary=True,
+    )
+    BusinessImage.objects.filter(is_primary=True).filter(
+        Exists(newer_primary)
+    ).update(is_primary=False)
+
+    Business.objects.update(primary_image=Subquery(
+        BusinessImage.objects.filter(
+            business=OuterRef('pk'),
+            is_primary=True,
+        ).values('pk')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0007_image_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='primary_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='businesses.businessimage'),
+        ),
+        migrations.RunPython(single_primary_image, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='businessimage',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_primary', True)), fields=('business',), name='unique_primary_business_image'),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:43
+
+import re
+import apps.businesses.hours
+import django.db.models.deletion
+from django.core.exceptions import ValidationError
+from django.db import migrations, models
+
+# apps.businesses.hours.weekly_intervals as of this migration
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+TIME_PATTERN = re.compile(r'^(?:([01]\d|2[0-3]):([0-5]\d)|24:00)$')
+
+
+def _minutes(value):
+    match = TIME_PATTERN.match(value) if isinstance(value, str) else None
+    if match is None:
+        raise ValidationError(f'{value!r} is not a time in HH:MM format.')
+    if value == '24:00':
+        return MINUTES_PER_DAY
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+def weekly_intervals(hours):
+    if not isinstance(hours, dict):
+        raise ValidationError('Opening hours must be an object keyed by day.')
+
+    intervals = []
+    for day, periods in hours.items():
+        if day not in DAYS:
+            raise ValidationError(f'{day!r} is not a day.')
+        if not isinstance(periods, list):
+            raise ValidationError(f'Opening hours of {day} must be a list of periods.')
+
+        day_start = DAYS.index(day) * MINUTES_PER_DAY
+        for period in periods:
+            if not isinstance(period, dict) or set(period) != {'open', 'close'}:
+                raise ValidationError(f'Periods of {day} must have exactly "open" and "close".')
+            opens, closes = _minutes(period['open']), _minutes(period['close'])
+            if opens == closes or opens == MINUTES_PER_DAY:
+                raise ValidationError(f'{period["open"]}-{period["close"]} on {day} is not a period.')
+            if closes < opens:
+                closes += MINUTES_PER_DAY
+
+            start, end = day_start + opens, day_start + closes
+            if end > MINUTES_PER_WEEK:
+                intervals.append((0, end - MINUTES_PER_WEEK))
+                end = MINUTES_PER_WEEK
+            intervals.append((start, end))
+
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def populate_business_hours(apps, schema_editor):
+    Business = apps.get_model('businesses', 'Business')
+    BusinessHours = apps.get_model('businesses', 'BusinessHours')
+
+    intervals = []
+    businesses = Business.objects.exclude(hours_of_operation={}).values_list('pk', 'hours_of_operation')
+    for business_id, hours in businesses.iterator():
+        # free-form hours from before the schema can't be indexed
+        try:
+            periods = weekly_intervals(hours)
+        except ValidationError:
+            continue
+        intervals.extend(
+            BusinessHours(business_id=business_id, start_minute=start, end_minute=end)
+            for start, end in periods
+        )
+    BusinessHours.objects.bulk_create(intervals, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0008_business_primary_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='timezone',
+            field=models.CharField(default='UTC', max_length=64, validators=[apps.businesses.hours.validate_timezone]),
+        ),
+        migrations.AlterField(
+            model_name='business',
+            name='hours_of_operation',
+            field=models.JSONField(blank=True, default=dict, validators=[apps.businesses.hours.validate_hours]),
+        ),
+        migrations.CreateModel(
+            name='BusinessHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_minute', models.PositiveIntegerField()),
+                ('end_minute', models.PositiveIntegerField()),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_intervals', to='businesses.business')),
+            ],
+            options={
+                'verbose_name': 'Business Hours',
+                'verbose_name_plural': 'Business Hours',
+                'indexes': [models.Index(fields=['business', 'start_minute', 'end_minute'], name='businesses__busines_efce53_idx')],
+            },
+        ),
+        migrations.RunPython(populate_business_hours, migrations.RunPython.noop),
+    ]
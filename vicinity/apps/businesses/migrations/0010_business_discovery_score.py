@@ -0,0 +1,79 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:45
+
+import math
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, FloatField, Func, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Ln, Power
+from django.utils import timezone
+
+# apps.businesses.discovery as of this migration, frozen so later
+# changes to the scoring don't change what it computes
+PRIOR_RATING = 3.5
+PRIOR_WEIGHT = 5
+HALF_LIFE_SECONDS = 90 * 24 * 60 * 60
+VOLUME_WEIGHT = 0.25
+
+
+class EpochSeconds(Func):
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+    output_field = FloatField()
+
+
+def review_volume(created_at, now):
+    half_lives = (EpochSeconds(created_at) - now.timestamp()) / HALF_LIFE_SECONDS
+    return Sum(Power(Value(2.0), half_lives))
+
+
+def discovery_score(rating_sum, review_count, volume):
+    bayesian_rating = (
+        (rating_sum + Value(PRIOR_RATING * PRIOR_WEIGHT)) * 1.0 /
+        (review_count + Value(PRIOR_WEIGHT))
+    )
+    doublings = Ln(volume + Value(1.0)) / math.log(2)
+    return bayesian_rating + doublings * VOLUME_WEIGHT
+
+
+def populate_discovery_score(apps, schema_editor):
+    Business = apps.get_model('businesses', 'Business')
+    Review = apps.get_model('reviews', 'Review')
+
+    published = Review.objects.filter(
+        business=OuterRef('pk'),
+        is_published=True,
+    ).order_by().values('business')
+    Business.objects.update(review_volume=Coalesce(
+        Subquery(published.annotate(total=review_volume('created_at', timezone.now())).values('total')),
+        0.0,
+    ))
+    Business.objects.update(discovery_score=discovery_score(
+        F('rating_sum'), F('review_count'), F('review_volume')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0009_business_hours'),
+        ('reviews', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='discovery_score',
+            field=models.FloatField(default=3.5, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='review_volume',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        # before the UPDATEs, which leave trigger events that block an index build
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['-discovery_score', 'id'], name='business_discovery_id_idx'),
+        ),
+        migrations.RunPython(populate_discovery_score, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0010_business_discovery_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
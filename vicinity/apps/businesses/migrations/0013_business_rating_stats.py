@@ -0,0 +1,88 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:25
+
+import apps.businesses.ratings
+import django.db.models.deletion
+from datetime import timedelta
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+# apps.businesses.ratings as of this migration
+RECENT_DAYS = 30
+STARS = range(1, 6)
+
+
+def populate_rating_stats(apps, schema_editor):
+    Business = apps.get_model('businesses', 'Business')
+    BusinessRatingStats = apps.get_model('businesses', 'BusinessRatingStats')
+    Review = apps.get_model('reviews', 'Review')
+
+    since = timezone.now() - timedelta(days=RECENT_DAYS)
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+
+    # an empty row per business, in one INSERT ... SELECT
+    columns = [f'rating_{stars}' for stars in STARS] + ['recent_count', 'recent_rating_sum']
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(BusinessRatingStats._meta.db_table)} '
+            f'(business_id, recent_since, {", ".join(quote(column) for column in columns)}) '
+            f'SELECT id, %s, {", ".join("0" for _ in columns)} '
+            f'FROM {quote(Business._meta.db_table)}',
+            [since],
+        )
+
+    published = Review.objects.filter(
+        business=OuterRef('pk'),
+        is_published=True,
+    ).order_by().values('business')
+    recent = published.filter(created_at__gte=since)
+    stats = BusinessRatingStats.objects.using(connection.alias)
+    stats.update(
+        **{
+            f'rating_{stars}': Coalesce(
+                Subquery(published.filter(rating=stars).annotate(total=Count('pk')).values('total')), 0
+            )
+            for stars in STARS
+        },
+        last_review_at=Subquery(published.annotate(latest=Max('created_at')).values('latest')),
+        recent_count=Coalesce(Subquery(recent.annotate(total=Count('pk')).values('total')), 0),
+        recent_rating_sum=Coalesce(Subquery(recent.annotate(total=Sum('rating')).values('total')), 0),
+    )
+    stats.update(recent_average=Cast(
+        F('recent_rating_sum') * 1.0 / NullIf(F('recent_count'), 0),
+        models.DecimalField(max_digits=3, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0012_business_active_city_category_index'),
+        ('reviews', '0004_review_published_business_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessRatingStats',
+            fields=[
+                ('business', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to='businesses.business')),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+                ('last_review_at', models.DateTimeField(blank=True, null=True)),
+                ('recent_since', models.DateTimeField(default=apps.businesses.ratings.recent_window_start)),
+                ('recent_count', models.PositiveIntegerField(default=0)),
+                ('recent_rating_sum', models.PositiveIntegerField(default=0)),
+                ('recent_average', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+            ],
+            options={
+                'verbose_name': 'Business Rating Stats',
+                'verbose_name_plural': 'Business Rating Stats',
+            },
+        ),
+        migrations.RunPython(populate_rating_stats, migrations.RunPython.noop),
+    ]
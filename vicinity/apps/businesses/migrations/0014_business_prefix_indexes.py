@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:29
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0013_business_rating_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('name'), name='text_pattern_ops'), condition=models.Q(('is_active', True)), name='business_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('city'), name='text_pattern_ops'), condition=models.Q(('is_active', True)), name='business_city_prefix_idx'),
+        ),
+    ]
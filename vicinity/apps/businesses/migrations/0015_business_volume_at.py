@@ -0,0 +1,72 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:43
+
+import math
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, FloatField, Func, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Ln, Power
+from django.utils import timezone
+
+# frozen copy of the scoring in apps.businesses.discovery
+PRIOR_RATING = 3.5
+PRIOR_WEIGHT = 5
+HALF_LIFE_SECONDS = 90 * 24 * 60 * 60
+VOLUME_WEIGHT = 0.25
+
+
+class EpochSeconds(Func):
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+    output_field = FloatField()
+
+
+def review_volume(created_at, now):
+    half_lives = (EpochSeconds(created_at) - now.timestamp()) / HALF_LIFE_SECONDS
+    return Sum(Power(Value(2.0), half_lives))
+
+
+def discovery_score(rating_sum, review_count, volume):
+    bayesian_rating = (
+        (rating_sum + Value(PRIOR_RATING * PRIOR_WEIGHT)) * 1.0 /
+        (review_count + Value(PRIOR_WEIGHT))
+    )
+    doublings = Ln(volume + Value(1.0)) / math.log(2)
+    return bayesian_rating + doublings * VOLUME_WEIGHT
+
+
+def decay_review_volumes(apps, schema_editor):
+    # volumes were decayed to a fixed 2020 epoch, now to volume_at
+    Business = apps.get_model('businesses', 'Business')
+    Review = apps.get_model('reviews', 'Review')
+
+    now = timezone.now()
+    published = Review.objects.filter(
+        business=OuterRef('pk'),
+        is_published=True,
+    ).order_by().values('business')
+    Business.objects.update(
+        review_volume=Coalesce(
+            Subquery(published.annotate(total=review_volume('created_at', now)).values('total')),
+            0.0,
+        ),
+        volume_at=Value(now),
+    )
+    Business.objects.update(discovery_score=discovery_score(
+        F('rating_sum'), F('review_count'), F('review_volume')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0014_business_prefix_indexes'),
+        ('reviews', '0004_review_published_business_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='volume_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(decay_review_volumes, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,28 @@
-from django.db import models
+import copy
+from collections import Counter
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce, Greatest, Lower, NullIf
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils.timezone import now
+from .discovery import PRIOR_RATING, decayed_volume, discovery_score, review_weight
+from .hours import validate_hours, validate_timezone, weekly_intervals
+from .ratings import rating_average, recent_window_start
+from .search import SEARCH_VECTOR_FIELDS, business_search_vector
 
 # Create your models here.
 
+class PublicBusinessManager(models.Manager):
+    """The businesses shown on the public API: the active ones."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active=True)
+
+
 class Business(models.Model):
     """
     Model representing a business in the Vicinity platform.
@@ -37,9 +56,25 @@ class Business(models.Model):
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=100)
     zip_code = models.CharField(max_length=10)
+    latitude = models.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(Decimal('-90')), MaxValueValidator(Decimal('90'))]
+    )
+    longitude = models.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(Decimal('-180')), MaxValueValidator(Decimal('180'))]
+    )
 
     # Business Hours
-    hours_of_operation = models.JSONField(default=dict, blank=True)
+    # see apps.businesses.hours for the format, indexed as BusinessHours
+    hours_of_operation = models.JSONField(default=dict, blank=True, validators=[validate_hours])
+    timezone = models.CharField(max_length=64, default='UTC', validators=[validate_timezone])
 
     # Media
     logo = models.ImageField(
@@ -47,6 +82,20 @@ class Business(models.Model):
         null=True,
         blank=True,
     )
+    # filled in off-request by apps.common.images
+    logo_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    logo_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    logo_blurhash = models.CharField(max_length=64, blank=True, editable=False)
+    logo_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # denormalized pointer to the image flagged is_primary
+    primary_image = models.ForeignKey(
+        'BusinessImage',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+    )
 
     # Metrics
     average_rating = models.DecimalField(
@@ -56,15 +105,32 @@ class Business(models.Model):
         validators=[MinValueValidator(0.0), MaxValueValidator(5.0)]
     )
     review_count = models.PositiveIntegerField(default=0)
+    # running total of published ratings, kept alongside review_count
+    rating_sum = models.PositiveIntegerField(default=0)
+    # recency weighted review count and the discovery feed score built
+    # from it, see apps.businesses.discovery
+    review_volume = models.FloatField(default=0.0, editable=False)
+    volume_at = models.DateTimeField(default=now, editable=False)
+    discovery_score = models.FloatField(default=PRIOR_RATING, editable=False)
 
     # Status and Verification
     is_verified = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
 
+    # identifier of the business in the source it was bulk imported
+    # from, the conflict key of the import_businesses command
+    external_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    # Full-text search, maintained on save
+    search_vector = SearchVectorField(null=True, editable=False)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = models.Manager()
+    public = PublicBusinessManager()
+
     class Meta:
         verbose_name = 'Business'
         verbose_name_plural = 'Businesses'
@@ -73,11 +139,273 @@ class Business(models.Model):
             models.Index(fields=['name']),
             models.Index(fields=['city']),
             models.Index(fields=['category']),
+            # the public list filtered by place and kind
+            models.Index(
+                fields=['city', 'category'],
+                condition=models.Q(is_active=True),
+                name='business_active_city_cat_idx',
+            ),
+            # keyset pagination over the list orderings
+            models.Index(fields=['-created_at', 'id'], name='business_created_id_idx'),
+            models.Index(fields=['-average_rating', 'id'], name='business_rating_id_idx'),
+            models.Index(fields=['-discovery_score', 'id'], name='business_discovery_id_idx'),
+            # bounding-box prefilter for radius searches
+            models.Index(fields=['latitude', 'longitude']),
+            GinIndex(fields=['search_vector'], name='business_search_vector_idx'),
+            # trigram index for typo tolerant name matching
+            GinIndex(
+                fields=['name'],
+                name='business_name_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+            ),
+            # prefix matches for autocomplete, when served from the database
+            models.Index(
+                OpClass(Lower('name'), name='text_pattern_ops'),
+                condition=models.Q(is_active=True),
+                name='business_name_prefix_idx',
+            ),
+            models.Index(
+                OpClass(Lower('city'), name='text_pattern_ops'),
+                condition=models.Q(is_active=True),
+                name='business_city_prefix_idx',
+            ),
         ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_search_text = instance._search_text()
+        instance._stored_hours = copy.deepcopy(instance.__dict__.get('hours_of_operation'))
+        instance._stored_listing = copy.deepcopy(instance._listing())
+        return instance
+
+    def _search_text(self):
+        return tuple(self.__dict__.get(field) for field in SEARCH_VECTOR_FIELDS)
+
+    # columns the business lists filter, search or sort on, besides the
+    # rating counters; saves changing none of them keep cached lists
+    LISTED_FIELDS = (
+        'name', 'category', 'description', 'address', 'city', 'state',
+        'hours_of_operation', 'timezone', 'is_verified', 'is_active',
+    )
+
+    def _listing(self):
+        return tuple(self.__dict__.get(field) for field in self.LISTED_FIELDS)
+
+    # columns kept by their own UPDATEs (apply_rating_delta,
+    # update_search_vector), never written back by a save
+    DERIVED_FIELDS = frozenset({
+        'rating_sum', 'review_count', 'average_rating', 'review_volume', 'volume_at',
+        'discovery_score', 'search_vector',
+    })
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if not adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # the derived columns loaded with the instance may be behind
+            # the updates committed since, so leave them out
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+            ]
+        # read by the post_save handler invalidating the cached lists
+        listing = copy.deepcopy(self._listing())
+        self._listing_changed = adding or listing != getattr(self, '_stored_listing', None)
+        super().save(*args, **kwargs)
+        self._stored_listing = listing
+        if adding:
+            BusinessRatingStats.objects.create(business=self)
+
+        # only rebuild the search vector when the indexed text changed
+        search_text = self._search_text()
+        if search_text != getattr(self, '_stored_search_text', None):
+            self.update_search_vector()
+            self._stored_search_text = search_text
+
+        # and the opening intervals when the hours changed
+        hours = self.__dict__.get('hours_of_operation')
+        if hours is not None and hours != getattr(self, '_stored_hours', {}):
+            self.update_opening_hours()
+            self._stored_hours = copy.deepcopy(hours)
+
+    def update_search_vector(self):
+        """Recompute the stored search vector of this business."""
+        self.__class__.objects.filter(pk=self.pk).update(
+            search_vector=business_search_vector()
+        )
+
+    def update_opening_hours(self):
+        """Replace the BusinessHours rows of this business from its hours."""
+        with transaction.atomic():
+            BusinessHours.objects.filter(business=self).delete()
+            BusinessHours.objects.bulk_create(BusinessHours.for_business(self))
+
+    @classmethod
+    def apply_rating_delta(cls, business_id, rating_delta, count_delta, created_at=None):
+        """
+        Shift the rating counters of a business by the given deltas and
+        recompute its average rating, all in a single atomic UPDATE.
+
+        `created_at` is the creation time of the reviews counted in
+        `count_delta`, whose weight moves the review volume and with it
+        the discovery score. The volume is decayed to now on the way.
+        """
+        if not rating_delta and not count_delta:
+            return
+
+        volume_at = now()
+        rating_sum = F('rating_sum') + rating_delta
+        review_count = F('review_count') + count_delta
+        review_volume = decayed_volume(F('review_volume'), F('volume_at'), volume_at)
+        if count_delta and created_at is not None:
+            review_volume = review_volume + count_delta * review_weight(created_at, volume_at)
+        # float rounding mustn't leave a residue once the last review is gone
+        review_volume = models.Case(
+            models.When(review_count__lte=-count_delta, then=models.Value(0.0)),
+            default=Greatest(review_volume, models.Value(0.0)),
+        )
+        cls.objects.filter(pk=business_id).update(
+            rating_sum=rating_sum,
+            review_count=review_count,
+            average_rating=Coalesce(
+                Cast(
+                    rating_sum * 1.0 / NullIf(review_count, 0),
+                    models.DecimalField(max_digits=3, decimal_places=2)
+                ),
+                Decimal('0.00')
+            ),
+            review_volume=review_volume,
+            volume_at=models.Value(volume_at),
+            discovery_score=discovery_score(rating_sum, review_count, review_volume),
+        )
+
+class BusinessHours(models.Model):
+    """
+    Weekly opening interval of a business, derived from its
+    hours_of_operation. Minutes count from Monday 00:00 in the business's
+    own time zone, so open/closed checks stay correct across DST changes.
+    """
+    business = models.ForeignKey(
+        Business,
+        on_delete=models.CASCADE,
+        related_name='opening_intervals'
+    )
+    start_minute = models.PositiveIntegerField()
+    end_minute = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = 'Business Hours'
+        verbose_name_plural = 'Business Hours'
+        indexes = [
+            models.Index(fields=['business', 'start_minute', 'end_minute']),
+        ]
+
+    def __str__(self):
+        return f'{self.business_id}: {self.start_minute}-{self.end_minute}'
+
+    @classmethod
+    def for_business(cls, business):
+        """Build, without saving, the intervals of a business."""
+        return [
+            cls(business=business, start_minute=start, end_minute=end)
+            for start, end in weekly_intervals(business.hours_of_operation)
+        ]
+
+
+class BusinessRatingStats(models.Model):
+    """
+    Star distribution and recent activity of the published reviews of a
+    business, kept up to date by `apply_review_delta` as reviews are
+    written instead of aggregated over them on read. Created with the
+    business; the rebuild_rating_stats command recomputes every row.
+
+    `recent_average` covers the reviews written since `recent_since`,
+    which the command moves to the start of the last RECENT_DAYS days
+    (see apps.businesses.ratings), so schedule it daily.
+    """
+    business = models.OneToOneField(
+        Business,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating_stats',
+    )
+    # published reviews per number of stars
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    last_review_at = models.DateTimeField(null=True, blank=True)
+    recent_since = models.DateTimeField(default=recent_window_start)
+    recent_count = models.PositiveIntegerField(default=0)
+    recent_rating_sum = models.PositiveIntegerField(default=0)
+    recent_average = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Business Rating Stats'
+        verbose_name_plural = 'Business Rating Stats'
+
+    def __str__(self):
+        return f'Rating stats of {self.business_id}'
+
+    @classmethod
+    def apply_review_delta(cls, business_id, created_at, removed=None, added=None):
+        """
+        Move the stats of a business, in a single atomic UPDATE, for a
+        published review written at `created_at` whose rating went from
+        `removed` to `added`, either of which is None when the review
+        wasn't, or is no longer, published.
+        """
+        stars = Counter()
+        if removed is not None:
+            stars[removed] -= 1
+        if added is not None:
+            stars[added] += 1
+        stars = {rating: delta for rating, delta in stars.items() if delta}
+        if not stars:
+            return
+
+        count_delta = sum(stars.values())
+        sum_delta = sum(rating * delta for rating, delta in stars.items())
+        in_window = models.Q(recent_since__lte=created_at)
+        recent_count = models.Case(
+            models.When(in_window, then=F('recent_count') + count_delta),
+            default=F('recent_count'),
+            output_field=models.PositiveIntegerField(),
+        )
+        recent_rating_sum = models.Case(
+            models.When(in_window, then=F('recent_rating_sum') + sum_delta),
+            default=F('recent_rating_sum'),
+            output_field=models.PositiveIntegerField(),
+        )
+        updates = {f'rating_{rating}': F(f'rating_{rating}') + delta for rating, delta in stars.items()}
+        updates.update(
+            recent_count=recent_count,
+            recent_rating_sum=recent_rating_sum,
+            recent_average=rating_average(recent_rating_sum, recent_count),
+        )
+
+        if count_delta > 0:
+            # NULLs are ignored by GREATEST
+            updates['last_review_at'] = Greatest(F('last_review_at'), models.Value(created_at))
+        elif count_delta < 0:
+            # the latest review is gone, look up the one before it
+            Review = Business._meta.get_field('reviews').related_model
+            latest = Review.published.filter(business=OuterRef('business')).order_by('-created_at')
+            updates['last_review_at'] = models.Case(
+                models.When(
+                    last_review_at__lte=created_at,
+                    then=Subquery(latest.values('created_at')[:1]),
+                ),
+                default=F('last_review_at'),
+            )
+
+        cls.objects.filter(pk=business_id).update(**updates)
+
+
 class BusinessImage(models.Model):
     """
     Model for storing multiple images for a business.
@@ -88,6 +416,11 @@ class BusinessImage(models.Model):
         related_name="images",
     )
     image = models.ImageField(upload_to="business_images/")
+    # filled in off-request by apps.common.images
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_blurhash = models.CharField(max_length=64, blank=True, editable=False)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     caption = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -96,15 +429,53 @@ class BusinessImage(models.Model):
         verbose_name = 'Business Image'
         verbose_name_plural = 'Business Images'
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['business'],
+                condition=models.Q(is_primary=True),
+                name='unique_primary_business_image'
+            )
+        ]
 
     def __str__(self):
         return f'Image for {self.business.name}'
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_is_primary = instance.__dict__.get('is_primary')
+        return instance
+
     def save(self, *args, **kwargs):
-        # ensure only one primary image per business
-        if self.is_primary:
-            self.__class__.objects.filter(
-                business=self.business,
-                is_primary=True
-            ).update(is_primary=False)
-        super().save(*args, **kwargs)
+        was_primary = getattr(self, '_stored_is_primary', False)
+
+        with transaction.atomic():
+            if self.is_primary:
+                # demote the current primary first, the partial unique
+                # constraint allows a single primary per business
+                self._lock_business()
+                self.__class__.objects.filter(
+                    business_id=self.business_id,
+                    is_primary=True,
+                ).exclude(pk=self.pk).update(is_primary=False)
+
+            super().save(*args, **kwargs)
+
+            if self.is_primary:
+                Business.objects.filter(pk=self.business_id).update(primary_image=self)
+            elif was_primary:
+                Business.objects.filter(
+                    pk=self.business_id,
+                    primary_image=self,
+                ).update(primary_image=None)
+
+        self._stored_is_primary = self.is_primary
+
+    def make_primary(self):
+        """Atomically swap this image in as the primary image of its business."""
+        self.is_primary = True
+        self.save(update_fields=['is_primary'])
+
+    def _lock_business(self):
+        # serializes concurrent primary swaps on the same business
+        list(Business.objects.select_for_update().filter(pk=self.business_id).values_list('pk'))
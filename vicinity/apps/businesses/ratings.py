@@ -0,0 +1,70 @@
+from datetime import timedelta
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from django.db.models import Count, Max, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+# BusinessRatingStats.recent_average covers the reviews of the last RECENT_DAYS days
+RECENT_DAYS = 30
+
+STARS = range(1, 6)
+
+
+def recent_window_start():
+    """Start of the recent window, as moved by the rebuild_rating_stats command."""
+    return timezone.now() - timedelta(days=RECENT_DAYS)
+
+
+def rating_average(rating_sum, count):
+    """Average rating expression, NULL without ratings."""
+    return Cast(
+        rating_sum * 1.0 / NullIf(count, 0),
+        models.DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
+def rating_stats_columns(published, since):
+    """
+    Column expressions of BusinessRatingStats recomputed from `published`,
+    the published reviews of the row's business as a correlated
+    queryset, with the recent window starting at `since`. The average is
+    left out; it's derived from the recent counters once they're stored.
+    """
+    published = published.order_by().values('business')
+    recent = published.filter(created_at__gte=since)
+    columns = {
+        f'rating_{stars}': Coalesce(
+            Subquery(published.filter(rating=stars).annotate(total=Count('pk')).values('total')), 0
+        )
+        for stars in STARS
+    }
+    columns.update(
+        last_review_at=Subquery(published.annotate(latest=Max('created_at')).values('latest')),
+        recent_since=models.Value(since),
+        recent_count=Coalesce(Subquery(recent.annotate(total=Count('pk')).values('total')), 0),
+        recent_rating_sum=Coalesce(
+            Subquery(recent.annotate(total=Sum('rating')).values('total')), 0
+        ),
+    )
+    return columns
+
+
+def create_missing_rating_stats(stats_model, businesses, since, using=DEFAULT_DB_ALIAS):
+    """
+    Insert empty stats rows, with the recent window starting at `since`,
+    for the businesses of the `businesses` queryset that have none, in
+    one INSERT ... SELECT.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = [f'rating_{stars}' for stars in STARS] + ['recent_count', 'recent_rating_sum']
+    select, params = businesses.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(stats_model._meta.db_table)} '
+            f'(business_id, recent_since, {", ".join(quote(column) for column in columns)}) '
+            f'SELECT business.id, %s, {", ".join("0" for _ in columns)} FROM ({select}) AS business '
+            'ON CONFLICT (business_id) DO NOTHING',
+            [since, *params],
+        )
+        return cursor.rowcount
@@ -0,0 +1,19 @@
+from django.contrib.postgres.search import SearchVector
+
+# text search configuration used for both indexing and querying
+SEARCH_CONFIG = 'english'
+
+# fields that feed Business.search_vector
+SEARCH_VECTOR_FIELDS = ('name', 'address', 'city', 'description')
+
+
+def business_search_vector():
+    """
+    Weighted search vector for a business: the name ranks highest,
+    then its location, then the free-form description.
+    """
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG) +
+        SearchVector('address', 'city', weight='B', config=SEARCH_CONFIG) +
+        SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
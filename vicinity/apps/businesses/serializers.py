@@ -1,29 +1,187 @@
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from rest_framework import serializers
-from .models import Business, BusinessImage
+from apps.common.cache import bump_generations_on_commit
+from apps.common.images import process_image_later
+from apps.common.serializers import (
+    EagerLoadingMixin, RenditionsField, SparseFieldsetsMixin, TimedSerializerMixin,
+)
+from apps.common.values import FullName
+from . import autocomplete
+from .cache import BUSINESS_LIST_GENERATION
+from .cards import get_business_cards
+from .models import Business, BusinessHours, BusinessImage, BusinessRatingStats
+from .search import business_search_vector
 
 class BusinessImageSerializer(serializers.ModelSerializer):
+    width = serializers.IntegerField(source='image_width', read_only=True)
+    height = serializers.IntegerField(source='image_height', read_only=True)
+    blurhash = serializers.CharField(source='image_blurhash', read_only=True)
+    renditions = RenditionsField(source='image_renditions')
+
     class Meta:
         model = BusinessImage
-        fields = ['id', 'image', 'caption', 'is_primary', 'created_at']
+        fields = [
+            'id', 'image', 'width', 'height', 'blurhash', 'renditions',
+            'caption', 'is_primary', 'created_at'
+        ]
+
+
+class BusinessRatingStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BusinessRatingStats
+        fields = [
+            'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+            'last_review_at', 'recent_average', 'recent_count',
+        ]
 
 
-class BusinessSerializer(serializers.ModelSerializer):
+class BusinessSerializer(
+    TimedSerializerMixin, SparseFieldsetsMixin, EagerLoadingMixin, serializers.ModelSerializer
+):
     images = BusinessImageSerializer(many=True, read_only=True)
+    primary_image = BusinessImageSerializer(read_only=True)
     owner_name = serializers.CharField(source='owner.get_full_name', read_only=True)
+    logo_renditions = RenditionsField()
+    rating_summary = BusinessRatingStatsSerializer(source='rating_stats', read_only=True)
 
     class Meta:
         model = Business
         fields = [
             'id', 'name', 'owner', 'owner_name', 'category', 'description',
             'email', 'phone', 'website', 'address', 'city', 'state',
-            'zip_code', 'latitude', 'longitude', 'hours_of_operation',
-            'logo', 'average_rating', 'review_count', 'is_verified',
-            'is_active', 'created_at', 'updated_at', 'images'
+            'zip_code', 'latitude', 'longitude', 'hours_of_operation', 'timezone',
+            'logo', 'logo_width', 'logo_height', 'logo_blurhash',
+            'logo_renditions', 'average_rating', 'review_count', 'rating_summary',
+            'discovery_score', 'is_verified', 'is_active', 'created_at', 'updated_at',
+            'primary_image', 'images'
         ]
         read_only_fields = [
             'owner', 'average_rating', 'review_count', 
             'is_verified', 'created_at', 'updated_at'
         ]
+        # plan fields of the fast read path, see apps.common.values
+        values_fields = {'owner_name': FullName('owner')}
+
+    def update(self, instance, validated_data):
+        business = super().update(instance, validated_data)
+        if validated_data.get('logo'):
+            process_image_later(business, 'logo')
+        return business
+
+
+class BusinessCardField(serializers.Field):
+    """
+    Read-only compact representation of a business (id, name, city,
+    category, rating, review count and primary image URL), read from the
+    cached business cards instead of the business row.
+
+    Expects the business id as its source. Lists can preload the cards of
+    a whole page into the `business_cards` context entry.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, business_id):
+        cards = self.context.get('business_cards') or {}
+        card = cards.get(business_id)
+        if card is None:
+            card = get_business_cards([business_id]).get(business_id)
+        return card_representation(card, self.context.get('request'))
+
+
+class BusinessCardColumn:
+    """
+    BusinessCardField as a plan field of apps.common.values, reading the
+    business id from `lookup` and the cards of the page in one go.
+    """
+
+    def __init__(self, lookup):
+        self.lookup = lookup
+        self.lookups = [lookup]
+
+    def bind(self, rows, context):
+        lookup = self.lookup
+        cards = dict(context.get('business_cards') or {})
+        missing = {row[lookup] for row in rows} - cards.keys()
+        if missing:
+            cards.update(get_business_cards(missing))
+        request = context.get('request')
+        return lambda row: card_representation(cards.get(row[lookup]), request)
+
+
+def card_representation(card, request):
+    if card is None:
+        return None
+    card = dict(card)
+    if card['primary_image'] and request is not None:
+        card['primary_image'] = request.build_absolute_uri(card['primary_image'])
+    return card
+
+
+class NearbyBusinessSerializer(BusinessSerializer):
+    """
+    Business representation including the distance from the search origin.
+    """
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta(BusinessSerializer.Meta):
+        fields = BusinessSerializer.Meta.fields + ['distance']
+
+
+class BusinessBulkCreateSerializer(serializers.ListSerializer):
+    """
+    Creates many businesses and all their images in one transaction,
+    with one INSERT per table instead of one per row.
+    """
+
+    def create(self, validated_data):
+        images_data = [item.pop('images', []) for item in validated_data]
+
+        with transaction.atomic():
+            businesses = Business.objects.bulk_create(
+                [Business(**item) for item in validated_data]
+            )
+            images = BusinessImage.objects.bulk_create([
+                BusinessImage(business=business, image=image_data, is_primary=(index == 0))
+                for business, business_images in zip(businesses, images_data)
+                for index, image_data in enumerate(business_images)
+            ])
+
+            # bulk_create skips save() and its signals
+            Business.objects.filter(
+                pk__in=[business.pk for business in businesses]
+            ).update(
+                search_vector=business_search_vector(),
+                primary_image=Subquery(
+                    BusinessImage.objects.filter(
+                        business=OuterRef('pk'),
+                        is_primary=True,
+                    ).values('pk')[:1]
+                ),
+            )
+            BusinessHours.objects.bulk_create([
+                interval for business in businesses for interval in BusinessHours.for_business(business)
+            ])
+            BusinessRatingStats.objects.bulk_create(
+                [BusinessRatingStats(business=business) for business in businesses]
+            )
+            primary_images = {image.business_id: image for image in images if image.is_primary}
+            for business in businesses:
+                business.primary_image = primary_images.get(business.pk)
+            bump_generations_on_commit(BUSINESS_LIST_GENERATION)
+            for business in businesses:
+                autocomplete.index.changed(business.pk)
+
+            for business in businesses:
+                if business.logo:
+                    process_image_later(business, 'logo')
+            for image in images:
+                process_image_later(image, 'image')
+
+        return businesses
 
 
 class BusinessCreateSerializer(BusinessSerializer):
@@ -35,17 +193,51 @@ class BusinessCreateSerializer(BusinessSerializer):
         write_only=True,
         required=False
     )
+    # form data leaves unchecked booleans out, which would read as False
+    # and hide multipart-created businesses from the public; creates only,
+    # so an update that leaves it out keeps the business as it is
+    is_active = serializers.BooleanField(default=True)
+
+    class Meta(BusinessSerializer.Meta):
+        list_serializer_class = BusinessBulkCreateSerializer
 
     def create(self, validated_data):
         images_data = validated_data.pop('images', [])
-        business = Business.objects.create(**validated_data)
-
-        # handle image uploads
-        for index, image_data in enumerate(images_data):
-            BusinessImage.objects.create(
-                business=business,
-                image=image_data,
-                is_primary=(index == 0)
-            )
+
+        with transaction.atomic():
+            business = Business.objects.create(**validated_data)
+            if business.logo:
+                process_image_later(business, 'logo')
+
+            # handle image uploads, all in a single INSERT
+            images = BusinessImage.objects.bulk_create([
+                BusinessImage(business=business, image=image_data, is_primary=(index == 0))
+                for index, image_data in enumerate(images_data)
+            ])
+            if images:
+                # bulk_create skips BusinessImage.save(), which sets the pointer
+                business.primary_image = images[0]
+                Business.objects.filter(pk=business.pk).update(primary_image=images[0])
+            for image in images:
+                process_image_later(image, 'image')
 
         return business
+
+
+class BusinessImportSerializer(serializers.ModelSerializer):
+    """
+    Validates a row of the import_businesses command. `owner` is a user
+    id, which the command checks for the whole batch at once.
+    """
+    external_id = serializers.CharField(max_length=64)
+    owner = serializers.IntegerField(required=False)
+
+    class Meta:
+        model = Business
+        fields = [
+            'external_id', 'name', 'owner', 'category', 'description', 'email',
+            'phone', 'website', 'address', 'city', 'state', 'zip_code', 'latitude',
+            'longitude', 'hours_of_operation', 'timezone', 'is_verified', 'is_active',
+        ]
+        # external_id conflicts are upserts, not errors
+        validators = []
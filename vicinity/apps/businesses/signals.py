@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import invalidate_business
+from .models import Business, BusinessImage
+
+
+@receiver(post_save, sender=Business)
+def invalidate_saved_business_cache(sender, instance, **kwargs):
+    invalidate_business(instance.pk, listed=getattr(instance, '_listing_changed', True))
+
+
+@receiver(post_delete, sender=Business)
+def invalidate_deleted_business_cache(sender, instance, **kwargs):
+    invalidate_business(instance.pk, listed=True)
+
+
+@receiver(post_save, sender=BusinessImage)
+@receiver(post_delete, sender=BusinessImage)
+def invalidate_business_image_cache(sender, instance, **kwargs):
+    invalidate_business(instance.business_id)
@@ -1,3 +1,1183 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from urllib.parse import urlencode
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import F
+from django.db.models.functions import Lower
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from apps.common.cache import get_generations
+from apps.common.images import process_image, process_image_field, rendition_names
+from apps.common.values import get_plan
+from apps.reviews.models import Review
+from . import autocomplete
+from .cache import BUSINESS_LIST_GENERATION
+from .models import Business, BusinessImage
+from .serializers import BusinessSerializer
 
 # Create your tests here.
+
+
+def create_business(owner, **kwargs):
+    fields = {
+        'name': 'Test Business',
+        'category': 'restaurant',
+        'description': 'A place to eat.',
+        'email': 'owner@example.com',
+        'phone': '0123456789',
+        'address': '1 Main Street',
+        'city': 'Dublin',
+        'state': 'Leinster',
+        'zip_code': 'D01',
+    }
+    fields.update(kwargs)
+    return Business.objects.create(owner=owner, **fields)
+
+
+class BusinessQueryCountTests(TestCase):
+    """
+    The list endpoints must issue a fixed number of queries however many
+    rows they return, so N+1 regressions fail here.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owners = [
+            User.objects.create_user(f'owner{i}', first_name='Owner', last_name=str(i))
+            for i in range(3)
+        ]
+
+    def create_businesses(self, count):
+        # run the cache invalidation hooks as if the transaction committed
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(count):
+                business = create_business(self.owners[i % 3], name=f'Business {i}')
+                BusinessImage.objects.create(business=business, image='business_images/a.jpg', is_primary=True)
+                BusinessImage.objects.create(business=business, image='business_images/b.jpg')
+
+    def assertListQueries(self, expected):
+        with self.assertNumQueries(expected):
+            response = self.client.get(reverse('businesses:business-list'), format='json')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_query_count_is_constant(self):
+        self.create_businesses(1)
+        self.assertListQueries(2)
+
+        self.create_businesses(10)
+        response = self.assertListQueries(2)
+        self.assertEqual(len(response.json()['results']), 11)
+
+
+class BusinessPrimaryImageTests(TestCase):
+    def setUp(self):
+        self.business = create_business(User.objects.create_user('owner'))
+        self.first = BusinessImage.objects.create(
+            business=self.business, image='business_images/a.jpg', is_primary=True
+        )
+        self.second = BusinessImage.objects.create(business=self.business, image='business_images/b.jpg')
+
+    def test_make_primary_swaps_the_primary_image(self):
+        self.second.make_primary()
+
+        self.first.refresh_from_db()
+        self.business.refresh_from_db()
+        self.assertFalse(self.first.is_primary)
+        self.assertEqual(self.business.primary_image, self.second)
+
+    def test_unflagging_the_primary_image_clears_the_pointer(self):
+        self.first.is_primary = False
+        self.first.save()
+
+        self.business.refresh_from_db()
+        self.assertIsNone(self.business.primary_image)
+
+    def test_database_allows_a_single_primary_image(self):
+        with self.assertRaises(IntegrityError):
+            BusinessImage.objects.filter(pk=self.second.pk).update(is_primary=True)
+
+
+class BusinessOpeningHoursTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        owner = User.objects.create_user('owner')
+        weekdays = {'monday': [{'open': '09:00', 'close': '17:00'}]}
+        self.dublin = create_business(owner, name='Dublin', timezone='Europe/Dublin', hours_of_operation=weekdays)
+        self.new_york = create_business(owner, name='New York', timezone='America/New_York', hours_of_operation=weekdays)
+        self.late = create_business(owner, name='Late', hours_of_operation={
+            'friday': [{'open': '22:00', 'close': '02:00'}],
+        })
+
+    def open_at(self, moment):
+        response = self.client.get(reverse('businesses:business-list'), {'open_at': moment}, format='json')
+        return sorted(business['name'] for business in response.json()['results'])
+
+    def test_open_at_uses_each_business_timezone(self):
+        # 11:00 in Dublin (summer time), 06:00 in New York
+        self.assertEqual(self.open_at('2024-07-01T10:00:00Z'), ['Dublin'])
+        self.assertEqual(self.open_at('2024-07-01T14:00:00Z'), ['Dublin', 'New York'])
+        self.assertEqual(self.open_at('2024-07-01T20:00:00Z'), ['New York'])
+
+    def test_periods_past_midnight_continue_the_next_day(self):
+        self.assertEqual(self.open_at('2024-07-06T01:30:00Z'), ['Late'])
+        self.assertEqual(self.open_at('2024-07-06T02:00:00Z'), [])
+
+    def test_changing_the_hours_rebuilds_the_intervals(self):
+        self.late.hours_of_operation = {'sunday': [{'open': '23:00', 'close': '24:00'}]}
+        self.late.save()
+
+        intervals = self.late.opening_intervals.values_list('start_minute', 'end_minute')
+        self.assertEqual(list(intervals), [(6 * 1440 + 23 * 60, 7 * 1440)])
+
+    def test_invalid_hours_are_rejected(self):
+        self.client.force_authenticate(self.late.owner)
+        response = self.client.patch(
+            reverse('businesses:business-detail', args=[self.late.pk]),
+            {'hours_of_operation': {'friday': [{'open': '9am', 'close': '17:00'}]}, 'timezone': 'Mars/Base'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'hours_of_operation', 'timezone'})
+
+
+class BusinessNearbyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user('owner')
+
+    def nearby(self, business, **params):
+        return self.client.get(reverse('businesses:business-nearby', args=[business.pk]), params)
+
+    def names(self, business, **params):
+        response = self.nearby(business, **params)
+        self.assertEqual(response.status_code, 200)
+        return [(item['name'], round(item['distance'], 1)) for item in response.json()['results']]
+
+    def test_radius_includes_only_the_circle(self):
+        origin = create_business(self.owner, name='Origin', latitude=53.35, longitude=-6.26)
+        create_business(self.owner, name='3 km', latitude=53.377, longitude=-6.26)
+        create_business(self.owner, name='7 km', latitude=53.413, longitude=-6.26)
+        # inside the bounding box of a 5 km radius, but 6 km away
+        create_business(self.owner, name='Corner', latitude=53.39, longitude=-6.20)
+        create_business(self.owner, name='No coordinates')
+
+        self.assertEqual(self.names(origin), [('3 km', 3.0)])
+        self.assertEqual(self.names(origin, radius=10), [('3 km', 3.0), ('Corner', 6.0), ('7 km', 7.0)])
+
+    def test_radius_across_the_antimeridian(self):
+        origin = create_business(self.owner, name='Origin', latitude=-17.0, longitude=179.99)
+        create_business(self.owner, name='East', latitude=-17.0, longitude=-179.99)
+        create_business(self.owner, name='West', latitude=-17.0, longitude=179.0)
+        self.assertEqual(self.names(origin), [('East', 2.1)])
+
+    def test_radius_across_a_pole(self):
+        origin = create_business(self.owner, name='Origin', latitude=89.99, longitude=0)
+        create_business(self.owner, name='Other side', latitude=89.99, longitude=180)
+        create_business(self.owner, name='South', latitude=89.9, longitude=0)
+        self.assertEqual(self.names(origin), [('Other side', 2.2)])
+
+    def test_radius_bounds(self):
+        origin = create_business(self.owner, name='Origin', latitude=53.35, longitude=-6.26)
+        for radius in ('0', '-1', '100.5', 'far'):
+            self.assertEqual(self.nearby(origin, radius=radius).status_code, 400, radius)
+        self.assertEqual(self.nearby(origin, radius=100).status_code, 200)
+
+        unplaced = create_business(self.owner, name='Unplaced')
+        self.assertEqual(self.nearby(unplaced).status_code, 400)
+
+
+class BusinessSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user('owner')
+        create_business(self.owner, name='Blue Lagoon', description='Seafood by the harbour.')
+        create_business(self.owner, name='Harbour Grill', description='Steaks, with a blue cheese sauce.')
+        create_business(self.owner, name='Corner Bakery', description='Bread and cakes.', city='Galway')
+
+    def search(self, text, **params):
+        response = self.client.get(reverse('businesses:business-list'), {'search': text, **params})
+        self.assertEqual(response.status_code, 200)
+        return [business['name'] for business in response.json()['results']]
+
+    def test_results_are_ranked(self):
+        # a match in the name outranks one in the description
+        self.assertEqual(self.search('blue'), ['Blue Lagoon', 'Harbour Grill'])
+        self.assertEqual(self.search('harbour'), ['Harbour Grill', 'Blue Lagoon'])
+        # stemmed, and over the location too
+        self.assertEqual(self.search('bakeries'), ['Corner Bakery'])
+        self.assertEqual(self.search('galway'), ['Corner Bakery'])
+        self.assertEqual(self.search('sushi'), [])
+
+    def test_typos_match_names_by_trigrams(self):
+        self.assertEqual(self.search('blue lagon'), ['Blue Lagoon'])
+        self.assertEqual(self.search('harbor gril'), ['Harbour Grill'])
+
+    def test_saves_keep_the_search_vector(self):
+        business = create_business(self.owner, name='Night Owl', description='Late cocktails.')
+        business.phone = '0987654321'
+        business.save()
+        self.assertEqual(self.search('cocktails'), ['Night Owl'])
+
+    def test_pages_of_ranked_results(self):
+        for i in range(5):
+            create_business(self.owner, name=f'Blue {i}')
+        # no vector yet, as after a bulk load, found by trigrams alone
+        Business.objects.filter(name='Blue 4').update(search_vector=None)
+
+        names, url = [], reverse('businesses:business-list')
+        response = self.client.get(url, {'search': 'blue', 'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            names.extend(business['name'] for business in response.json()['results'])
+            if response.json()['next'] is None:
+                break
+            response = self.client.get(response.json()['next'])
+        self.assertEqual(len(names), len(set(names)))
+        self.assertEqual(names, self.search('blue', page_size=100))
+        self.assertIn('Blue 4', names)
+
+    def test_explicit_ordering_overrides_relevance(self):
+        self.assertEqual(self.search('harbour', ordering='name'), ['Blue Lagoon', 'Harbour Grill'])
+        self.assertEqual(self.search('blue', ordering='-name'), ['Harbour Grill', 'Blue Lagoon'])
+
+
+class BusinessDiscoveryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user('owner')
+        self.url = reverse('businesses:business-discover')
+        self.reviewers = 0
+
+    def review(self, business, rating, count=1):
+        for _ in range(count):
+            self.reviewers += 1
+            Review.objects.create(
+                business=business,
+                user=User.objects.create_user(f'reviewer{self.reviewers}'),
+                rating=rating,
+                title='Review',
+                content='Text.',
+            )
+
+    def discover(self, **params):
+        response = self.client.get(self.url, params, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [business['name'] for business in response.json()['results']]
+
+    def test_review_volume_outweighs_a_single_perfect_rating(self):
+        self.review(create_business(self.owner, name='One perfect review'), 5)
+        self.review(create_business(self.owner, name='Well reviewed'), 4, count=10)
+        create_business(self.owner, name='Unreviewed')
+
+        self.assertEqual(self.discover(), ['Well reviewed', 'One perfect review', 'Unreviewed'])
+
+    def test_old_reviews_decay(self):
+        recent = create_business(self.owner, name='Recent')
+        self.review(recent, 4, count=5)
+        stale = create_business(self.owner, name='Stale')
+        self.review(stale, 4, count=5)
+        Review.objects.filter(business=stale).update(
+            created_at=timezone.now() - timedelta(days=3 * 365)
+        )
+        call_command('rebuild_rating_counters', stdout=io.StringIO())
+
+        self.assertEqual(self.discover(), ['Recent', 'Stale'])
+
+    def score(self, business):
+        business.refresh_from_db()
+        return business.discovery_score
+
+    def test_score_is_in_stars(self):
+        # the Bayesian average, plus a quarter star per doubling of one
+        # plus the fresh review count
+        one = create_business(self.owner, name='One review')
+        self.review(one, 5)
+        self.assertAlmostEqual(self.score(one), (5 + 3.5 * 5) / 6 + 0.25, places=4)
+        fifteen = create_business(self.owner, name='Fifteen reviews')
+        self.review(fifteen, 4, count=15)
+        self.assertAlmostEqual(self.score(fifteen), (60 + 3.5 * 5) / 20 + 1.0, places=4)
+
+    def test_a_fresh_review_does_not_outrank_a_better_rating(self):
+        loved = create_business(self.owner, name='Loved a year ago')
+        self.review(loved, 5, count=8)
+        self.review(loved, 4, count=2)
+        Review.objects.filter(business=loved).update(created_at=timezone.now() - timedelta(days=365))
+        call_command('rebuild_rating_counters', stdout=io.StringIO())
+        panned = create_business(self.owner, name='Panned this week')
+        self.review(panned, 1)
+
+        self.assertEqual(self.discover(), ['Loved a year ago', 'Panned this week'])
+        self.assertAlmostEqual(
+            self.score(loved), (48 + 3.5 * 5) / 15 + 0.25 * math.log2(1 + 10 * 2 ** (-365 / 90)), places=3
+        )
+        self.assertAlmostEqual(self.score(panned), (1 + 3.5 * 5) / 6 + 0.25, places=4)
+
+    def test_volumes_decay_to_now(self):
+        business = create_business(self.owner)
+        self.review(business, 4, count=4)
+        business.refresh_from_db()
+        self.assertAlmostEqual(business.review_volume, 4.0, places=4)
+        incremental = business.discovery_score
+        call_command('rebuild_rating_counters', stdout=io.StringIO())
+        self.assertAlmostEqual(self.score(business), incremental, places=4)
+
+        # ninety days on, the next delta halves the volume before adding to it
+        Business.objects.filter(pk=business.pk).update(volume_at=F('volume_at') - timedelta(days=90))
+        Review.objects.filter(business=business).update(created_at=F('created_at') - timedelta(days=90))
+        self.review(business, 4)
+        business.refresh_from_db()
+        self.assertAlmostEqual(business.review_volume, 3.0, places=4)
+        incremental = business.discovery_score
+        call_command('rebuild_rating_counters', stdout=io.StringIO())
+        self.assertAlmostEqual(self.score(business), incremental, places=4)
+
+    def test_deleting_every_review_resets_the_score(self):
+        business = create_business(self.owner)
+        self.review(business, 2, count=3)
+        business.reviews.all().delete()
+
+        business.refresh_from_db()
+        self.assertEqual((business.review_volume, business.discovery_score), (0.0, 3.5))
+
+    def test_coordinates_restrict_and_penalize_distance(self):
+        near = create_business(self.owner, name='Near', latitude=53.35, longitude=-6.26)
+        self.review(near, 3)
+        nearby_better = create_business(self.owner, name='Nearby, better', latitude=53.40, longitude=-6.26)
+        self.review(nearby_better, 5, count=5)
+        create_business(self.owner, name='Far', latitude=51.90, longitude=-8.47)
+
+        self.assertEqual(
+            self.discover(latitude=53.35, longitude=-6.26, radius=10), ['Nearby, better', 'Near']
+        )
+        self.assertEqual(self.discover(latitude=53.35, longitude=-6.26, radius=1), ['Near'])
+
+
+class BusinessPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        owner = User.objects.create_user('owner')
+        # ties on average_rating force the id tie-breaker to do its job
+        self.businesses = [
+            create_business(owner, name=f'Business {i}', average_rating=i % 3)
+            for i in range(7)
+        ]
+
+    def collect(self, params, url=None):
+        ids = []
+        url = url or reverse('businesses:business-list')
+        response = self.client.get(url, params, format='json')
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.json()['results'])
+            url = response.json()['next']
+            if url is None:
+                return ids
+            response = self.client.get(url, format='json')
+
+    def test_pages_follow_created_at_ordering(self):
+        ids = self.collect({'page_size': 3})
+        self.assertEqual(ids, [business.id for business in reversed(self.businesses)])
+
+    def test_pages_follow_rating_ordering_with_ties(self):
+        ids = self.collect({'page_size': 2, 'ordering': '-average_rating'})
+        expected = sorted(self.businesses, key=lambda b: (-b.average_rating, b.id))
+        self.assertEqual(ids, [business.id for business in expected])
+
+    def test_previous_link_returns_the_earlier_page(self):
+        url = reverse('businesses:business-list')
+        first = self.client.get(url, {'page_size': 3}, format='json').json()
+        second = self.client.get(first['next'], format='json').json()
+        previous = self.client.get(second['previous'], format='json').json()
+        self.assertEqual(previous['results'], first['results'])
+        self.assertIsNone(previous['previous'])
+
+    def test_tampered_cursors_are_not_found(self):
+        url = reverse('businesses:business-list')
+        for ordering, position in [
+            ('average_rating', ['x', 1]),
+            ('average_rating', [1, 'x']),
+            ('-created_at', [{}, 1]),
+            ('-created_at', ['yesterday', 1]),
+            ('name', [None, 1]),
+            ('name', ['a']),
+        ]:
+            # as DRF's CursorPagination.encode_cursor
+            cursor = base64.b64encode(
+                urlencode({'p': json.dumps(position)}).encode('ascii')
+            ).decode('ascii')
+            response = self.client.get(url, {'ordering': ordering, 'cursor': cursor}, format='json')
+            self.assertEqual(response.status_code, 404, (ordering, position))
+
+    def test_pages_follow_annotation_orderings(self):
+        for business in self.businesses:
+            business.latitude, business.longitude = 53.35 + business.id / 1000, -6.26
+            business.save()
+        url = reverse('businesses:business-nearby', args=[self.businesses[0].pk])
+        ids = self.collect({'page_size': 2, 'radius': 50}, url)
+        self.assertEqual(ids, [business.id for business in self.businesses[1:]])
+
+
+class BusinessResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user('owner')
+        self.business = create_business(self.owner)
+        self.url = reverse('businesses:business-detail', args=[self.business.pk])
+
+    def test_repeated_request_is_served_from_cache(self):
+        first = self.client.get(self.url, format='json')
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, format='json')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.client.get(self.url, format='json')['ETag']
+        response = self.client.get(self.url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_saving_the_business_invalidates_its_responses(self):
+        list_url = reverse('businesses:business-list')
+        self.client.get(self.url, format='json')
+        self.client.get(list_url, format='json')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.business.name = 'Renamed'
+            self.business.save()
+
+        self.assertEqual(self.client.get(self.url, format='json').json()['name'], 'Renamed')
+        self.assertEqual(
+            self.client.get(list_url, format='json').json()['results'][0]['name'], 'Renamed'
+        )
+
+    def test_only_listed_changes_invalidate_every_list(self):
+        list_url = reverse('businesses:business-list')
+        other = create_business(self.owner, name='Other')
+        list_generation = get_generations([BUSINESS_LIST_GENERATION])
+
+        self.client.get(list_url, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.business.phone = '0999'
+            self.business.save()
+        self.assertEqual(get_generations([BUSINESS_LIST_GENERATION]), list_generation)
+        # the cached list is rebuilt as it shows the business
+        results = self.client.get(list_url, format='json').json()['results']
+        self.assertEqual({business['phone'] for business in results}, {'0123456789', '0999'})
+
+        # nor does a review, except for the lists sorted on ratings
+        rated_url = f'{list_url}?ordering=-average_rating'
+        self.assertEqual(self.client.get(rated_url).json()['results'][0]['id'], self.business.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(
+                business=other, user=self.owner, rating=5, title='Good', content='...'
+            )
+        self.assertEqual(get_generations([BUSINESS_LIST_GENERATION]), list_generation)
+        self.assertEqual(self.client.get(rated_url).json()['results'][0]['id'], other.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.business.city = 'Cork'
+            self.business.save()
+        self.assertNotEqual(get_generations([BUSINESS_LIST_GENERATION]), list_generation)
+
+
+class BusinessAsyncReadTests(TestCase):
+    """
+    Requests served through ASGI reach the async read views, which must
+    answer exactly like the sync ones.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        owner = User.objects.create_user('owner', first_name='Owner')
+        self.businesses = []
+        for i in range(3):
+            business = create_business(
+                owner, name=f'Business {i}', latitude=53.34 + i / 100, longitude=-6.26
+            )
+            BusinessImage.objects.create(business=business, image='business_images/a.jpg', is_primary=True)
+            self.businesses.append(business)
+
+    async def assertSameAsSync(self, url, params=None):
+        response = await self.async_client.get(url, params)
+        self.assertTrue(iscoroutinefunction(response.asgi_request.resolver_match.func))
+
+        await cache.aclear()
+        expected = await sync_to_async(self.client.get)(url, params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    async def test_list_matches_sync_response(self):
+        response = await self.assertSameAsSync(
+            reverse('businesses:business-list'), {'page_size': 2, 'ordering': 'name'}
+        )
+        self.assertEqual(len(response.json()['results']), 2)
+        await self.assertSameAsSync(response.json()['next'])
+
+    async def test_detail_matches_sync_response(self):
+        business = self.businesses[0]
+        await self.assertSameAsSync(reverse('businesses:business-detail', args=[business.pk]))
+        await self.assertSameAsSync(reverse('businesses:business-detail', args=[0]))
+
+    async def test_nearby_matches_sync_response(self):
+        business = self.businesses[0]
+        response = await self.assertSameAsSync(
+            reverse('businesses:business-nearby', args=[business.pk]), {'radius': 5}
+        )
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_cached_responses_are_shared_with_sync_views(self):
+        url = reverse('businesses:business-detail', args=[self.businesses[0].pk])
+        first = async_to_sync(self.async_client.get)(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+            not_modified = async_to_sync(self.async_client.get)(
+                url, headers={'If-None-Match': first['ETag']}
+            )
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(not_modified.status_code, 304)
+
+
+class BusinessExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        owner = User.objects.create_user('owner')
+        self.dublin = create_business(
+            owner, name='Dublin, "Cafe"', hours_of_operation={'monday': [{'open': '09:00', 'close': '17:00'}]}
+        )
+        self.cork = create_business(owner, name='Cork Books', city='Cork', category='retail')
+        self.url = reverse('businesses:business-export')
+
+    def export(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export_honours_the_filters(self):
+        lines = self.export({'city': 'Dublin'}).splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        detail = self.client.get(reverse('businesses:business-detail', args=[self.dublin.pk])).json()
+        for field in ('id', 'name', 'owner', 'average_rating', 'hours_of_operation', 'created_at'):
+            self.assertEqual(row[field], detail[field])
+
+    def test_csv_export_has_a_header_and_a_line_per_business(self):
+        response = self.client.get(self.url, {'format': 'csv', 'ordering': 'name'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('businesses.csv', response['Content-Disposition'])
+
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['name'] for row in rows], ['Cork Books', 'Dublin, "Cafe"'])
+        self.assertEqual(json.loads(rows[1]['hours_of_operation'])['monday'][0]['open'], '09:00')
+        self.assertEqual(rows[0]['latitude'], '')
+
+
+    async def test_async_export_streams_from_an_async_iterator(self):
+        for params in ({'ordering': 'name'}, {'format': 'csv', 'ordering': 'name'}):
+            response = await self.async_client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            content = b''.join([chunk async for chunk in response.streaming_content])
+
+            expected = await sync_to_async(self.export)(params)
+            self.assertEqual(content.decode(), expected)
+
+
+class BusinessImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, rows):
+        path = f'{self.directory}/{name}'
+        with open(path, 'w') as file:
+            file.writelines(row if isinstance(row, str) else json.dumps(row) + '\n' for row in rows)
+        return path
+
+    def business_row(self, external_id, **kwargs):
+        row = {
+            'external_id': external_id,
+            'name': f'Imported {external_id}',
+            'category': 'retail',
+            'description': 'Imported.',
+            'email': 'imported@example.com',
+            'phone': '0123456789',
+            'address': '1 Main Street',
+            'city': 'Galway',
+            'state': 'Connacht',
+            'zip_code': 'H91',
+            'hours_of_operation': {'monday': [{'open': '09:00', 'close': '17:00'}]},
+        }
+        row.update(kwargs)
+        return row
+
+    def test_import_reports_invalid_rows_and_upserts(self):
+        path = self.write('businesses.ndjson', [
+            self.business_row('a'),
+            self.business_row('b', category='unknown'),
+            'not json\n',
+            self.business_row('c', owner=0),
+        ])
+        out, err = io.StringIO(), io.StringIO()
+        call_command(
+            'import_businesses', path, owner='owner', errors=f'{path}.errors', stdout=out, stderr=err
+        )
+        self.assertIn('Imported 1 rows, rejected 3', out.getvalue())
+        with open(f'{path}.errors') as file:
+            self.assertEqual([json.loads(line)['row'] for line in file], [2, 3, 4])
+
+        business = Business.objects.get(external_id='a')
+        self.assertEqual(business.owner, self.owner)
+        self.assertTrue(business.opening_intervals.exists())
+        self.assertTrue(Business.objects.filter(pk=business.pk, search_vector='galway').exists())
+
+        # importing the same id again updates the business
+        path = self.write('again.ndjson', [self.business_row('a', name='Renamed')])
+        call_command('import_businesses', path, owner='owner', stdout=io.StringIO())
+        self.assertEqual(Business.objects.get(external_id='a').name, 'Renamed')
+        self.assertEqual(Business.objects.count(), 1)
+
+    def test_reimports_only_update_the_given_columns(self):
+        path = self.write('businesses.ndjson', [self.business_row('a')])
+        call_command('import_businesses', path, owner='owner', stdout=io.StringIO())
+        # changed by an admin since
+        Business.objects.filter(external_id='a').update(is_active=False, is_verified=True)
+
+        # a feed leaving out the optional columns
+        row = self.business_row('a', name='Renamed')
+        del row['hours_of_operation']
+        path = self.write('partial.ndjson', [row])
+        call_command('import_businesses', path, owner='owner', stdout=io.StringIO())
+        business = Business.objects.get(external_id='a')
+        self.assertEqual(business.name, 'Renamed')
+        self.assertEqual((business.is_active, business.is_verified), (False, True))
+        self.assertEqual(business.hours_of_operation, {'monday': [{'open': '09:00', 'close': '17:00'}]})
+        self.assertTrue(business.opening_intervals.exists())
+
+    def test_cached_lists_are_invalidated_once_per_batch(self):
+        path = self.write('businesses.ndjson', [self.business_row(str(i)) for i in range(3)])
+        before, = get_generations([BUSINESS_LIST_GENERATION])
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_businesses', path, owner='owner', stdout=io.StringIO())
+        self.assertEqual(get_generations([BUSINESS_LIST_GENERATION]), [before + 1])
+
+    def test_resume_skips_the_committed_rows(self):
+        path = self.write('businesses.ndjson', [self.business_row(str(i)) for i in range(5)])
+        with open(f'{path}.import-state.json', 'w') as file:
+            json.dump({'rows': 3, 'imported': 3, 'errors': 0, 'context': {}}, file)
+
+        out = io.StringIO()
+        call_command('import_businesses', path, owner='owner', resume=True, batch_size=1, stdout=out)
+        self.assertEqual(
+            sorted(Business.objects.values_list('external_id', flat=True)), ['3', '4']
+        )
+        self.assertIn('Imported 5 rows', out.getvalue())
+
+
+class BusinessImageProcessingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('owner'))
+
+    def make_photo(self):
+        image = Image.new('RGB', (800, 600), (200, 40, 40))
+        exif = image.getexif()
+        exif[0x010f] = 'Camera Maker'
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', exif=exif.tobytes())
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_uploaded_images_are_processed_after_commit(self):
+        data = {
+            'name': 'Snapshot', 'category': 'retail', 'description': 'Photos.',
+            'email': 'shop@example.com', 'phone': '0123', 'address': '1 Quay',
+            'city': 'Cork', 'state': 'Munster', 'zip_code': 'T12',
+            'images': [self.make_photo()],
+        }
+        with self.settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_EXECUTOR='sync'):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('businesses:business-list'), data, format='multipart')
+            self.assertEqual(response.status_code, 201)
+
+            image = BusinessImage.objects.get(business_id=response.json()['id'])
+            self.assertEqual((image.image_width, image.image_height), (800, 600))
+            self.assertEqual(len(image.image_blurhash), 28)
+            self.assertEqual(sorted(image.image_renditions['webp']), ['320', '640'])
+            with image.image.open() as original:
+                self.assertEqual(len(Image.open(original).getexif()), 0)
+
+            serialized = self.client.get(
+                reverse('businesses:business-detail', args=[image.business_id]), format='json'
+            ).json()['images'][0]
+            self.assertEqual(serialized['width'], 800)
+            self.assertTrue(serialized['renditions']['webp']['320'].endswith('_320.webp'))
+
+    def stored_files(self):
+        return {
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _, names in os.walk(self.media_root) for name in names
+        }
+
+    def create_image(self):
+        business = create_business(User.objects.create_user('other'))
+        return BusinessImage.objects.create(business=business, image=self.make_photo())
+
+    def test_reprocessing_deletes_the_replaced_files(self):
+        with self.settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_EXECUTOR='sync'):
+            image = self.create_image()
+            for _ in range(2):
+                process_image_field('businesses.BusinessImage', image.pk, 'image')
+            image.refresh_from_db()
+            self.assertEqual(
+                self.stored_files(), {image.image.name} | rendition_names(image.image_renditions)
+            )
+
+    def test_originals_are_kept_until_replaced_in_the_database(self):
+        with self.settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_EXECUTOR='sync'):
+            image = self.create_image()
+            original = image.image.name
+            process_image(image.image)
+            self.assertNotEqual(image.image.name, original)
+            self.assertIn(original, self.stored_files())
+
+
+class BusinessBulkCreateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.owner = User.objects.create_user('owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = reverse('businesses:business-bulk-create')
+
+    def business_data(self, name, **kwargs):
+        data = {
+            'name': name, 'category': 'retail', 'description': 'Shop.',
+            'email': 'shop@example.com', 'phone': '0123', 'address': '1 Quay',
+            'city': 'Cork', 'state': 'Munster', 'zip_code': 'T12',
+        }
+        data.update(kwargs)
+        return data
+
+    def photo(self, name):
+        buffer = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_json_bulk_create_reports_invalid_items(self):
+        items = [
+            self.business_data('First'),
+            self.business_data('Broken', email='not-an-email'),
+            self.business_data('Third'),
+        ]
+        response = self.client.post(self.url, items, format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([item['index'] for item in response.json()['created']], [0, 2])
+        self.assertEqual(response.json()['errors'][0]['index'], 1)
+        self.assertIn('email', response.json()['errors'][0]['errors'])
+
+        created = Business.objects.filter(owner=self.owner).order_by('name')
+        self.assertEqual([business.name for business in created], ['First', 'Third'])
+        self.assertIsNotNone(created[0].search_vector)
+
+    def test_multipart_bulk_create_attaches_named_files(self):
+        items = [
+            self.business_data('Gallery', images=['a.png', 'b.png']),
+            self.business_data('Plain'),
+        ]
+        data = {
+            'businesses': json.dumps(items),
+            'a.png': self.photo('a.png'),
+            'b.png': self.photo('b.png'),
+        }
+        with self.settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_EXECUTOR='sync'):
+            # savepoint, businesses, images, search vectors and primary images,
+            # rating stats, release
+            with self.assertNumQueries(6):
+                response = self.client.post(self.url, data, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        gallery = Business.objects.get(name='Gallery')
+        self.assertEqual(
+            sorted(gallery.images.values_list('is_primary', flat=True)), [False, True]
+        )
+        self.assertEqual(gallery.primary_image, gallery.images.get(is_primary=True))
+        self.assertIsNone(Business.objects.get(name='Plain').primary_image)
+
+
+class BusinessAdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+        self.changelist_url = reverse('admin:businesses_business_changelist')
+
+    def test_changelist_queries_dont_grow_with_owners(self):
+        for i in range(3):
+            create_business(User.objects.create_user(f'owner{i}'), city=f'City {i}')
+        self.client.get(self.changelist_url)
+
+        with self.assertNumQueries(4) as queries:
+            response = self.client.get(self.changelist_url)
+        self.assertEqual(response.status_code, 200)
+        # the city filter doesn't list every distinct city
+        self.assertFalse(any('DISTINCT' in query['sql'] for query in queries.captured_queries))
+
+        for i in range(3, 10):
+            create_business(User.objects.create_user(f'owner{i}'))
+        cache.clear()
+        self.client.get(self.changelist_url)
+        with self.assertNumQueries(4):
+            self.client.get(self.changelist_url)
+
+    def test_city_filter(self):
+        create_business(self.admin, name='In Dublin', city='Dublin')
+        create_business(self.admin, name='In Cork', city='Cork')
+
+        response = self.client.get(self.changelist_url, {'city': 'Cork'})
+        self.assertContains(response, 'In Cork')
+        self.assertNotContains(response, 'In Dublin')
+
+    def test_city_suggestions(self):
+        for city in ['Dublin', 'Dublin', 'Dundalk', 'Cork']:
+            create_business(self.admin, city=city)
+        url = reverse('admin:businesses_business_suggestions', args=['city'])
+
+        response = self.client.get(url, {'q': 'Du'})
+        self.assertEqual(response.json(), {'results': ['Dublin', 'Dundalk']})
+        self.assertEqual(self.client.get(url, {'q': ''}).json(), {'results': []})
+        self.assertEqual(
+            self.client.get(reverse('admin:businesses_business_suggestions', args=['owner'])).status_code,
+            404,
+        )
+
+    def test_image_inline_is_limited(self):
+        business = create_business(self.admin)
+        BusinessImage.objects.bulk_create([
+            BusinessImage(business=business, image=f'business_images/{i}.jpg') for i in range(25)
+        ])
+
+        response = self.client.get(reverse('admin:businesses_business_change', args=[business.pk]))
+        self.assertEqual(response.context['inline_admin_formsets'][0].formset.initial_form_count(), 20)
+
+
+class BusinessVisibilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user('owner')
+        self.active = create_business(self.owner, name='Open', latitude=53.35, longitude=-6.26)
+        self.inactive = create_business(
+            self.owner, name='Closed', latitude=53.35, longitude=-6.26, is_active=False
+        )
+
+    def test_inactive_businesses_are_not_served(self):
+        response = self.client.get(reverse('businesses:business-list'))
+        self.assertEqual([business['id'] for business in response.json()['results']], [self.active.pk])
+        self.assertEqual(
+            self.client.get(reverse('businesses:business-detail', args=[self.inactive.pk])).status_code,
+            404,
+        )
+        response = self.client.get(reverse('businesses:business-nearby', args=[self.active.pk]))
+        self.assertEqual(response.json()['results'], [])
+
+    def test_updates_leaving_out_is_active_keep_the_business_inactive(self):
+        self.client.force_authenticate(self.owner)
+        url = reverse('businesses:business-detail', args=[self.inactive.pk])
+        data = {
+            'name': 'Closed', 'category': 'restaurant', 'description': 'A place to eat.',
+            'email': 'owner@example.com', 'phone': '0123456789', 'address': '1 Main Street',
+            'city': 'Dublin', 'state': 'Leinster', 'zip_code': 'D01',
+        }
+        response = self.client.put(url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.inactive.refresh_from_db()
+        self.assertFalse(self.inactive.is_active)
+
+        # while creates still default to active, form data included
+        response = self.client.post(
+            reverse('businesses:business-list'), {**data, 'name': 'New'}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Business.objects.get(pk=response.json()['id']).is_active)
+
+    def test_owners_can_still_edit_inactive_businesses(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.patch(
+            reverse('businesses:business-detail', args=[self.inactive.pk]),
+            {'is_active': True},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.client.get(reverse('businesses:business-detail', args=[self.inactive.pk])).status_code,
+            200,
+        )
+
+
+class BusinessValuesReadTests(TestCase):
+    """
+    Lists and details read through the values plans must be byte for
+    byte what the serializers render.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        owner = User.objects.create_user('owner', first_name='Ann', last_name='Owner')
+        other = User.objects.create_user('other')
+        self.businesses = []
+        for i in range(5):
+            business = create_business(
+                owner if i % 2 else other,
+                name=f'Caf\u00e9 {i} \u2028',
+                average_rating=i % 3,
+                latitude=53.35 + i / 100,
+                longitude=-6.26,
+                hours_of_operation={'monday': [{'open': '09:00', 'close': '17:00'}]},
+                logo='business_logos/logo.png' if i % 2 else None,
+                logo_renditions={'webp': {'320': 'business_logos/logo-320.webp'}},
+            )
+            BusinessImage.objects.create(business=business, image='business_images/a.jpg', is_primary=True)
+            BusinessImage.objects.create(business=business, image='business_images/b.jpg', caption='Inside')
+            self.businesses.append(business)
+
+    def assertSameAsSerializers(self, url, params=None):
+        response = self.client.get(url, params, format='json')
+        cache.clear()
+        with override_settings(VALUES_READS=False):
+            expected = self.client.get(url, params, format='json')
+        cache.clear()
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_plan_covers_the_serializer(self):
+        self.assertIsNotNone(get_plan(BusinessSerializer))
+
+    def test_list_matches_the_serializers(self):
+        url = reverse('businesses:business-list')
+        response = self.assertSameAsSerializers(url, {'page_size': 2, 'ordering': '-average_rating'})
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertSameAsSerializers(response.json()['next'])
+        self.assertSameAsSerializers(url, {'fields': 'id,owner_name,logo,primary_image'})
+        self.assertSameAsSerializers(url, {'search': 'caf'})
+
+    def test_detail_matches_the_serializers(self):
+        for business in self.businesses[:2]:
+            response = self.assertSameAsSerializers(
+                reverse('businesses:business-detail', args=[business.pk])
+            )
+            self.assertEqual(len(response.json()['images']), 2)
+        self.assertSameAsSerializers(reverse('businesses:business-detail', args=[0]))
+
+
+@override_settings(AUTOCOMPLETE_REFRESH_SECONDS=0)
+class BusinessAutocompleteTests(TestCase):
+    """
+    Suggestions come from the in-process index once it's built, follow
+    committed writes, and match those read from the database. The index
+    is built and refreshed here by calling `refresh`, as the background
+    thread would.
+    """
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.index.clear()
+        self.client = APIClient()
+        self.url = reverse('businesses:business-autocomplete')
+        self.owner = User.objects.create_user('owner')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cafe = create_business(self.owner, name='Cafe Blue', city='Dublin', review_count=3)
+            self.bistro = create_business(self.owner, name='Bistro Blue', city='Dublin', review_count=9)
+            self.bar = create_business(self.owner, name='blue bar', city='dublin', review_count=7)
+            self.bakery = create_business(self.owner, name='Blue Bakery', city='Belfast', review_count=12)
+            create_business(self.owner, name='Blue Closed', city='Boston', review_count=50, is_active=False)
+
+    def suggest(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assertSameAsDatabase(self, q, **params):
+        suggestions = self.suggest(q, **params)
+        with override_settings(AUTOCOMPLETE_IN_PROCESS=False):
+            self.assertEqual(suggestions, self.suggest(q, **params))
+        return suggestions
+
+    def test_names_and_cities_by_review_count(self):
+        autocomplete.index.refresh()
+        suggestions = self.suggest('BLUE')
+        self.assertEqual(
+            [business['id'] for business in suggestions['businesses']], [self.bakery.pk, self.bar.pk]
+        )
+        self.assertEqual(suggestions['businesses'][0], {
+            'id': self.bakery.pk, 'name': 'Blue Bakery', 'city': 'Belfast', 'review_count': 12,
+        })
+        self.assertEqual(self.suggest('b')['cities'], [
+            {'city': 'Belfast', 'businesses': 1, 'review_count': 12},
+        ])
+        # spellings of a city are counted together
+        self.assertEqual(self.suggest(' d')['cities'], [
+            {'city': 'Dublin', 'businesses': 3, 'review_count': 19},
+        ])
+        self.assertEqual(len(self.suggest('b', limit=1)['businesses']), 1)
+        self.assertEqual(self.suggest(' '), {'businesses': [], 'cities': []})
+
+    def test_lookups_never_build_the_index(self):
+        # answered from the database until the index is built
+        with self.assertNumQueries(2):
+            self.suggest('b')
+        self.assertIsNone(autocomplete.index.names)
+
+        autocomplete.index.refresh()
+        with self.assertNumQueries(0):
+            self.suggest('bi')
+
+    def test_index_follows_committed_writes(self):
+        autocomplete.index.refresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bistro.is_active = False
+            self.bistro.save()
+            self.cafe.name = 'Blue Cafe'
+            self.cafe.city = 'Boston'
+            self.cafe.save()
+            Review.objects.create(
+                business=self.bar, user=self.owner, rating=5, title='Good', content='...'
+            )
+        self.bar.refresh_from_db()
+
+        # the changed businesses are patched in with one query
+        with self.assertNumQueries(1):
+            autocomplete.index.refresh()
+        suggestions = self.suggest('b')
+        self.assertEqual(
+            [business['id'] for business in suggestions['businesses']],
+            [self.bakery.pk, self.bar.pk, self.cafe.pk],
+        )
+        self.assertEqual(suggestions['businesses'][1]['review_count'], self.bar.review_count)
+        self.assertEqual(suggestions['cities'], [
+            {'city': 'Belfast', 'businesses': 1, 'review_count': 12},
+            {'city': 'Boston', 'businesses': 1, 'review_count': 3},
+        ])
+        self.assertSameAsDatabase('b')
+        self.assertSameAsDatabase('d')
+
+    def test_changes_of_other_processes_are_patched_in(self):
+        # as the index of another process, sharing the cache
+        other = autocomplete.AutocompleteIndex()
+        other.refresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bistro.name = 'Blue Bistro'
+            self.bistro.save()
+        with self.assertNumQueries(1):
+            other.refresh()
+        self.assertEqual(other.suggest('b', 8), autocomplete.suggest_from_database('b', 8))
+
+        # changes gone from the cache can't be patched in, so the index is rebuilt
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bistro.name = 'Bistro'
+            self.bistro.save()
+        cache.delete(f'{autocomplete.CHANGE_KEY_PREFIX}{autocomplete.last_change()}')
+        built_at = other.built_at
+        other.refresh()
+        self.assertGreater(other.built_at, built_at)
+        self.assertEqual(other.suggest('b', 8), autocomplete.suggest_from_database('b', 8))
+
+    def test_index_matches_database(self):
+        autocomplete.index.refresh()
+        for q in ('b', 'blue', 'blue b', 'bl', 'c', 'x'):
+            self.assertSameAsDatabase(q)
+            self.assertSameAsDatabase(q, limit=1)
+
+    def test_database_fallback_uses_the_prefix_indexes(self):
+        queryset = Business.public.alias(key=Lower('name')).filter(key__startswith='blue')
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn('business_name_prefix_idx', plan)
+
+    def test_invalid_limit(self):
+        for limit in ('0', 'ten', str(autocomplete.MAX_LIMIT + 1)):
+            response = self.client.get(self.url, {'q': 'b', 'limit': limit})
+            self.assertEqual(response.status_code, 400)
+
+    async def test_async_matches_sync_response(self):
+        # from the database, then from the index
+        for built in (False, True):
+            if built:
+                await sync_to_async(autocomplete.index.refresh)()
+            response = await self.async_client.get(self.url, {'q': 'blue'})
+            self.assertTrue(iscoroutinefunction(response.asgi_request.resolver_match.func))
+            expected = await sync_to_async(self.client.get)(self.url, {'q': 'blue'})
+            self.assertEqual(response.content, expected.content)
+
+@override_settings(AUTOCOMPLETE_REFRESH_SECONDS=60)
+class AutocompleteRefreshThreadTests(TransactionTestCase):
+    """
+    The background thread builds the index off the request path and
+    patches in committed writes as they happen.
+    """
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.index.clear()
+        self.addCleanup(autocomplete.index.clear)
+        self.addCleanup(autocomplete.index.stop)
+        self.owner = User.objects.create_user('owner')
+        self.cafe = create_business(self.owner, name='Cafe Blue', review_count=3)
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def names(self, prefix):
+        suggestions = autocomplete.index.suggest(prefix, 8)
+        return suggestions and [business['name'] for business in suggestions['businesses']]
+
+    def test_thread_builds_and_patches_the_index(self):
+        url = reverse('businesses:business-autocomplete')
+        # the lookup starting the thread is answered from the database
+        response = APIClient().get(url, {'q': 'cafe'})
+        self.assertEqual([business['name'] for business in response.json()['businesses']], ['Cafe Blue'])
+        self.wait_for(lambda: self.names('cafe') == ['Cafe Blue'])
+
+        # woken by the write, well before the next periodic refresh
+        create_business(self.owner, name='Cafe Green', review_count=5)
+        self.wait_for(lambda: self.names('cafe') == ['Cafe Green', 'Cafe Blue'])
+
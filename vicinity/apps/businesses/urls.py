@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from apps.common.async_views import async_routes
 from . import views
 
 router = DefaultRouter()
@@ -9,4 +10,9 @@ app_name = 'businesses'
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+# served under ASGI instead, see config.urls_async
+async_urlpatterns = [
+    path('', include(async_routes(router.urls))),
+]
@@ -1,58 +1,318 @@
-from rest_framework import viewsets, filters
+import json
+from django.db.models import F
+from rest_framework import viewsets, filters, status
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Business
-from .serializers import BusinessSerializer, BusinessCreateSerializer
+from .autocomplete import MAX_LIMIT as MAX_AUTOCOMPLETE_LIMIT, asuggest, suggest
+from .models import Business, BusinessRatingStats
+from .serializers import (
+    BusinessSerializer, BusinessCreateSerializer, BusinessRatingStatsSerializer,
+    NearbyBusinessSerializer,
+)
 from .permissions import IsOwnerOrReadOnly
+from .discovery import discovery_rank
+from .geo import within_radius
+from .filters import BusinessFilterSet, BusinessSearchFilter
+from .cache import (
+    BUSINESS_LIST_GENERATION, BUSINESS_RATING_LIST_GENERATION, RATING_ORDERING_FIELDS,
+    business_generation,
+)
+from apps.common.async_views import AsyncReadMixin
+from apps.common.mixins import (
+    CachedResponseMixin, ExportMixin, PublicQuerysetMixin, ReplicaReadMixin,
+    SparseFieldsetsViewMixin, ValuesReadMixin,
+)
 
 # Create your views here.
 
-class BusinessViewSet(viewsets.ModelViewSet):
+# upper bound for the nearby radius, in kilometers
+MAX_NEARBY_RADIUS = 100.0
+
+# default radius of a discovery feed around the caller, in kilometers
+DEFAULT_DISCOVER_RADIUS = 25.0
+
+# most businesses accepted by a single bulk request
+MAX_BULK_CREATE = 100
+
+# names and cities suggested by autocomplete unless ?limit= says otherwise
+DEFAULT_AUTOCOMPLETE_LIMIT = 8
+
+class BusinessViewSet(
+    CachedResponseMixin, ReplicaReadMixin, ValuesReadMixin, AsyncReadMixin, ExportMixin,
+    PublicQuerysetMixin, SparseFieldsetsViewMixin, viewsets.ModelViewSet,
+):
     """
     ViewSet for viewing and editing businesses.
     """
     queryset = Business.objects.all()
+    public_queryset = Business.public.all()
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
         filters.OrderingFilter,
+        # after OrderingFilter so relevance wins when no ordering is given
+        BusinessSearchFilter,
     ]
-    filterset_fields = ['category', 'city', 'state', 'is_verified']
-    search_fields = ['name', 'description', 'address']
+    filterset_class = BusinessFilterSet
     ordering_fields = ['name', 'created_at', 'average_rating', 'review_count']
     ordering = ['-created_at']
+    async_actions = ('list', 'retrieve', 'nearby', 'autocomplete', 'export')
+    export_fields = (
+        'id', 'external_id', 'name', 'owner', 'category', 'description', 'email', 'phone', 'website',
+        'address', 'city', 'state', 'zip_code', 'latitude', 'longitude',
+        'hours_of_operation', 'timezone', 'average_rating', 'review_count',
+        'is_verified', 'is_active', 'created_at', 'updated_at',
+    )
+    export_filename = 'businesses'
+    # (bucket, tokens) charged per action, see apps.common.throttling
+    throttle_costs = {
+        'retrieve': ('read', 1),
+        'rating_summary': ('read', 1),
+        'list': ('read', 2),
+        'autocomplete': ('read', 1),
+        'nearby': ('read', 5),
+        'discover': ('read', 5),
+        'export': ('read', 20),
+        'create': ('write', 1),
+        'bulk_create': ('write', 10),
+        'update': ('write', 1),
+        'partial_update': ('write', 1),
+        'destroy': ('write', 1),
+    }
+    # a full-text search costs more than a plain list
+    search_throttle_cost = ('read', 5)
+
+    def get_queryset(self):
+        # load the relations the serializer reads up front
+        return self.get_serializer().apply_eager_loading(super().get_queryset())
+
+    def get_throttle_cost(self, request):
+        if self.action == 'list' and request.query_params.get('search', '').strip():
+            return self.search_throttle_cost
+        return self.throttle_costs.get(self.action)
 
     def get_serializer_class(self):
-        if self.action == 'create':
+        if self.action in ('create', 'bulk_create'):
             return BusinessCreateSerializer
+        if self.action == 'nearby' or (self.action == 'discover' and self.get_origin()):
+            return NearbyBusinessSerializer
         return BusinessSerializer
+
+    def is_response_cacheable(self, request):
+        # open_now answers change with the clock, not with the data
+        return super().is_response_cacheable(request) and 'open_now' not in request.query_params
+
+    def get_cache_generations(self):
+        if self.action in ('retrieve', 'rating_summary'):
+            return [business_generation(self.kwargs['pk'])]
+        generations = [BUSINESS_LIST_GENERATION]
+        ordering = self.request.query_params.get('ordering', '')
+        if {name.strip().lstrip('-') for name in ordering.split(',')} & RATING_ORDERING_FIELDS:
+            generations.append(BUSINESS_RATING_LIST_GENERATION)
+        return generations
+
+    def get_embedded_generations(self, data):
+        if self.action != 'list':
+            return []
+        businesses = data['results'] if isinstance(data, dict) else data
+        # lists without the ids can't be checked against their businesses
+        if any('id' not in business for business in businesses):
+            return None
+        return [business_generation(business['id']) for business in businesses]
     
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """
+        Create many businesses, with their images, in one request.
+
+        Accepts a JSON list of businesses, or a multipart form whose
+        `businesses` part is that JSON list and whose items name their
+        uploaded files in `images`. Valid items are created, invalid ones
+        are reported by index.
+        """
+        items = self.get_bulk_items(request)
+        if not 0 < len(items) <= MAX_BULK_CREATE:
+            raise ValidationError(f"Send between 1 and {MAX_BULK_CREATE} businesses.")
+
+        created, errors = [], []
+        valid_data = []
+        for index, item in enumerate(items):
+            serializer = self.get_serializer(data=item)
+            if serializer.is_valid():
+                valid_data.append(dict(serializer.validated_data, owner=request.user))
+                created.append(index)
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+
+        if valid_data:
+            businesses = self.get_serializer(many=True).create(valid_data)
+            created = [
+                {'index': index, 'id': business.pk}
+                for index, business in zip(created, businesses)
+            ]
+
+        if not errors:
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'errors': errors}, status=response_status)
+
+    def get_bulk_items(self, request):
+        items = request.data
+        if not isinstance(items, list) and 'businesses' in items:
+            items = items['businesses']
+            if isinstance(items, str):
+                try:
+                    items = json.loads(items)
+                except ValueError:
+                    raise ValidationError({'businesses': "Must be a JSON list."})
+
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise ValidationError("Expected a list of businesses.")
+
+        # swap uploaded file names for the files themselves
+        for item in items:
+            if isinstance(item.get('images'), list):
+                item['images'] = [
+                    request.FILES.get(name, name) if isinstance(name, str) else name
+                    for name in item['images']
+                ]
+        return items
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Business names and cities starting with ?q=, case insensitively,
+        the most reviewed first; at most ?limit= of each. See
+        apps.businesses.autocomplete.
+        """
+        return Response(suggest(*self.get_autocomplete_query()))
+
+    async def aautocomplete(self, request):
+        return Response(await asuggest(*self.get_autocomplete_query()))
+
+    def get_autocomplete_query(self):
+        """Return the (?q=, ?limit=) query parameters."""
+        params = self.request.query_params
+        try:
+            limit = int(params.get('limit', DEFAULT_AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': "A valid integer is required."})
+        if not 0 < limit <= MAX_AUTOCOMPLETE_LIMIT:
+            raise ValidationError(
+                {'limit': f"Must be between 1 and {MAX_AUTOCOMPLETE_LIMIT}."}
+            )
+        return params.get('q', ''), limit
+
+    @action(detail=True, methods=['get'], url_path='rating-summary')
+    def rating_summary(self, request, pk=None):
+        """
+        Star distribution, last review time and recent average rating of a
+        business, read from its BusinessRatingStats row.
+        """
+        return self.cached_response(self.get_rating_summary, request, pk=pk)
+
+    def get_rating_summary(self, request, pk=None):
+        stats = get_object_or_404(
+            BusinessRatingStats.objects.filter(business__in=Business.public.all()), pk=pk
+        )
+        return Response(BusinessRatingStatsSerializer(stats).data)
+
     @action(detail=True, methods=['get'])
     def nearby(self, request, pk=None):
         """Find nearby businesses within a certain radius."""
-        business = self.get_object()
-        radius = float(request.query_params.get('radius', 5.0)) # radius is in kilometers
-
-        # nearby query using distance calculation
-        nearby = Business.objects.filter(
-            '''
-            SELECT *,
-                (6371 * acos(cos(radians(%s)) * cos(radians(latitude)) *
-                cos(radians(longitude) - radians(%s)) +
-                sin(radians(%s)) * sin(radians(latitude)))) AS distance
-            FROM businesses_business
-            WHERE id != %s
-            HAVING distance < %s
-            ORDER BY distance
-            LIMIT 10
-        ''', [business.latitude, business.longitude,
-              business.latitude, business.id, radius])
-        
-        serializer = BusinessSerializer(nearby, many=True)
+        nearby = self.get_nearby_queryset(self.get_object())
+
+        page = self.paginate_queryset(nearby)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(nearby, many=True)
+        return Response(serializer.data)
+
+    async def anearby(self, request, pk=None):
+        return await self.alist_response(self.get_nearby_queryset(await self.aget_object()))
+
+    def get_nearby_queryset(self, business):
+        if business.latitude is None or business.longitude is None:
+            raise ValidationError("This business has no coordinates.")
+
+        radius = self.get_radius(default=5.0)
+
+        # bounding box prefilter on the indexed coordinates, exact
+        # distance only for the candidates inside it
+        return within_radius(
+            self.get_queryset().exclude(pk=business.pk),
+            business.latitude,
+            business.longitude,
+            radius,
+        )
+
+    @action(detail=False, methods=['get'])
+    def discover(self, request):
+        """
+        Businesses ranked by their precomputed discovery score; see
+        apps.businesses.discovery.
+
+        Given ?latitude= and ?longitude=, only businesses within ?radius=
+        kilometers (25 by default) are ranked, with a penalty per
+        kilometer of distance.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        origin = self.get_origin()
+        if origin is None:
+            # a plain walk of the (-discovery_score, id) index
+            queryset = queryset.order_by('-discovery_score', 'id')
+        else:
+            queryset = within_radius(
+                queryset, *origin, self.get_radius(default=DEFAULT_DISCOVER_RADIUS)
+            ).annotate(
+                rank=discovery_rank(F('distance'))
+            ).order_by('-rank', 'id')
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
+
+    def get_origin(self):
+        """Return the (latitude, longitude) query parameters, if given."""
+        params = self.request.query_params
+        if 'latitude' not in params and 'longitude' not in params:
+            return None
+
+        origin = []
+        for name, bound in (('latitude', 90), ('longitude', 180)):
+            try:
+                value = float(params[name])
+            except (KeyError, ValueError):
+                raise ValidationError({name: "A valid number is required."})
+            if not -bound <= value <= bound:
+                raise ValidationError({name: f"Must be between -{bound} and {bound}."})
+            origin.append(value)
+        return tuple(origin)
+
+    def get_radius(self, default):
+        """Return the ?radius= query parameter, in kilometers."""
+        try:
+            radius = float(self.request.query_params.get('radius', default))
+        except ValueError:
+            raise ValidationError({'radius': "A valid number is required."})
+        if not 0 < radius <= MAX_NEARBY_RADIUS:
+            raise ValidationError(
+                {'radius': f"Must be greater than 0 and at most {MAX_NEARBY_RADIUS}."}
+            )
+        return radius
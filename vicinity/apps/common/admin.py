@@ -1,3 +1,168 @@
+import hashlib
+from urllib.parse import parse_qsl
 from django.contrib import admin
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms.models import BaseInlineFormSet
+from django.http import Http404, JsonResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+
+ADMIN_COUNT_KEY_PREFIX = 'vicinity:admin-count:'
 
 # Register your models here.
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator of admin changelists over large tables.
+
+    An unfiltered table past `estimate_threshold` rows is counted with the
+    planner's estimate, read from pg_class, instead of a full scan. Other
+    counts are exact but cached for `count_timeout` seconds, so paging
+    through a filtered list counts it once.
+    """
+    estimate_threshold = 100_000
+    count_timeout = 300
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = _estimated_rows(queryset)
+            if estimate > self.estimate_threshold:
+                return estimate
+
+        sql, params = queryset.query.sql_with_params()
+        key = ADMIN_COUNT_KEY_PREFIX + hashlib.md5(repr((sql, params)).encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, self.count_timeout)
+        return count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin whose changelist stays cheap on tables with millions of
+    rows: counts are estimated or cached, the unfiltered total isn't
+    counted next to a filtered one, and TypeaheadFilter list filters get
+    their suggestions from `<changelist>/suggestions/<parameter>/`.
+    """
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+    def get_urls(self):
+        info = self.opts.app_label, self.opts.model_name
+        return [
+            path(
+                'suggestions/<str:parameter>/',
+                self.admin_site.admin_view(self.suggestions_view),
+                name='%s_%s_suggestions' % info,
+            ),
+        ] + super().get_urls()
+
+    def suggestions_view(self, request, parameter):
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        for list_filter in self.list_filter:
+            if (
+                isinstance(list_filter, type) and issubclass(list_filter, TypeaheadFilter)
+                and list_filter.parameter_name == parameter
+            ):
+                break
+        else:
+            raise Http404
+        values = list_filter.suggestions(self.model._default_manager.all(), request.GET.get('q', ''))
+        return JsonResponse({'results': values})
+
+
+class TypeaheadFilter(admin.SimpleListFilter):
+    """
+    List filter on the exact value of `field_name`, typed into a text box
+    that suggests matching values by prefix, rather than a link for every
+    distinct value, which takes a DISTINCT over the whole table to list.
+
+    Suggestions come from a range scan of an index on the field; use it on
+    a LargeTableAdmin, which serves them.
+    """
+    template = 'admin/common/typeahead_filter.html'
+    field_name = None
+    suggestions_limit = 10
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.model_admin = model_admin
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.field_name: self.value()})
+        return queryset
+
+    def choices(self, changelist):
+        info = self.model_admin.opts.app_label, self.model_admin.opts.model_name
+        query_string = changelist.get_query_string(remove=[self.parameter_name])
+        yield {
+            'value': self.value() or '',
+            'parameter_name': self.parameter_name,
+            # the other filters, kept as hidden fields of the form
+            'params': parse_qsl(query_string[1:]),
+            'clear_query_string': query_string,
+            'suggestions_url': reverse(
+                'admin:%s_%s_suggestions' % info,
+                args=[self.parameter_name],
+                current_app=self.model_admin.admin_site.name,
+            ),
+        }
+
+    @classmethod
+    def suggestions(cls, queryset, prefix):
+        """The first distinct values of the field starting with `prefix`."""
+        if not prefix:
+            return []
+        field = cls.field_name
+        # bounded on both sides, so the index scan stops past the prefix
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return list(
+            queryset.filter(**{
+                f'{field}__gte': prefix, f'{field}__lt': upper, f'{field}__startswith': prefix,
+            })
+            .order_by(field)
+            .values_list(field, flat=True)
+            .distinct()[:cls.suggestions_limit]
+        )
+
+
+class LimitedInlineFormSet(BaseInlineFormSet):
+    """
+    Inline formset editing at most `max_objects` of the related objects,
+    the first ones in their default ordering, rather than all of them.
+    """
+    max_objects = 20
+
+    def get_queryset(self):
+        if not hasattr(self, '_limited_queryset'):
+            self._limited_queryset = super().get_queryset()[:self.max_objects]
+        return self._limited_queryset
+
+
+def _estimated_rows(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return -1
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # -1 until the table has been vacuumed or analyzed
+    return row[0] if row else -1
@@ -0,0 +1,202 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.urls import URLPattern
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.response import Response
+from . import metrics
+
+# rows fetched per round trip by unpaginated async lists
+CHUNK_SIZE = 100
+
+
+class AsyncReadMixin:
+    """
+    Viewset mixin serving read actions natively under ASGI.
+
+    Each action in `async_actions` has an async handler named
+    `a<action>`, which reads through the async ORM and cache; `async_routes`
+    swaps the router's views for ones dispatching to them. Other methods
+    of the same routes, writes included, still run the sync handlers.
+
+    Anonymous requests don't touch the database to authenticate, so a
+    typical read never leaves the event loop except for its queries.
+    """
+    async_actions = ('list', 'retrieve')
+
+    @classmethod
+    def as_async_view(cls, sync_view):
+        """
+        Return an async view for the route served by `sync_view`, a view
+        returned by `as_view()`.
+        """
+        actions = sync_view.actions
+        sync_handler = sync_to_async(sync_view)
+
+        async def view(request, *args, **kwargs):
+            action = actions.get(request.method.lower())
+            if action not in cls.async_actions:
+                return await sync_handler(request, *args, **kwargs)
+
+            self = cls(**sync_view.initkwargs)
+            self.action_map = actions
+            for method, name in actions.items():
+                setattr(self, method, getattr(self, name))
+            return await self.adispatch(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = sync_view.initkwargs
+        view.actions = actions
+        return csrf_exempt(view)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """Async version of `dispatch` for the actions in `async_actions`."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            handler = getattr(self, f'a{self.action}')
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return _rendered(self.response)
+
+    async def ainitial(self, request, *args, **kwargs):
+        """Async version of `initial`."""
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = (
+            self.perform_content_negotiation(request)
+        )
+        request.version, request.versioning_scheme = self.determine_version(
+            request, *args, **kwargs
+        )
+
+        await self.aperform_authentication(request)
+        self.check_permissions(request)
+        await self.acheck_throttles(request)
+
+    async def acheck_throttles(self, request):
+        """Async version of `check_throttles`."""
+        durations = []
+        for throttle in self.get_throttles():
+            if hasattr(throttle, 'aallow_request'):
+                allowed = await throttle.aallow_request(request, self)
+            else:
+                allowed = await sync_to_async(throttle.allow_request)(request, self)
+            if not allowed:
+                durations.append(throttle.wait())
+
+        if durations:
+            durations = [duration for duration in durations if duration is not None]
+            self.throttled(request, max(durations, default=None))
+
+    async def aperform_authentication(self, request):
+        if not _has_credentials(request):
+            # what the authenticators would conclude, without a session lookup
+            request._not_authenticated()
+            return
+        await sync_to_async(self.perform_authentication)(request)
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return await self.alist_response(queryset)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(await self.aserialize(instance))
+
+    async def alist_response(self, queryset):
+        """Serialize a page of `queryset`, or all of it without pagination."""
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(await self.aserialize(page, many=True))
+
+        instances = [instance async for instance in queryset.aiterator(chunk_size=CHUNK_SIZE)]
+        return Response(await self.aserialize(instances, many=True))
+
+    async def aget_object(self):
+        """Async version of `get_object`."""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            instance = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError):
+            # the message of the sync get_object_or_404
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+    async def aserialize(self, instance, many=False):
+        """
+        Return the serialized data of `instance`, which must not need
+        further queries once `aprepare_serializer` has run.
+        """
+        serializer = self.get_serializer(instance, many=many)
+        await self.aprepare_serializer(serializer, instance if many else [instance])
+        return serializer.data
+
+    async def aprepare_serializer(self, serializer, instances):
+        """Hook to load, asynchronously, what the serializer reads lazily."""
+
+
+def async_routes(urlpatterns):
+    """
+    Return `urlpatterns`, a router's URLs, with the routes of
+    AsyncReadMixin viewsets served by their async views.
+    """
+    routes = []
+    for pattern in urlpatterns:
+        view_class = getattr(pattern.callback, 'cls', None)
+        actions = getattr(pattern.callback, 'actions', None) or {}
+        if (
+            isinstance(pattern, URLPattern)
+            and isinstance(view_class, type)
+            and issubclass(view_class, AsyncReadMixin)
+            and set(actions.values()) & set(view_class.async_actions)
+        ):
+            pattern = URLPattern(
+                pattern.pattern,
+                view_class.as_async_view(pattern.callback),
+                pattern.default_args,
+                pattern.name,
+            )
+        routes.append(pattern)
+    return routes
+
+
+def _has_credentials(request):
+    return (
+        'HTTP_AUTHORIZATION' in request.META
+        or settings.SESSION_COOKIE_NAME in request.COOKIES
+    )
+
+
+def _rendered(response):
+    """
+    Render `response` here and return it as a plain HttpResponse, which
+    Django's async handler sends as it is instead of rendering it in a
+    thread.
+    """
+    if not isinstance(response, Response):
+        return response
+
+    request_metrics = metrics.current_metrics()
+    if request_metrics is None:
+        response.render()
+    else:
+        request_metrics.time_serialization(response.render)
+    return HttpResponse(
+        response.content, status=response.status_code, headers=dict(response.items())
+    )
@@ -0,0 +1,59 @@
+import time
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY_PREFIX = 'vicinity:generation:'
+
+
+def _generation_key(name):
+    return f'{GENERATION_KEY_PREFIX}{name}'
+
+
+def _initial_generation():
+    # start from the clock so an evicted counter never reuses old values
+    return time.time_ns()
+
+
+def get_generations(names):
+    """
+    Return the current generation of each named cache scope.
+
+    Cached entries embed these numbers in their keys, so bumping a
+    generation orphans every entry built from it.
+    """
+    keys = [_generation_key(name) for name in names]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _initial_generation(), None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+async def aget_generations(names):
+    """Async version of `get_generations`."""
+    keys = [_generation_key(name) for name in names]
+    values = await cache.aget_many(keys)
+    for key in keys:
+        if key not in values:
+            await cache.aadd(key, _initial_generation(), None)
+            values[key] = await cache.aget(key)
+    return [values[key] for key in keys]
+
+
+def bump_generations(*names):
+    """Invalidate every cache entry built from the named scopes."""
+    for name in names:
+        key = _generation_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), None)
+
+
+def bump_generations_on_commit(*names):
+    """
+    Bump the named generations once the current transaction commits, so
+    a concurrent request can't cache data from before the write.
+    """
+    transaction.on_commit(lambda: bump_generations(*names))
@@ -0,0 +1,247 @@
+import io
+import logging
+import math
+import multiprocessing
+import posixpath
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# widths, in pixels, of the generated renditions
+RENDITION_WIDTHS = (320, 640, 1280)
+
+# AVIF needs a Pillow build with libavif
+RENDITION_FORMATS = ('webp', 'avif') if features.check('avif') else ('webp',)
+
+BLURHASH_COMPONENTS = (4, 3)
+
+_executors = {}
+
+
+# Processing
+
+def processed_field_names(field_name):
+    """Names of the model fields storing the processing results of `field_name`."""
+    return [f'{field_name}_{suffix}' for suffix in ('width', 'height', 'blurhash', 'renditions')]
+
+
+def process_image(field_file):
+    """
+    Strip the metadata of an uploaded image, write its renditions and
+    return the values for the fields named by `processed_field_names`.
+
+    The original is rewritten upright and without EXIF data, to a new
+    name set on `field_file`; the caller deletes the old file once the
+    instance points at the new one.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as source:
+        original = Image.open(source)
+        image_format = original.format
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    # re-encoding without passing exif/info drops all metadata; the
+    # original still exists, so this is saved under a new name
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    field_file.name = storage.save(field_file.name, ContentFile(buffer.getvalue()))
+
+    renditions = {}
+    stem, _ = posixpath.splitext(field_file.name)
+    directory, basename = posixpath.split(stem)
+    rgb = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    for rendition_format in RENDITION_FORMATS:
+        renditions[rendition_format] = {}
+        for width in RENDITION_WIDTHS:
+            # never upscale, but always keep the smallest rendition
+            if width > image.width and width != RENDITION_WIDTHS[0]:
+                break
+            resized = rgb.copy()
+            resized.thumbnail((width, image.height))
+            buffer = io.BytesIO()
+            resized.save(buffer, format=rendition_format.upper(), quality=80)
+            name = posixpath.join(directory, 'renditions', f'{basename}_{width}.{rendition_format}')
+            renditions[rendition_format][str(width)] = storage.save(name, ContentFile(buffer.getvalue()))
+
+    return {
+        'width': image.width,
+        'height': image.height,
+        'blurhash': encode_blurhash(image),
+        'renditions': renditions,
+    }
+
+
+def rendition_names(renditions):
+    """Storage names of the files in an `*_renditions` value."""
+    return {name for widths in renditions.values() for name in widths.values()}
+
+
+def process_image_field(model_label, pk, field_name):
+    """
+    Worker entry point: process one image field of a saved instance and
+    store the results on it.
+
+    The files replaced, the original and the renditions of an earlier
+    run, are only deleted once the instance points at the new ones.
+    """
+    model = apps.get_model(model_label)
+    try:
+        instance = model._default_manager.get(pk=pk)
+        field_file = getattr(instance, field_name)
+        if not field_file:
+            return
+
+        replaced = {field_file.name} | rendition_names(getattr(instance, f'{field_name}_renditions'))
+        results = process_image(field_file)
+        for suffix, value in results.items():
+            setattr(instance, f'{field_name}_{suffix}', value)
+        instance.save(update_fields=[field_name] + processed_field_names(field_name))
+
+        replaced -= {field_file.name} | rendition_names(results['renditions'])
+        for name in replaced:
+            field_file.storage.delete(name)
+    except model.DoesNotExist:
+        pass
+    except Exception:
+        logger.exception("Processing %s of %s %s failed.", field_name, model_label, pk)
+
+
+def process_image_later(instance, field_name):
+    """
+    Process an uploaded image off the request, once the current
+    transaction has committed.
+    """
+    model_label = instance._meta.label
+    pk = instance.pk
+    transaction.on_commit(lambda: submit(process_image_field, model_label, pk, field_name))
+
+
+# Worker pool
+
+def _initialize_worker():
+    import django
+    django.setup()
+
+
+def get_executor():
+    """
+    Return the executor selected by settings.IMAGE_PROCESSING_EXECUTOR:
+    'process' (a pool of spawned worker processes), 'thread' or 'sync'.
+    """
+    backend = settings.IMAGE_PROCESSING_EXECUTOR
+    if backend == 'sync':
+        return None
+
+    if backend not in _executors:
+        workers = settings.IMAGE_PROCESSING_WORKERS
+        if backend == 'process':
+            _executors[backend] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_initialize_worker,
+            )
+        elif backend == 'thread':
+            _executors[backend] = ThreadPoolExecutor(max_workers=workers)
+        else:
+            raise ValueError(f"Unknown IMAGE_PROCESSING_EXECUTOR {backend!r}.")
+    return _executors[backend]
+
+
+def _run_in_worker(function, *args):
+    # workers hold their own long-lived connections
+    close_old_connections()
+    try:
+        return function(*args)
+    finally:
+        close_old_connections()
+
+
+def submit(function, *args):
+    executor = get_executor()
+    if executor is None:
+        return function(*args)
+    return executor.submit(_run_in_worker, function, *args)
+
+
+# BlurHash (https://blurha.sh)
+
+BASE83_CHARACTERS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+
+def _base83(value, length):
+    return ''.join(
+        BASE83_CHARACTERS[(value // 83 ** (length - i - 1)) % 83] for i in range(length)
+    )
+
+
+def _srgb_to_linear(value):
+    value = value / 255
+    if value <= 0.04045:
+        return value / 12.92
+    return ((value + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def encode_blurhash(image, components=BLURHASH_COMPONENTS):
+    """Encode a BlurHash placeholder string for a PIL image."""
+    x_components, y_components = components
+    # the placeholder is tiny, so a thumbnail is plenty to sample from
+    small = image.convert('RGB')
+    small.thumbnail((32, 32))
+    width, height = small.size
+    pixels = [tuple(_srgb_to_linear(channel) for channel in pixel) for pixel in small.getdata()]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                basis_y = math.cos(math.pi * j * y / height)
+                for x in range(width):
+                    basis = normalisation * math.cos(math.pi * i * x / width) * basis_y
+                    pixel = pixels[y * width + x]
+                    r += basis * pixel[0]
+                    g += basis * pixel[1]
+                    b += basis * pixel[2]
+            scale = 1 / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    blurhash = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_maximum = max(abs(value) for factor in ac for value in factor)
+        quantised_maximum = max(0, min(82, int(actual_maximum * 166 - 0.5)))
+        maximum = (quantised_maximum + 1) / 166
+        blurhash += _base83(quantised_maximum, 1)
+    else:
+        maximum = 1
+        blurhash += _base83(0, 1)
+
+    blurhash += _base83(
+        (_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4
+    )
+    for factor in ac:
+        r, g, b = (
+            max(0, min(18, int(_sign_pow(value / maximum, 0.5) * 9 + 9.5)))
+            for value in factor
+        )
+        blurhash += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return blurhash
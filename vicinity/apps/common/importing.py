@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+import os
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ValidationError
+
+
+class ImportCommand(BaseCommand):
+    """
+    Base of the bulk import commands.
+
+    Rows are streamed from a CSV or NDJSON file and handled in batches:
+    `validate_batch` checks a batch, looking up references with one query
+    per batch rather than per row, and `save_batch` writes the valid rows
+    with bulk statements in a transaction of its own. Derived data that
+    spans batches is deferred to `finish`.
+
+    Rejected rows are reported with their row number, optionally to an
+    NDJSON file. After each committed batch the number of rows consumed
+    is written to a state file, so --resume continues an interrupted
+    import from there.
+    """
+    # columns holding JSON, which CSV files store as text
+    json_fields = ()
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or NDJSON file to import, '-' for stdin.")
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ndjson'],
+            help="Input format; guessed from the file extension by default.",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--errors', help="Write rejected rows and their errors, as NDJSON, to this file.")
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help="Skip the rows a previous, interrupted run of this file already committed.",
+        )
+        parser.add_argument('--state', help="State file; <path>.import-state.json by default.")
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        path = options['path']
+        state_path = options['state'] or (None if path == '-' else f'{path}.import-state.json')
+        if options['resume'] and state_path is None:
+            raise CommandError("--resume needs a --state file when reading stdin.")
+
+        state = {'rows': 0, 'imported': 0, 'errors': 0, 'context': {}}
+        if options['resume'] and os.path.exists(state_path):
+            with open(state_path) as file:
+                state = json.load(file)
+        self.context = state['context']
+
+        errors_file = open(options['errors'], 'a' if options['resume'] else 'w') if options['errors'] else None
+        start = time.perf_counter()
+        processed = 0
+        try:
+            with _open_input(path) as file:
+                rows = self.read_rows(file, options['format'] or _guess_format(path))
+                batch = []
+                for number, row in enumerate(rows, start=1):
+                    if number <= state['rows']:
+                        continue
+                    batch.append((number, row))
+                    if len(batch) >= options['batch_size']:
+                        processed += self.import_batch(batch, errors_file, state, state_path)
+                        batch = []
+                        self.report_progress(state, start)
+                if batch:
+                    processed += self.import_batch(batch, errors_file, state, state_path)
+
+            self.finish(self.context)
+        finally:
+            if errors_file is not None:
+                errors_file.close()
+
+        seconds = time.perf_counter() - start
+        rate = processed / seconds if seconds else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {state['imported']} rows, rejected {state['errors']}, "
+            f"{rate:.0f} rows/s this run."
+        ))
+        if state_path is not None and os.path.exists(state_path):
+            os.remove(state_path)
+
+    def read_rows(self, file, input_format):
+        """Yield the rows of `file` as dicts, one at a time."""
+        if input_format == 'csv':
+            for row in csv.DictReader(file):
+                yield self.parse_csv_row(row)
+            return
+
+        for line in file:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as exc:
+                    yield InvalidRow(f"Invalid JSON: {exc}")
+
+    def parse_csv_row(self, row):
+        # empty cells mean "not given", as a missing key does in NDJSON
+        row = {key: value for key, value in row.items() if value not in ('', None)}
+        for field in self.json_fields:
+            if field in row:
+                try:
+                    row[field] = json.loads(row[field])
+                except ValueError:
+                    pass  # left to the validation to reject
+        return row
+
+    def import_batch(self, batch, errors_file, state, state_path):
+        """
+        Validate and save a batch of (row number, row) pairs, then record it in
+        the state file. Returns the number of rows handled.
+        """
+        rejected = {}
+        rows = []
+        for number, row in batch:
+            if isinstance(row, InvalidRow):
+                rejected[number] = {'non_field_errors': [row.message]}
+            elif not isinstance(row, dict):
+                rejected[number] = {'non_field_errors': ["Expected an object."]}
+            else:
+                rows.append((number, row))
+
+        valid, errors = self.validate_batch(rows)
+        rejected.update(errors)
+        try:
+            with transaction.atomic():
+                self.save_batch([item for _, item in valid])
+        except DatabaseError:
+            # a constraint the validation missed: find the offending rows
+            # with one savepoint per row
+            for number, item in valid:
+                try:
+                    with transaction.atomic():
+                        self.save_batch([item])
+                except DatabaseError as exc:
+                    rejected[number] = {'non_field_errors': [str(exc).strip()]}
+
+        for number, row in batch:
+            if number not in rejected:
+                continue
+            self.stderr.write(f"Row {number}: {json.dumps(rejected[number], default=str)}")
+            if errors_file is not None:
+                errors_file.write(json.dumps(
+                    {'row': number, 'errors': rejected[number], 'data': row}, default=str
+                ) + '\n')
+
+        state['rows'] = batch[-1][0]
+        state['imported'] += len(batch) - len(rejected)
+        state['errors'] += len(rejected)
+        if state_path is not None:
+            with open(state_path, 'w') as file:
+                json.dump(state, file)
+        return len(batch)
+
+    def validate_rows(self, serializer, batch):
+        """
+        Validate the rows of a batch with one `serializer` instance, so its
+        fields are built once rather than per row. Returns
+        ({number: validated data}, {number: errors}).
+        """
+        valid, errors = {}, {}
+        for number, row in batch:
+            try:
+                valid[number] = serializer.run_validation(row)
+            except ValidationError as exc:
+                errors[number] = exc.detail
+        return valid, errors
+
+    def report_progress(self, state, start):
+        if self.verbosity < 2:
+            return
+        seconds = time.perf_counter() - start
+        self.stdout.write(
+            f"{state['rows']} rows read, {state['imported']} imported, "
+            f"{state['errors']} rejected ({seconds:.1f}s)"
+        )
+
+    def validate_batch(self, batch):
+        """
+        Return ([(number, item)], {number: errors}) for a batch of
+        (row number, row) pairs; items are whatever `save_batch` takes.
+        """
+        raise NotImplementedError
+
+    def save_batch(self, items):
+        """Write the validated items, in the transaction of the batch."""
+        raise NotImplementedError
+
+    def finish(self, context):
+        """
+        Run the work deferred to the end of the import. `context` is the
+        dict subclasses keep in `self.context`, saved with the state so
+        a resumed run finishes for the rows of earlier runs too.
+        """
+
+
+class InvalidRow:
+    """A line of the input that couldn't be parsed into a row."""
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+def _guess_format(path):
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    raise CommandError("Can't tell the input format from the file name; pass --format.")
+
+
+def _open_input(path):
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
@@ -0,0 +1,144 @@
+import json
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from apps.businesses.models import Business
+from apps.common.metrics import percentile
+
+# a private cache per run, so results don't depend on what's already cached
+BENCHMARK_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vicinity-benchmark',
+    }
+}
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+SEARCH_TERMS = ['bistro', 'books', 'barbers', 'cinema', 'pharmacy', 'golden', 'harbour', 'cafe']
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the business and review endpoints through the test client and "
+        "print queries per request and latency percentiles as JSON. Run it "
+        "against a database filled by generate_data; writes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help="Timed requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed requests per endpoint.")
+        parser.add_argument(
+            '--cached',
+            action='store_true',
+            help="Let responses be cached between requests, instead of timing every one cold.",
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the JSON report to this file too.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        caches = BENCHMARK_CACHE if options['cached'] else NO_CACHE
+
+        with override_settings(ALLOWED_HOSTS=['testserver'], CACHES=caches, THROTTLE_BUCKETS={}):
+            with transaction.atomic():
+                report = self.run(options)
+                # the review create benchmark mustn't leave anything behind
+                transaction.set_rollback(True)
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+
+    def run(self, options):
+        business_ids = list(
+            Business.public.filter(latitude__isnull=False)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:2000]
+        )
+        if not business_ids:
+            raise CommandError("No businesses with coordinates; run generate_data first.")
+        business_ids = self.rng.sample(business_ids, min(len(business_ids), 200))
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(f'benchmark-{time.time_ns()}'))
+        # each created review needs a business this user hasn't reviewed yet
+        unreviewed = iter(business_ids)
+
+        def create_review():
+            business_id = next(unreviewed, None)
+            if business_id is None:
+                return None
+            return self.client.post(reverse('reviews:review-list'), {
+                'business': business_id,
+                'rating': self.rng.randint(1, 5),
+                'title': 'Benchmark',
+                'content': 'Written by benchmark_api.',
+            }, format='json')
+
+        endpoints = {
+            'business-list': lambda: self.client.get(reverse('businesses:business-list')),
+            'business-search': lambda: self.client.get(
+                reverse('businesses:business-list'), {'search': self.rng.choice(SEARCH_TERMS)}
+            ),
+            'business-nearby': lambda: self.client.get(
+                reverse('businesses:business-nearby', args=[self.rng.choice(business_ids)]),
+                {'radius': 10},
+            ),
+            'business-detail': lambda: self.client.get(
+                reverse('businesses:business-detail', args=[self.rng.choice(business_ids)])
+            ),
+            'review-list': lambda: self.client.get(reverse('reviews:review-list')),
+            'review-list-by-business': lambda: self.client.get(
+                reverse('reviews:review-list'), {'business': self.rng.choice(business_ids)}
+            ),
+            'review-create': create_review,
+        }
+
+        results = {}
+        for name, request in endpoints.items():
+            for _ in range(options['warmup']):
+                if name != 'review-create':
+                    request()
+            results[name] = self.measure(request, options['requests'])
+
+        return {
+            'requests_per_endpoint': options['requests'],
+            'cached': options['cached'],
+            'businesses': Business.objects.count(),
+            'endpoints': results,
+        }
+
+    def measure(self, request, count):
+        durations, queries, errors = [], [], 0
+        for _ in range(count):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = request()
+                duration = time.perf_counter() - start
+            if response is None:
+                break
+            if response.status_code >= 400:
+                errors += 1
+            durations.append(duration * 1000)
+            queries.append(len(captured))
+
+        return {
+            'requests': len(durations),
+            'errors': errors,
+            'queries_per_request': sum(queries) / len(queries) if queries else None,
+            'max_queries': max(queries, default=None),
+            'p50_ms': _round(percentile(durations, 50)),
+            'p99_ms': _round(percentile(durations, 99)),
+            'mean_ms': _round(sum(durations) / len(durations) if durations else None),
+        }
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from apps.businesses.models import Business
+from apps.common.metrics import percentile
+from apps.reviews.models import Review
+from .benchmark_api import BENCHMARK_CACHE, NO_CACHE, _round
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the read endpoints served through WSGI "
+        "(sync views, one thread per concurrent client) and ASGI (async "
+        "views, one event loop), using the in-process test clients, and "
+        "print requests per second and latency percentiles as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Timed requests per endpoint.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Requests in flight at once.")
+        parser.add_argument(
+            '--cached',
+            action='store_true',
+            help="Let responses be cached between requests, instead of timing every one cold.",
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the JSON report to this file too.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        business_ids = list(
+            Business.public.filter(latitude__isnull=False)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:2000]
+        )
+        review_ids = list(Review.published.order_by('pk').values_list('pk', flat=True)[:2000])
+        if not business_ids or not review_ids:
+            raise CommandError("No businesses or reviews; run generate_data first.")
+
+        # the same request paths for both servers
+        endpoints = {
+            'business-list': lambda: (reverse('businesses:business-list'), {}),
+            'business-detail': lambda: (
+                reverse('businesses:business-detail', args=[rng.choice(business_ids)]), {}
+            ),
+            'business-nearby': lambda: (
+                reverse('businesses:business-nearby', args=[rng.choice(business_ids)]),
+                {'radius': 10},
+            ),
+            'review-list': lambda: (reverse('reviews:review-list'), {}),
+            'review-list-by-business': lambda: (
+                reverse('reviews:review-list'), {'business': rng.choice(business_ids)}
+            ),
+            'review-detail': lambda: (
+                reverse('reviews:review-detail', args=[rng.choice(review_ids)]), {}
+            ),
+        }
+
+        caches = BENCHMARK_CACHE if options['cached'] else NO_CACHE
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver'], CACHES=caches, THROTTLE_BUCKETS={}):
+            for name, make_request in endpoints.items():
+                requests = [make_request() for _ in range(options['requests'])]
+                results[name] = {
+                    'wsgi': self.run_wsgi(requests, options['concurrency']),
+                    'asgi': async_to_sync(self.run_asgi)(requests, options['concurrency']),
+                }
+                results[name]['speedup'] = _round(
+                    results[name]['asgi']['requests_per_second'] /
+                    results[name]['wsgi']['requests_per_second']
+                )
+
+        report = {
+            'requests_per_endpoint': options['requests'],
+            'concurrency': options['concurrency'],
+            'cached': options['cached'],
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+
+    def run_wsgi(self, requests, concurrency):
+        durations, statuses = [], []
+        lock = threading.Lock()
+        pending = iter(requests)
+
+        def worker():
+            client = Client()
+            try:
+                while True:
+                    with lock:
+                        request = next(pending, None)
+                    if request is None:
+                        return
+                    start = time.perf_counter()
+                    response = client.get(*request)
+                    durations.append(time.perf_counter() - start)
+                    statuses.append(response.status_code)
+            finally:
+                # every thread has its own database connection
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return _summary(durations, statuses, time.perf_counter() - start)
+
+    async def run_asgi(self, requests, concurrency):
+        durations, statuses = [], []
+        pending = iter(requests)
+
+        async def worker():
+            client = AsyncClient()
+            for request in pending:
+                start = time.perf_counter()
+                response = await client.get(*request)
+                durations.append(time.perf_counter() - start)
+                statuses.append(response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return _summary(durations, statuses, time.perf_counter() - start)
+
+
+def _summary(durations, statuses, seconds):
+    durations = [duration * 1000 for duration in durations]
+    return {
+        'requests': len(durations),
+        'errors': sum(status >= 400 for status in statuses),
+        'seconds': _round(seconds),
+        'requests_per_second': _round(len(durations) / seconds),
+        'p50_ms': _round(percentile(durations, 50)),
+        'p99_ms': _round(percentile(durations, 99)),
+    }
@@ -0,0 +1,80 @@
+import json
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from apps.businesses import autocomplete
+from apps.businesses.models import Business
+from apps.common.metrics import percentile
+from .benchmark_api import _round
+
+
+class Command(BaseCommand):
+    help = (
+        "Time autocomplete lookups served from the in-process prefix index "
+        "against the same lookups read from the database, and check both "
+        "give the same suggestions. Run it against a database filled by "
+        "generate_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=1000, help="Lookups timed on each path.")
+        parser.add_argument('--limit', type=int, default=8, help="Suggestions of each kind per lookup.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the prefix sampling.")
+        parser.add_argument('--output', help="Write the JSON report to this file too.")
+
+    def handle(self, *args, **options):
+        names = list(Business.public.values_list('name', flat=True))
+        cities = list(Business.public.values_list('city', flat=True))
+        if not names:
+            raise CommandError("No businesses; run generate_data first.")
+
+        # what people type: the first one to four letters of a name or city
+        sampler = random.Random(options['seed'])
+        prefixes = [
+            autocomplete.normalize(text[:sampler.randint(1, 4)])
+            for text in sampler.choices(names + cities, k=options['lookups'])
+        ]
+
+        index = autocomplete.AutocompleteIndex()
+        start = time.perf_counter()
+        index.build()
+        build_seconds = time.perf_counter() - start
+
+        limit = options['limit']
+        index_durations, index_results = self.measure(index.suggest, prefixes, limit)
+        database_durations, database_results = self.measure(
+            autocomplete.suggest_from_database, prefixes, limit
+        )
+
+        report = {
+            'businesses': len(index.names),
+            'cities': len(index.cities),
+            'lookups': len(prefixes),
+            'limit': limit,
+            'build_ms': _round(build_seconds * 1000),
+            'identical': index_results == database_results,
+            'index': self.summarize(index_durations),
+            'database': self.summarize(database_durations),
+        }
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+
+    def measure(self, suggest, prefixes, limit):
+        durations, results = [], []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            results.append(suggest(prefix, limit))
+            durations.append(time.perf_counter() - start)
+        return durations, results
+
+    def summarize(self, durations):
+        microseconds = [duration * 1_000_000 for duration in durations]
+        return {
+            'p50_us': _round(percentile(microseconds, 50)),
+            'p99_us': _round(percentile(microseconds, 99)),
+            'max_us': _round(max(microseconds)),
+        }
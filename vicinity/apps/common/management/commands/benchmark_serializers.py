@@ -0,0 +1,93 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from apps.businesses.models import Business
+from apps.businesses.serializers import BusinessSerializer
+from apps.common.renderers import ORJSONRenderer
+from apps.common.values import get_plan
+from apps.reviews.models import Review
+from apps.reviews.serializers import ReviewSerializer
+from .benchmark_api import NO_CACHE, _round
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the rows per second of the DRF serializers and JSONRenderer "
+        "with the .values() plans and ORJSONRenderer of the fast read path, "
+        "queries included, and check both give the same bytes. Run it against "
+        "a database filled by generate_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help="Rows rendered per run.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs of each path.")
+        parser.add_argument('--output', help="Write the JSON report to this file too.")
+
+    def handle(self, *args, **options):
+        if not Business.public.exists():
+            raise CommandError("No businesses; run generate_data first.")
+
+        # a request for the absolute URLs, as the views have
+        request = Request(APIRequestFactory().get('/'))
+        with override_settings(ALLOWED_HOSTS=['testserver'], CACHES=NO_CACHE):
+            report = {
+                'rows': options['rows'],
+                'repeat': options['repeat'],
+                'models': {
+                    'business': self.compare(
+                        BusinessSerializer, Business.public.order_by('-created_at', '-id'),
+                        request, options,
+                    ),
+                    'review': self.compare(
+                        ReviewSerializer, Review.published.order_by('-created_at', '-id'),
+                        request, options,
+                    ),
+                },
+            }
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+
+    def compare(self, serializer_class, queryset, request, options):
+        queryset = queryset[:options['rows']]
+        context = {'request': request}
+        plan = get_plan(serializer_class)
+
+        def serializer_path():
+            eager = serializer_class(context=context).apply_eager_loading(queryset)
+            data = serializer_class(list(eager), many=True, context=context).data
+            return JSONRenderer().render(data)
+
+        def values_path():
+            rows = list(plan.values(queryset.prefetch_related(None)))
+            return ORJSONRenderer().render(plan.represent(rows, context))
+
+        serializer_content = serializer_path()
+        values_content = values_path()
+        rows = len(json.loads(serializer_content))
+        serializer_seconds = self.measure(serializer_path, options['repeat'])
+        values_seconds = self.measure(values_path, options['repeat'])
+
+        return {
+            'rows': rows,
+            'identical': serializer_content == values_content,
+            'serializer_rows_per_s': _round(rows / serializer_seconds if serializer_seconds else None),
+            'values_rows_per_s': _round(rows / values_seconds if values_seconds else None),
+            'speedup': _round(serializer_seconds / values_seconds if values_seconds else None),
+        }
+
+    def measure(self, path, repeat):
+        """Best time of `repeat` runs, the least disturbed by the rest of the machine."""
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            path()
+            durations.append(time.perf_counter() - start)
+        return min(durations, default=None)
@@ -0,0 +1,222 @@
+import random
+import time
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from apps.accounts.models import User
+from apps.businesses.cache import BUSINESS_LIST_GENERATION
+from apps.businesses.models import Business, BusinessHours, BusinessImage
+from apps.businesses.search import business_search_vector
+from apps.common.cache import bump_generations_on_commit
+from apps.reviews.cache import REVIEW_LIST_GENERATION
+from apps.reviews.models import Review, ReviewImage
+
+# (city, state, latitude, longitude, time zone)
+CITIES = [
+    ('Dublin', 'Leinster', 53.3498, -6.2603, 'Europe/Dublin'),
+    ('Cork', 'Munster', 51.8985, -8.4756, 'Europe/Dublin'),
+    ('Galway', 'Connacht', 53.2707, -9.0568, 'Europe/Dublin'),
+    ('Limerick', 'Munster', 52.6638, -8.6267, 'Europe/Dublin'),
+    ('Belfast', 'Ulster', 54.5973, -5.9301, 'Europe/London'),
+    ('London', 'England', 51.5072, -0.1276, 'Europe/London'),
+    ('New York', 'New York', 40.7128, -74.0060, 'America/New_York'),
+    ('San Francisco', 'California', 37.7749, -122.4194, 'America/Los_Angeles'),
+]
+
+# larger cities get proportionally more businesses
+CITY_WEIGHTS = [30, 10, 6, 5, 8, 25, 30, 12]
+
+ADJECTIVES = [
+    'Golden', 'Blue', 'Corner', 'Harbour', 'Old Town', 'Green', 'Northside', 'Riverside',
+    'Little', 'Royal', 'Urban', 'Village', 'Copper', 'Silver', 'Sunny', 'Hidden',
+]
+NOUNS = {
+    'restaurant': ['Bistro', 'Kitchen', 'Pizzeria', 'Noodle Bar', 'Grill', 'Cafe'],
+    'retail': ['Books', 'Boutique', 'Hardware', 'Florist', 'Records', 'Market'],
+    'service': ['Cleaners', 'Barbers', 'Tailors', 'Repairs', 'Garage'],
+    'entertainment': ['Cinema', 'Comedy Club', 'Arcade', 'Theatre', 'Bowling'],
+    'health': ['Pharmacy', 'Yoga Studio', 'Gym', 'Dental', 'Physio'],
+    'professional': ['Accountants', 'Solicitors', 'Architects', 'Consulting'],
+    'other': ['Studio', 'Collective', 'Workshop', 'Hub'],
+}
+WORDS = (
+    'friendly staff great value quick service cosy atmosphere fresh local '
+    'quality busy quiet modern traditional spacious helpful'
+).split()
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
+WEEKEND = ['saturday', 'sunday']
+
+# degrees of jitter around the city centre, roughly 10km
+SPREAD = 0.09
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic dataset for load testing: users, businesses "
+        "spread over cities, power-law distributed reviews and image rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--businesses', type=int, default=500)
+        parser.add_argument(
+            '--max-reviews',
+            type=int,
+            default=500,
+            help="Cap on the reviews of a single business.",
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.16,
+            help="Pareto shape of the reviews per business; 1.16 is the 80/20 rule.",
+        )
+        parser.add_argument('--images', type=int, default=3, help="Images per business.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = time.perf_counter()
+        # a unique prefix lets datasets be generated into the same database repeatedly
+        prefix = f'synthetic-{options["seed"]}-{int(time.time())}'
+
+        with transaction.atomic():
+            users = self.create_users(rng, prefix, options['users'])
+            businesses = self.create_businesses(rng, users, options['businesses'])
+            self.create_business_images(businesses, options['images'])
+            reviews = self.create_reviews(rng, users, businesses, options)
+            self.create_review_images(rng, reviews)
+
+            # one pass of set-based UPDATEs instead of per row signals
+            business_ids = [business.pk for business in businesses]
+            call_command('rebuild_rating_counters', business_ids=business_ids, stdout=self.stdout)
+            call_command('rebuild_rating_stats', business_ids=business_ids, stdout=self.stdout)
+            bump_generations_on_commit(BUSINESS_LIST_GENERATION, REVIEW_LIST_GENERATION)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(users)} users, {len(businesses)} businesses and "
+            f"{len(reviews)} reviews in {time.perf_counter() - start:.1f}s."
+        ))
+
+    def create_users(self, rng, prefix, count):
+        # hashing is deliberately slow, so every user shares one password
+        password = make_password('synthetic')
+        return User.objects.bulk_create([
+            User(
+                username=f'{prefix}-user-{i}',
+                email=f'{prefix}-user-{i}@example.com',
+                first_name=rng.choice(['Aoife', 'Sean', 'Maria', 'James', 'Priya', 'Tom', 'Li']),
+                last_name=rng.choice(['Murphy', 'Kelly', 'Smith', 'Garcia', 'Chen', 'Walsh']),
+                password=password,
+                user_type='business' if i % 10 == 0 else 'regular',
+            )
+            for i in range(count)
+        ], batch_size=BATCH_SIZE)
+
+    def create_businesses(self, rng, users, count):
+        owners = [user for user in users if user.user_type == 'business'] or users
+        categories = [value for value, _ in Business.CATEGORY_CHOICES]
+
+        businesses = []
+        for i in range(count):
+            city, state, latitude, longitude, zone = rng.choices(CITIES, CITY_WEIGHTS)[0]
+            category = rng.choice(categories)
+            name = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS[category])}'
+            businesses.append(Business(
+                name=name,
+                owner=rng.choice(owners),
+                category=category,
+                description=' '.join(rng.choices(WORDS, k=12)).capitalize() + '.',
+                email=f'business-{i}@example.com',
+                phone=f'01{rng.randrange(10 ** 7):07d}',
+                website=f'https://example.com/business-{i}',
+                address=f'{rng.randrange(1, 200)} Main Street',
+                city=city,
+                state=state,
+                zip_code=f'{rng.randrange(10 ** 5):05d}',
+                latitude=round(latitude + rng.uniform(-SPREAD, SPREAD), 6),
+                longitude=round(longitude + rng.uniform(-SPREAD, SPREAD), 6),
+                hours_of_operation=self.opening_hours(rng, category),
+                timezone=zone,
+                is_verified=rng.random() < 0.3,
+            ))
+        businesses = Business.objects.bulk_create(businesses, batch_size=BATCH_SIZE)
+
+        # bulk_create skips Business.save(), which maintains these
+        Business.objects.filter(pk__in=[business.pk for business in businesses]).update(
+            search_vector=business_search_vector()
+        )
+        BusinessHours.objects.bulk_create([
+            interval for business in businesses for interval in BusinessHours.for_business(business)
+        ], batch_size=BATCH_SIZE)
+        return businesses
+
+    def opening_hours(self, rng, category):
+        if category == 'restaurant':
+            periods = [{'open': '12:00', 'close': rng.choice(['22:00', '23:30', '01:00'])}]
+            return {day: periods for day in WEEKDAYS + WEEKEND}
+        periods = [{'open': rng.choice(['08:00', '09:00', '10:00']), 'close': '17:30'}]
+        hours = {day: periods for day in WEEKDAYS}
+        if rng.random() < 0.5:
+            hours['saturday'] = [{'open': '10:00', 'close': '16:00'}]
+        return hours
+
+    def create_business_images(self, businesses, per_business):
+        BusinessImage.objects.bulk_create([
+            BusinessImage(
+                business=business,
+                image=f'business_images/synthetic/{business.pk}-{index}.jpg',
+                caption=f'Photo {index + 1}',
+                is_primary=(index == 0),
+            )
+            for business in businesses
+            for index in range(per_business)
+        ], batch_size=BATCH_SIZE)
+        Business.objects.filter(pk__in=[business.pk for business in businesses]).update(
+            primary_image=Subquery(
+                BusinessImage.objects.filter(
+                    business=OuterRef('pk'),
+                    is_primary=True,
+                ).values('pk')[:1]
+            )
+        )
+
+    def create_reviews(self, rng, users, businesses, options):
+        reviews = []
+        cap = min(options['max_reviews'], len(users))
+        for business in businesses:
+            # a few businesses collect most of the reviews
+            count = min(cap, int(rng.paretovariate(options['alpha'])) - 1)
+            quality = rng.uniform(2.5, 4.8)
+            for user in rng.sample(users, count):
+                reviews.append(Review(
+                    business=business,
+                    user=user,
+                    rating=max(1, min(5, round(rng.gauss(quality, 1)))),
+                    title=' '.join(rng.choices(WORDS, k=3)).capitalize(),
+                    content=' '.join(rng.choices(WORDS, k=30)).capitalize() + '.',
+                    is_published=rng.random() < 0.97,
+                ))
+        reviews = Review.objects.bulk_create(reviews, batch_size=BATCH_SIZE)
+
+        # auto_now_add ignores given values on insert, so spread the reviews
+        # over the last two years afterwards
+        now = timezone.now()
+        for review in reviews:
+            review.created_at = now - timedelta(days=rng.uniform(0, 730))
+        Review.objects.bulk_update(reviews, ['created_at'], batch_size=BATCH_SIZE)
+        return reviews
+
+    def create_review_images(self, rng, reviews):
+        ReviewImage.objects.bulk_create([
+            ReviewImage(review=review, image=f'review_images/synthetic/{review.pk}.jpg')
+            for review in reviews
+            if rng.random() < 0.1
+        ], batch_size=BATCH_SIZE)
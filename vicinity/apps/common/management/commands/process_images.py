@@ -0,0 +1,41 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import models
+from apps.common.images import process_image_field
+
+
+class Command(BaseCommand):
+    help = (
+        "Process every uploaded image that has no renditions yet, e.g. "
+        "files added through the admin or before processing existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Reprocess images that already have renditions.",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, field_name in self.get_image_fields():
+            queryset = model._default_manager.exclude(**{field_name: ''}).exclude(
+                **{f'{field_name}__isnull': True}
+            )
+            if not options['all']:
+                queryset = queryset.filter(**{f'{field_name}_renditions': {}})
+
+            for pk in queryset.values_list('pk', flat=True).iterator():
+                process_image_field(model._meta.label, pk, field_name)
+                total += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} images."))
+
+    def get_image_fields(self):
+        """Yield (model, field name) for image fields that store renditions."""
+        for model in apps.get_models():
+            field_names = {field.name for field in model._meta.fields}
+            for field in model._meta.fields:
+                if isinstance(field, models.ImageField) and f'{field.name}_renditions' in field_names:
+                    yield model, field.name
@@ -0,0 +1,49 @@
+import json
+from django.core.management.base import BaseCommand
+from apps.common import metrics
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the per-endpoint request metrics recorded by "
+        "RequestMetricsMiddleware, merged across every process sharing the cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help="Print the summary as JSON.")
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help="Forget the recorded metrics after printing them.",
+        )
+
+    def handle(self, *args, **options):
+        summary = metrics.summarize()
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+        elif not summary:
+            self.stdout.write("No requests recorded.")
+        else:
+            self.write_table(summary)
+
+        if options['reset']:
+            metrics.reset()
+
+    def write_table(self, summary):
+        columns = [
+            ('wall_ms', 'p50'), ('wall_ms', 'p90'), ('wall_ms', 'p99'),
+            ('queries', 'mean'), ('db_ms', 'p50'), ('db_ms', 'p99'),
+            ('serialize_ms', 'p50'), ('response_bytes', 'p50'),
+        ]
+        width = max(len(endpoint) for endpoint in summary)
+        header = ['endpoint'.ljust(width), 'count'.rjust(7)] + [
+            f'{name.rsplit("_", 1)[0]} {stat}'.rjust(14) for name, stat in columns
+        ]
+        self.stdout.write('  '.join(header))
+        for endpoint, stats in summary.items():
+            row = [endpoint.ljust(width), str(stats['count']).rjust(7)]
+            for name, stat in columns:
+                value = stats[name][stat]
+                row.append(('-' if value is None else f'{value:.1f}').rjust(14))
+            self.stdout.write('  '.join(row))
@@ -0,0 +1,271 @@
+import bisect
+import contextvars
+import math
+import os
+import socket
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.core.cache import cache
+
+METRICS_KEY_PREFIX = 'vicinity:metrics:'
+PROCESSES_KEY = f'{METRICS_KEY_PREFIX}processes'
+PROCESSES_LOCK_KEY = f'{METRICS_KEY_PREFIX}processes:lock'
+
+# a snapshot outlives its flush by this many flush intervals, after which
+# the process counts as gone and is dropped from the merged metrics
+SNAPSHOT_TTL_INTERVALS = 6
+
+# longest a process may hold the lock on the list of processes, in seconds
+PROCESSES_LOCK_TIMEOUT = 5
+
+# upper bounds of the histogram buckets of each metric
+BUCKETS = {
+    'wall_ms': (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+    'db_ms': (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+    'serialize_ms': (1, 5, 10, 25, 50, 100, 250, 500, 1000),
+    'queries': (1, 2, 3, 5, 10, 20, 50, 100),
+    'response_bytes': (256, 1024, 4096, 16384, 65536, 262144, 1048576),
+}
+
+PERCENTILES = (50, 90, 99)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Measurements of a single request, collected by
+    apps.common.middleware.RequestMetricsMiddleware.
+    """
+
+    def __init__(self):
+        self.endpoint = None
+        self.queries = []
+        self.serialize_seconds = 0.0
+        self._serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # installed as a database execute wrapper
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def db_seconds(self):
+        return sum(duration for _, duration in self.queries)
+
+    def time_serialization(self, function, *args):
+        """Call `function`, counting its duration as serialization time once."""
+        if self._serializing:
+            return function(*args)
+
+        self._serializing = True
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.serialize_seconds += time.perf_counter() - start
+            self._serializing = False
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper of every connection (see
+    apps.common.signals), timing queries into the metrics of the current
+    request. The context variable follows requests into the threads
+    sync_to_async runs their queries in.
+    """
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    return request_metrics(execute, sql, params, many, context)
+
+
+def current_metrics():
+    """Return the RequestMetrics of the request being handled, if any."""
+    return _current.get()
+
+
+def activate(metrics):
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+class Histogram:
+    """
+    Cumulative bucket counts, as exported to Prometheus, plus a rolling
+    window of recent samples for percentiles.
+    """
+
+    def __init__(self, bounds, window):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.recent.append(value)
+
+    def to_dict(self):
+        return {'counts': list(self.counts), 'sum': self.total, 'recent': list(self.recent)}
+
+
+class MetricsRegistry:
+    """
+    Per-process metrics of each endpoint. Snapshots are flushed to the
+    cache every REQUEST_METRICS_FLUSH_INTERVAL seconds, so reports can
+    merge all processes sharing it. They expire SNAPSHOT_TTL_INTERVALS
+    intervals later, so processes that exited, or stayed idle since,
+    drop out of the reports.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.last_flush = time.monotonic()
+        self.key = f'{METRICS_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}'
+
+    def record(self, endpoint, sample):
+        window = settings.REQUEST_METRICS_WINDOW
+        with self.lock:
+            histograms = self.endpoints.get(endpoint)
+            if histograms is None:
+                histograms = self.endpoints[endpoint] = {
+                    name: Histogram(bounds, window) for name, bounds in BUCKETS.items()
+                }
+            for name, value in sample.items():
+                histograms[name].observe(value)
+
+            flush = time.monotonic() - self.last_flush >= settings.REQUEST_METRICS_FLUSH_INTERVAL
+            if flush:
+                self.last_flush = time.monotonic()
+        if flush:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                endpoint: {name: histogram.to_dict() for name, histogram in histograms.items()}
+                for endpoint, histograms in self.endpoints.items()
+            }
+
+    def flush(self):
+        timeout = max(settings.REQUEST_METRICS_FLUSH_INTERVAL, 1) * SNAPSHOT_TTL_INTERVALS
+        cache.set(self.key, self.snapshot(), timeout)
+        if self.key not in (cache.get(PROCESSES_KEY) or []):
+            # or at the next flush, when another process holds the lock
+            update_processes(add=self.key)
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+registry = MetricsRegistry()
+
+
+def update_processes(add=None):
+    """
+    Add the `add` snapshot key to the list of processes and drop the keys
+    whose snapshot expired. The list is rewritten under a lock taken with
+    the atomic cache.add(), so concurrent updates don't lose keys; returns
+    False without waiting when another process holds it.
+    """
+    if not cache.add(PROCESSES_LOCK_KEY, True, PROCESSES_LOCK_TIMEOUT):
+        return False
+    try:
+        processes = cache.get(PROCESSES_KEY) or []
+        live = cache.get_many(processes)
+        processes = [key for key in processes if key in live and key != add]
+        if add is not None:
+            processes.append(add)
+        cache.set(PROCESSES_KEY, processes, None)
+    finally:
+        cache.delete(PROCESSES_LOCK_KEY)
+    return True
+
+
+def collect():
+    """
+    Merge the snapshots of every live process into
+    {endpoint: {metric: {'counts', 'sum', 'recent'}}}.
+    """
+    registry.flush()
+    merged = {}
+    processes = cache.get(PROCESSES_KEY) or []
+    snapshots = cache.get_many(processes)
+    if len(snapshots) < len(processes):
+        update_processes()
+    for snapshot in snapshots.values():
+        for endpoint, metrics in snapshot.items():
+            target = merged.setdefault(endpoint, {})
+            for name, data in metrics.items():
+                merged_data = target.setdefault(
+                    name, {'counts': [0] * len(data['counts']), 'sum': 0.0, 'recent': []}
+                )
+                merged_data['counts'] = [
+                    total + count for total, count in zip(merged_data['counts'], data['counts'])
+                ]
+                merged_data['sum'] += data['sum']
+                merged_data['recent'].extend(data['recent'])
+    return merged
+
+
+def reset():
+    """Forget the metrics of every process."""
+    registry.reset()
+    cache.delete_many((cache.get(PROCESSES_KEY) or []) + [PROCESSES_KEY])
+
+
+def percentile(values, rank):
+    """Nearest-rank percentile of `values`."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(rank / 100 * len(values)) - 1)]
+
+
+def summarize(merged=None):
+    """
+    Per-endpoint summary: request count, mean of every metric and its
+    percentiles over the rolling window.
+    """
+    merged = collect() if merged is None else merged
+    summary = {}
+    for endpoint, metrics in sorted(merged.items()):
+        count = sum(metrics['wall_ms']['counts'])
+        summary[endpoint] = {'count': count}
+        for name, data in metrics.items():
+            summary[endpoint][name] = {
+                'mean': data['sum'] / count if count else None,
+                **{f'p{rank}': percentile(data['recent'], rank) for rank in PERCENTILES},
+            }
+    return summary
+
+
+def render_prometheus(merged=None):
+    """Render the merged metrics in the Prometheus text exposition format."""
+    merged = collect() if merged is None else merged
+    lines = []
+    for name, bounds in BUCKETS.items():
+        metric = f'vicinity_request_{name}'
+        lines.append(f'# TYPE {metric} histogram')
+        for endpoint, metrics in sorted(merged.items()):
+            data = metrics[name]
+            label = endpoint.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(bounds + ('+Inf',), data['counts']):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{endpoint="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{endpoint="{label}"}} {data["sum"]}')
+            lines.append(f'{metric}_count{{endpoint="{label}"}} {cumulative}')
+    return '\n'.join(lines) + '\n'
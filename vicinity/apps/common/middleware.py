@@ -0,0 +1,132 @@
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from . import metrics
+
+slow_request_logger = logging.getLogger('apps.common.slow_requests')
+
+
+class RequestMetricsMiddleware:
+    """
+    Records, per view action, the wall time, database query count and
+    time, serialization time and response size of every request; see
+    apps.common.metrics. Queries are timed by metrics.record_query,
+    installed on every database connection.
+
+    Responses get a Server-Timing header, and requests slower than
+    REQUEST_METRICS_SLOW_MS are logged with their SQL.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.activate(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.record(request, response, request_metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.activate(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.record(request, response, request_metrics, time.perf_counter() - start)
+
+    def record(self, request, response, request_metrics, wall_seconds):
+        # named after the response rather than in process_view, which
+        # would cost async requests a thread switch
+        match = request.resolver_match
+        if match is None:
+            return response
+        request_metrics.endpoint = endpoint_name(request, match.func)
+
+        response_bytes = 0 if response.streaming else len(response.content)
+        metrics.registry.record(request_metrics.endpoint, {
+            'wall_ms': wall_seconds * 1000,
+            'db_ms': request_metrics.db_seconds * 1000,
+            'serialize_ms': request_metrics.serialize_seconds * 1000,
+            'queries': len(request_metrics.queries),
+            'response_bytes': response_bytes,
+        })
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={request_metrics.db_seconds * 1000:.1f};desc="{len(request_metrics.queries)} queries"',
+            f'serialize;dur={request_metrics.serialize_seconds * 1000:.1f}',
+            f'total;dur={wall_seconds * 1000:.1f}',
+        ])
+
+        if wall_seconds * 1000 >= settings.REQUEST_METRICS_SLOW_MS:
+            slow_request_logger.warning(
+                "Slow request %s %s (%s): %.0f ms, %d queries taking %.0f ms\n%s",
+                request.method,
+                request.get_full_path(),
+                request_metrics.endpoint,
+                wall_seconds * 1000,
+                len(request_metrics.queries),
+                request_metrics.db_seconds * 1000,
+                '\n'.join(
+                    f'[{duration * 1000:.1f} ms] {sql}' for sql, duration in request_metrics.queries
+                ),
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses render here, which completes their serialization
+        request_metrics = metrics.current_metrics()
+        if request_metrics is not None:
+            response.render = _timed(request_metrics, response.render)
+        return response
+
+
+class ASGIURLConfMiddleware:
+    """
+    Resolves requests served through ASGI with ASGI_ROOT_URLCONF, whose
+    read endpoints have async views, and the rest with ROOT_URLCONF.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if isinstance(request, ASGIRequest):
+            request.urlconf = settings.ASGI_ROOT_URLCONF
+        return self.get_response(request)
+
+
+def endpoint_name(request, view_func):
+    """'<ViewSet>.<action>' for viewsets, the URL name otherwise."""
+    actions = getattr(view_func, 'actions', None)
+    view_class = getattr(view_func, 'cls', None)
+    if actions and view_class is not None:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{view_class.__name__}.{action}'
+    match = request.resolver_match
+    return match.view_name if match is not None else view_func.__name__
+
+
+def _timed(request_metrics, render):
+    def timed_render():
+        return request_metrics.time_serialization(render)
+    return timed_render
+
@@ -0,0 +1,372 @@
+import hashlib
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from .cache import aget_generations, get_generations
+from .metrics import current_metrics
+from .renderers import CSVRenderer, NDJSONRenderer
+from .routers import ais_pinned, allow_replica_reads, is_pinned, pin_to_primary, replica_reads
+from .values import get_plan
+
+RESPONSE_KEY_PREFIX = 'vicinity:response:'
+
+
+class CachedResponseMixin:
+    """
+    Viewset mixin that caches rendered list and retrieve responses.
+
+    Entries are keyed on the view, its URL kwargs, the normalized query
+    parameters, the negotiated media type and the generations returned by
+    `get_cache_generations`, so bumping one of those generations (see
+    apps.common.cache) invalidates exactly the responses built from it.
+    Entries also record the generations of the objects embedded in them,
+    from `get_embedded_generations`, and are rebuilt once one of those
+    is bumped. Responses carry an ETag and If-None-Match is answered
+    with a 304.
+    """
+    cache_timeout = 60 * 5
+
+    def get_cache_generations(self):
+        """Return the names of the generations this response depends on."""
+        raise NotImplementedError
+
+    def get_embedded_generations(self, data):
+        """
+        Return the names of the generations of the objects embedded in
+        the response `data`, which only become known with the response,
+        or None when they can't be told and the response isn't cached.
+        """
+        return []
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(super().aretrieve, request, *args, **kwargs)
+
+    def is_response_cacheable(self, request):
+        # the browsable API renders per-user forms, so only cache data formats
+        return request.method == 'GET' and request.accepted_renderer.format != 'api'
+
+    def get_response_cache_key(self, request, generations=None):
+        names = self.get_cache_generations()
+        if generations is None:
+            generations = get_generations(names)
+        parts = {
+            'view': f'{self.__class__.__module__}.{self.__class__.__qualname__}',
+            'action': self.action,
+            'kwargs': sorted((key, str(value)) for key, value in self.kwargs.items()),
+            'query': sorted(
+                (key, sorted(values)) for key, values in request.query_params.lists()
+            ),
+            'media_type': request.accepted_media_type,
+            'generations': list(zip(names, generations)),
+        }
+        digest = hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+        return f'{RESPONSE_KEY_PREFIX}{digest}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_response_cacheable(request):
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None and entry.get('embedded'):
+            names, generations = entry['embedded']
+            if get_generations(names) != generations:
+                entry = None
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            names = self.get_embedded_generations(response.data)
+            entry = self.build_cache_entry(request, response, *args, **kwargs)
+            response = entry.pop('response')
+            if names is None:
+                return self.conditional_response(request, response, entry)
+            entry['embedded'] = (names, get_generations(names)) if names else None
+            cache.set(key, entry, self.cache_timeout)
+        else:
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        return self.conditional_response(request, response, entry)
+
+    async def acached_response(self, handler, request, *args, **kwargs):
+        """Async version of `cached_response`, for an async `handler`."""
+        if not self.is_response_cacheable(request):
+            return await handler(request, *args, **kwargs)
+
+        generations = await aget_generations(self.get_cache_generations())
+        key = self.get_response_cache_key(request, generations)
+        entry = await cache.aget(key)
+        if entry is not None and entry.get('embedded'):
+            names, generations = entry['embedded']
+            if await aget_generations(names) != generations:
+                entry = None
+        if entry is None:
+            response = await handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            names = self.get_embedded_generations(response.data)
+            entry = self.build_cache_entry(request, response, *args, **kwargs)
+            response = entry.pop('response')
+            if names is None:
+                return self.conditional_response(request, response, entry)
+            entry['embedded'] = (names, await aget_generations(names)) if names else None
+            await cache.aset(key, entry, self.cache_timeout)
+        else:
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        return self.conditional_response(request, response, entry)
+
+    def build_cache_entry(self, request, response, *args, **kwargs):
+        response = self.finalize_response(request, response, *args, **kwargs)
+        response.render()
+        return {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': quote_etag(
+                hashlib.md5(response.content, usedforsecurity=False).hexdigest()
+            ),
+            # handed back to the caller, not cached
+            'response': response,
+        }
+
+    def conditional_response(self, request, response, entry):
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if entry['etag'] in etags or '*' in etags:
+            response = HttpResponseNotModified()
+        response['ETag'] = entry['etag']
+        return response
+
+
+class SparseFieldsetsViewMixin:
+    """
+    Viewset mixin that passes the comma separated ?fields= and ?expand=
+    query parameters to the serializer on read requests; see
+    apps.common.serializers.SparseFieldsetsMixin.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request.method in SAFE_METHODS:
+            kwargs.setdefault('fields', self.get_query_list(self.fields_query_param))
+            kwargs.setdefault('expand', self.get_query_list(self.expand_query_param))
+        return super().get_serializer(*args, **kwargs)
+
+    def get_query_list(self, param):
+        values = self.request.query_params.getlist(param)
+        return [name.strip() for value in values for name in value.split(',') if name.strip()]
+
+
+class PublicQuerysetMixin:
+    """
+    Viewset mixin that serves read requests from `public_queryset`, the
+    rows anyone may see, and writes from `queryset`, so owners can still
+    edit the rows hidden from the public.
+    """
+    public_queryset = None
+
+    def get_queryset(self):
+        if self.request.method in SAFE_METHODS and self.public_queryset is not None:
+            return self.public_queryset.all()
+        return super().get_queryset()
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin that serves read requests from the database replicas,
+    see apps.common.routers. A client's successful writes keep its reads
+    on the primary for DATABASE_REPLICA_PIN_SECONDS, so it reads its own
+    writes despite the replication lag.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(False):
+            return super().dispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        with replica_reads(False):
+            return await super().adispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # after authentication, which identifies the client
+        if self.reads_from_replicas(request) and not is_pinned(request):
+            allow_replica_reads()
+
+    async def ainitial(self, request, *args, **kwargs):
+        await super().ainitial(request, *args, **kwargs)
+        if self.reads_from_replicas(request) and not await ais_pinned(request):
+            allow_replica_reads()
+
+    def reads_from_replicas(self, request):
+        return bool(settings.DATABASE_REPLICAS) and request.method in SAFE_METHODS
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            pin_to_primary(request)
+        return response
+
+
+class ValuesReadMixin:
+    """
+    Viewset mixin serving `values_actions` from `.values()` rows through
+    the compiled plan of the serializer (see apps.common.values) instead
+    of model and serializer instances, with the same output. Requests
+    the plan can't reproduce, such as ?expand= into nested lists, go
+    through the serializer.
+
+    Object permissions are checked against the row, as a dict.
+    """
+    values_actions = ('list', 'retrieve')
+
+    def get_values_plan(self):
+        if not settings.VALUES_READS or self.action not in self.values_actions:
+            return None
+        fields = expand = ()
+        if hasattr(self, 'get_query_list'):
+            fields = tuple(sorted(set(self.get_query_list(self.fields_query_param))))
+            expand = tuple(sorted(set(self.get_query_list(self.expand_query_param))))
+        return get_plan(self.get_serializer_class(), fields, expand)
+
+    def get_values_queryset(self):
+        # rows are plain values, so the serializer's prefetches don't apply
+        return self.filter_queryset(self.get_queryset()).prefetch_related(None)
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_values_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.get_values_queryset()
+        page_queryset = self.get_values_page_queryset(plan, queryset)
+        if page_queryset is not None:
+            page = self.paginator.set_page(list(page_queryset))
+            return self.get_paginated_response(self.represent_values(plan, page))
+        return Response(self.represent_values(plan, list(plan.values(queryset))))
+
+    async def alist(self, request, *args, **kwargs):
+        plan = self.get_values_plan()
+        if plan is None:
+            return await super().alist(request, *args, **kwargs)
+
+        queryset = self.get_values_queryset()
+        page_queryset = self.get_values_page_queryset(plan, queryset)
+        if page_queryset is not None:
+            page = self.paginator.set_page([row async for row in page_queryset])
+            data = await sync_to_async(self.represent_values)(plan, page)
+            return self.get_paginated_response(data)
+        rows = [row async for row in plan.values(queryset)]
+        return Response(await sync_to_async(self.represent_values)(plan, rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        plan = self.get_values_plan()
+        if plan is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        row = get_object_or_404(plan.values(self.get_values_queryset()), **self.get_values_lookup())
+        self.check_object_permissions(request, row)
+        return Response(self.represent_values(plan, [row])[0])
+
+    async def aretrieve(self, request, *args, **kwargs):
+        plan = self.get_values_plan()
+        if plan is None:
+            return await super().aretrieve(request, *args, **kwargs)
+
+        queryset = plan.values(self.get_values_queryset())
+        try:
+            row = await queryset.aget(**self.get_values_lookup())
+        except (queryset.model.DoesNotExist, TypeError, ValueError):
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        self.check_object_permissions(request, row)
+        return Response((await sync_to_async(self.represent_values)(plan, [row]))[0])
+
+    def get_values_lookup(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+
+    def get_values_page_queryset(self, plan, queryset):
+        """The rows of the requested page, plus one; see KeysetPagination."""
+        if self.paginator is None:
+            return None
+        queryset = self.paginator.get_page_queryset(queryset, self.request, view=self)
+        if queryset is None:
+            return None
+        # the cursors are built from the ordering columns
+        ordering = [name.lstrip('-') for name in self.paginator.ordering]
+        return plan.values(queryset, *ordering)
+
+    def represent_values(self, plan, rows):
+        context = self.get_serializer_context()
+        request_metrics = current_metrics()
+        if request_metrics is None:
+            return plan.represent(rows, context)
+        return request_metrics.time_serialization(plan.represent, rows, context)
+
+
+class ExportMixin:
+    """
+    Viewset mixin adding GET <list>/export/, which streams every row the
+    list filters match as NDJSON (the default, or ?format=ndjson) or CSV
+    (?format=csv).
+
+    Rows are the `export_fields` of a `.values()` queryset read through a
+    server-side cursor, `export_chunk_size` rows per fetch, and encoded as
+    they arrive, so memory use doesn't grow with the export. Under ASGI,
+    with 'export' in the viewset's `async_actions`, the rows stream from
+    an async iterator, which the server consumes chunk by chunk rather
+    than buffering the whole export.
+    """
+    export_fields = ()
+    export_filename = 'export'
+    export_chunk_size = 2000
+
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        renderer = request.accepted_renderer
+        rows = self.get_export_queryset().values(*self.export_fields).iterator(
+            chunk_size=self.export_chunk_size
+        )
+        return self.export_response(renderer, renderer.stream(rows, self.export_fields))
+
+    async def aexport(self, request):
+        renderer = request.accepted_renderer
+        rows = self.get_export_queryset().values(*self.export_fields).aiterator(
+            chunk_size=self.export_chunk_size
+        )
+        return self.export_response(renderer, renderer.astream(rows, self.export_fields))
+
+    def export_response(self, renderer, content):
+        response = StreamingHttpResponse(
+            content, content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{self.export_filename}.{renderer.format}"'
+        )
+        return response
+
+    def get_export_queryset(self):
+        # rows are plain values, so the serializer's prefetches don't apply
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        # the rows are streamed after the view returns: route them now
+        return queryset.using(queryset.db)
@@ -0,0 +1,75 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from .throttling import client_ident
+
+REPLICA_PIN_KEY_PREFIX = 'vicinity:replica-pin:'
+
+# whether the reads of the current request may go to a replica
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to one of the DATABASE_REPLICAS aliases when the code
+    running allowed it with `replica_reads()`, and everything else to the
+    primary. Reads inside a transaction of the primary stay there, so
+    they see its writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            _replica_reads.get()
+            and settings.DATABASE_REPLICAS
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Allow, or forbid, the reads of the block to go to a replica."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def allow_replica_reads():
+    """
+    Let the rest of the current `replica_reads()` block read from the
+    replicas, up to its end.
+    """
+    _replica_reads.set(True)
+
+
+def pin_to_primary(request):
+    """Keep the reads of the request's client on the primary for a while."""
+    cache.set(_pin_key(request), True, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(request):
+    return cache.get(_pin_key(request)) is not None
+
+
+async def ais_pinned(request):
+    return await cache.aget(_pin_key(request)) is not None
+
+
+def _pin_key(request):
+    return f'{REPLICA_PIN_KEY_PREFIX}{client_ident(request)}'
@@ -0,0 +1,136 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import default_storage
+from django.db.models import Prefetch
+from rest_framework import serializers
+from .metrics import current_metrics
+
+
+class EagerLoadingMixin:
+    """
+    Serializer mixin that works out which relations the declared fields
+    read, so views can load them with select_related/prefetch_related
+    instead of issuing queries per row.
+
+    - dotted sources such as 'owner.get_full_name' select the relation
+    - nested serializers select the relation and recurse into it
+    - nested many=True serializers become a Prefetch, whose queryset is
+      in turn eager loaded for the child serializer
+    """
+
+    def apply_eager_loading(self, queryset):
+        """Apply the eager loading of this serializer's fields to `queryset`."""
+        select_related, prefetch_related = self.get_eager_loading()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def get_eager_loading(self):
+        """Return the (select_related, prefetch_related) lookups for the fields."""
+        select_related = []
+        prefetch_related = []
+        model = self.Meta.model
+
+        for field in self.fields.values():
+            if field.write_only or field.source == '*':
+                continue
+
+            if isinstance(field, serializers.ListSerializer):
+                child = field.child
+                queryset = child.Meta.model._default_manager.all()
+                if isinstance(child, EagerLoadingMixin):
+                    queryset = child.apply_eager_loading(queryset)
+                prefetch_related.append(Prefetch(field.source, queryset=queryset))
+                continue
+
+            relation = field.source_attrs[0]
+            if not _is_forward_relation(model, relation):
+                continue
+
+            if isinstance(field, serializers.BaseSerializer):
+                select_related.append(relation)
+                if isinstance(field, EagerLoadingMixin):
+                    nested_select, nested_prefetch = field.get_eager_loading()
+                    select_related.extend(f'{relation}__{lookup}' for lookup in nested_select)
+                    prefetch_related.extend(
+                        _prefixed_prefetch(relation, lookup) for lookup in nested_prefetch
+                    )
+            elif len(field.source_attrs) > 1:
+                select_related.append(relation)
+
+        return list(dict.fromkeys(select_related)), prefetch_related
+
+
+class SparseFieldsetsMixin:
+    """
+    Serializer mixin for client-selected representations.
+
+    - `fields` keeps only the named top-level fields
+    - `expand` swaps compact fields for the heavier serializers declared
+      in `Meta.expandable_fields` as {name: (serializer_class, kwargs)}
+
+    Both are passed as keyword arguments, usually from the ?fields= and
+    ?expand= query parameters by apps.common.mixins.SparseFieldsetsViewMixin.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in set(expand or ()) & set(expandable):
+            serializer_class, options = expandable[name]
+            self.fields[name] = serializer_class(read_only=True, **options)
+
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class TimedSerializerMixin:
+    """
+    Serializer mixin counting to_representation towards the serialization
+    time of the request metrics (see apps.common.middleware). Nested
+    serializers are counted once, as part of their parent.
+    """
+
+    def to_representation(self, instance):
+        request_metrics = current_metrics()
+        if request_metrics is None:
+            return super().to_representation(instance)
+        return request_metrics.time_serialization(super().to_representation, instance)
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    """
+    Image renditions stored as {format: {width: name}}, rendered as
+    {format: {width: url}}.
+    """
+
+    def to_representation(self, renditions):
+        request = self.context.get('request')
+        representation = {}
+        for image_format, names in (renditions or {}).items():
+            representation[image_format] = {}
+            for width, name in names.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                representation[image_format][width] = url
+        return representation
+
+
+def _is_forward_relation(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return field.is_relation and (field.many_to_one or field.one_to_one)
+
+
+def _prefixed_prefetch(relation, lookup):
+    return Prefetch(
+        f'{relation}__{lookup.prefetch_through}',
+        queryset=lookup.queryset,
+        to_attr=lookup.to_attr,
+    )
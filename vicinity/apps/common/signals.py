@@ -0,0 +1,13 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from .metrics import record_query
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """
+    Time the queries of every connection for the request metrics,
+    including those opened by the sync_to_async threads of async views.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -1,3 +1,360 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+from decimal import Decimal
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from apps.businesses.models import Business
+from apps.businesses.tests import create_business
+from apps.reviews.models import Review
+from . import metrics
+from .renderers import ORJSONRenderer
+from .routers import replica_reads
+from .throttling import TokenBucket
 
 # Create your tests here.
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.client = APIClient()
+        create_business(User.objects.create_user('owner'))
+        self.list_url = reverse('businesses:business-list')
+
+    def test_requests_are_recorded_per_action(self):
+        response = self.client.get(self.list_url, format='json')
+
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        summary = metrics.summarize()
+        stats = summary['BusinessViewSet.list']
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['queries']['p50'], 2)
+        self.assertEqual(stats['response_bytes']['p50'], len(response.content))
+        self.assertGreater(stats['serialize_ms']['p50'], 0)
+
+    async def test_async_requests_count_their_queries(self):
+        response = await self.async_client.get(self.list_url)
+        self.assertTrue(iscoroutinefunction(response.asgi_request.resolver_match.func))
+
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        stats = (await sync_to_async(metrics.summarize)())['BusinessViewSet.list']
+        self.assertEqual(stats['queries']['p50'], 2)
+        self.assertGreater(stats['db_ms']['p50'], 0)
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs('apps.common.slow_requests', 'WARNING') as logs:
+            self.client.get(self.list_url, format='json')
+        self.assertIn('BusinessViewSet.list', logs.output[0])
+        self.assertIn('FROM "businesses_business"', logs.output[0])
+
+    def test_prometheus_export_is_staff_only(self):
+        self.client.get(self.list_url, format='json')
+        url = reverse('common:metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_authenticate(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'vicinity_request_wall_ms_count{endpoint="BusinessViewSet.list"} 1',
+            response.content.decode(),
+        )
+
+    def test_command_prints_the_summary(self):
+        self.client.get(self.list_url, format='json')
+        out = io.StringIO()
+        call_command('request_metrics', '--json', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['BusinessViewSet.list']['count'], 1)
+
+
+    def process(self, key):
+        """Another process's registry, which has served one list request."""
+        other = metrics.MetricsRegistry()
+        other.key = key
+        other.record('BusinessViewSet.list', {
+            'wall_ms': 1, 'db_ms': 1, 'serialize_ms': 1, 'queries': 1, 'response_bytes': 1,
+        })
+        return other
+
+    def test_processes_are_merged_until_their_snapshot_expires(self):
+        self.client.get(self.list_url, format='json')
+        first, second = self.process('host:1'), self.process('host:2')
+        first.flush()
+        second.flush()
+        self.assertEqual(metrics.summarize()['BusinessViewSet.list']['count'], 3)
+
+        # the second process exited and its snapshot expired
+        cache.delete(second.key)
+        self.assertEqual(metrics.summarize()['BusinessViewSet.list']['count'], 2)
+        self.assertNotIn(second.key, cache.get(metrics.PROCESSES_KEY))
+        self.assertIn(first.key, cache.get(metrics.PROCESSES_KEY))
+
+    def test_processes_register_once_the_lock_is_free(self):
+        other = self.process('host:1')
+        cache.add(metrics.PROCESSES_LOCK_KEY, True)
+        other.flush()
+        self.assertNotIn(other.key, cache.get(metrics.PROCESSES_KEY) or [])
+
+        cache.delete(metrics.PROCESSES_LOCK_KEY)
+        other.flush()
+        self.assertIn(other.key, cache.get(metrics.PROCESSES_KEY))
+
+
+class BenchmarkTests(TestCase):
+    def test_benchmark_reports_every_endpoint(self):
+        call_command('generate_data', users=20, businesses=10, stdout=io.StringIO())
+        self.assertEqual(Business.objects.count(), 10)
+        self.assertTrue(Review.objects.exists())
+        self.assertFalse(Business.objects.filter(primary_image__isnull=True).exists())
+
+        out = io.StringIO()
+        call_command('benchmark_api', requests=3, warmup=0, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(len(report['endpoints']), 7)
+        for name, result in report['endpoints'].items():
+            self.assertEqual((name, result['requests'], result['errors']), (name, 3, 0))
+            self.assertIsNotNone(result['p99_ms'])
+        # the created reviews were rolled back
+        self.assertFalse(Review.objects.filter(title='Benchmark').exists())
+
+
+class SerializerBenchmarkTests(TestCase):
+    def test_benchmark_compares_both_paths(self):
+        call_command('generate_data', users=20, businesses=10, stdout=io.StringIO())
+
+        out = io.StringIO()
+        call_command('benchmark_serializers', rows=20, repeat=1, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(set(report['models']), {'business', 'review'})
+        for name, result in report['models'].items():
+            self.assertGreater(result['rows'], 0)
+            self.assertTrue(result['identical'], name)
+            self.assertIsNotNone(result['speedup'])
+
+
+class AutocompleteBenchmarkTests(TestCase):
+    def test_benchmark_compares_index_and_database(self):
+        call_command('generate_data', users=20, businesses=10, stdout=io.StringIO())
+
+        out = io.StringIO()
+        call_command('benchmark_autocomplete', lookups=20, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['businesses'], 10)
+        self.assertTrue(report['identical'])
+        self.assertIsNotNone(report['index']['p99_us'])
+        self.assertIsNotNone(report['database']['p99_us'])
+
+
+class ORJSONRendererTests(TestCase):
+    def assertSameAsJSONRenderer(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_output_matches_json_renderer(self):
+        self.assertSameAsJSONRenderer({
+            'name': 'Caf\u00e9 "quoted" \\ \u2028\u2029 \U0001f600 </script>',
+            'rating': Decimal('4.50'),
+            'created_at': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'date': datetime.date(2024, 5, 1),
+            'nested': [{'a': None, 'b': True}, []],
+        })
+
+    def test_floats_match_json_renderer(self):
+        for value in (0.1, 1 / 3, 53.349805, -6.26031, 1e-05, 0.00012, 1e16, 123456789012345680.0, -2.5e-7):
+            self.assertSameAsJSONRenderer({'value': value, 'list': [value]})
+
+    def test_none_renders_empty(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+
+class AsyncBenchmarkTests(TransactionTestCase):
+    # committed data, since the WSGI clients run in their own threads
+    def test_benchmark_compares_wsgi_and_asgi(self):
+        call_command('generate_data', users=20, businesses=10, stdout=io.StringIO())
+
+        out = io.StringIO()
+        call_command('benchmark_asgi', requests=4, concurrency=2, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(len(report['endpoints']), 6)
+        for name, result in report['endpoints'].items():
+            for server in ('wsgi', 'asgi'):
+                self.assertEqual(
+                    (name, server, result[server]['requests'], result[server]['errors']),
+                    (name, server, 4, 0),
+                )
+            self.assertIsNotNone(result['speedup'])
+
+
+@override_settings(THROTTLE_BUCKETS={'read': '10/min', 'write': '2/min'})
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user('owner')
+        self.business = create_business(self.owner)
+        self.list_url = reverse('businesses:business-list')
+        self.detail_url = reverse('businesses:business-detail', args=[self.business.pk])
+
+    def test_requests_past_the_bucket_get_retry_after(self):
+        for _ in range(10):
+            self.assertEqual(self.client.get(self.detail_url).status_code, 200)
+
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, 429)
+        # one token refills every 6 seconds
+        self.assertEqual(response['Retry-After'], '6')
+
+    def test_search_costs_more_than_detail(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get(self.list_url, {'search': 'coffee'}).status_code, 200)
+        self.assertEqual(self.client.get(self.list_url, {'search': 'coffee'}).status_code, 429)
+
+        # the refused search was refunded, so cheaper requests still fit
+        cache.clear()
+        self.client.get(self.list_url, {'search': 'coffee'})
+        for _ in range(5):
+            self.assertEqual(self.client.get(self.detail_url).status_code, 200)
+        self.assertEqual(self.client.get(self.detail_url).status_code, 429)
+
+    def test_buckets_are_per_user(self):
+        other = User.objects.create_user('other')
+        self.client.force_authenticate(self.owner)
+        for _ in range(2):
+            self.client.patch(self.detail_url, {'name': 'Renamed'}, format='json')
+        self.assertEqual(
+            self.client.patch(self.detail_url, {'name': 'Renamed'}, format='json').status_code, 429
+        )
+
+        # reads use a bucket of their own
+        self.assertEqual(self.client.get(self.detail_url).status_code, 200)
+
+        self.client.force_authenticate(other)
+        self.assertEqual(
+            self.client.patch(self.detail_url, {'name': 'Renamed'}, format='json').status_code, 403
+        )
+
+    def test_async_reads_are_throttled(self):
+        for _ in range(10):
+            self.assertEqual(async_to_sync(self.async_client.get)(self.detail_url).status_code, 200)
+
+        response = async_to_sync(self.async_client.get)(self.detail_url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '6')
+
+    def test_token_bucket_refills_over_time(self):
+        bucket = TokenBucket('test', capacity=2, refill_rate=1)
+        self.assertEqual(bucket.consume(2, now=1000), 0)
+        self.assertEqual(bucket.consume(1, now=1000), 1)
+        self.assertEqual(bucket.consume(1, now=1001), 0)
+
+        # idle time doesn't fill the bucket past its capacity
+        self.assertEqual(bucket.consume(2, now=2000), 0)
+        self.assertEqual(bucket.consume(1, now=2000), 1)
+
+    def test_refused_requests_leave_the_bucket_as_they_found_it(self):
+        bucket = TokenBucket('test', capacity=2, refill_rate=1)
+        self.assertEqual(bucket.consume(1, now=1000), 0)
+        taken = cache.get('test')
+        self.assertEqual(bucket.consume(2, now=1000), 1)
+        self.assertEqual(cache.get('test'), taken)
+
+        # nor do requests that moved the counter up to the refill first
+        self.assertEqual(bucket.consume(3, now=2000), 1)
+        self.assertEqual(cache.get('test'), taken)
+        self.assertEqual(bucket.consume(2, now=2000), 0)
+        self.assertEqual(bucket.consume(1, now=2000), 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """A second connection to the test database stands in for a replica."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        default = connections['default'].settings_dict
+        connections.settings['replica'] = dict(default, TEST=dict(default['TEST'], MIRROR='default'))
+        cls.databases = {*cls.databases, 'replica'}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close_pool()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user('writer')
+        self.business = create_business(User.objects.create_user('owner'))
+        self.detail_url = reverse('businesses:business-detail', args=[self.business.pk])
+
+    def queries_per_alias(self, request):
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections['replica']) as replica:
+                response = request()
+        self.assertLess(response.status_code, 400)
+        return len(primary), len(replica)
+
+    def test_reads_go_to_the_replica(self):
+        primary, replica = self.queries_per_alias(lambda: self.client.get(self.detail_url))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_async_reads_go_to_the_replica(self):
+        primary, replica = self.queries_per_alias(
+            lambda: async_to_sync(self.async_client.get)(self.detail_url)
+        )
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_exports_stream_from_the_replica(self):
+        def export():
+            response = self.client.get(reverse('businesses:business-export'), {'format': 'ndjson'})
+            self.assertIn(b'"Test Business"', b''.join(response.streaming_content))
+            return response
+
+        primary, replica = self.queries_per_alias(export)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        self.client.force_authenticate(self.user)
+        primary, replica = self.queries_per_alias(lambda: self.client.post(
+            reverse('reviews:review-list'),
+            {'business': self.business.pk, 'rating': 4, 'title': 'Good', 'content': '...'},
+            format='json',
+        ))
+        self.assertEqual(replica, 0)
+
+        primary, replica = self.queries_per_alias(lambda: self.client.get(reverse('reviews:review-list')))
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        # other clients keep reading from the replica
+        self.client.force_authenticate(None)
+        primary, replica = self.queries_per_alias(lambda: self.client.get(reverse('reviews:review-list')))
+        self.assertEqual(primary, 0)
+
+    def test_reads_in_a_transaction_stay_on_the_primary(self):
+        with replica_reads():
+            self.assertEqual(Business.objects.all().db, 'replica')
+            with transaction.atomic():
+                self.assertEqual(Business.objects.all().db, 'default')
+        self.assertEqual(Business.objects.all().db, 'default')
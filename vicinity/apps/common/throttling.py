@@ -0,0 +1,175 @@
+import math
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+THROTTLE_KEY_PREFIX = 'vicinity:throttle:'
+
+# bucket levels are kept in thousandths of a token, so fractional refills
+# fit an integer counter
+SCALE = 1000
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def client_ident(request):
+    """Identify the client of a request: its user, or else its IP address."""
+    if request.user and request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{BaseThrottle().get_ident(request)}'
+
+
+def parse_rate(rate):
+    """
+    Parse a rate such as '600/min' into (capacity, tokens refilled per
+    second): a bucket holds `capacity` tokens and refills completely
+    over the period.
+    """
+    capacity, period = rate.split('/')
+    return int(capacity), int(capacity) / PERIODS[period]
+
+
+class TokenBucket:
+    """
+    A token bucket stored in one cache counter, updated only with atomic
+    increments so concurrent workers can share it without locks.
+
+    The counter holds the tokens ever taken from the bucket, in units of
+    1/SCALE, and the tokens refilled so far are a function of the clock
+    (`refill_rate` per second since the Unix epoch). Their difference is
+    the bucket's level: a request adds its cost and is refused, and
+    refunded, when that takes the level past `capacity`. Taking tokens
+    from a full bucket first moves the counter up to the refill, so idle
+    time doesn't build up extra capacity.
+
+    The counter expires once the bucket is full again, and a missing
+    counter starts a full bucket. That keeps the counter within a second
+    of the refill, so racing requests that each move it up can only
+    over-charge by that second.
+    """
+
+    def __init__(self, key, capacity, refill_rate):
+        self.key = key
+        self.capacity = capacity * SCALE
+        self.refill_rate = refill_rate * SCALE
+
+    def consume(self, cost, now=None):
+        """
+        Take `cost` tokens. Returns 0 when they were taken, otherwise the
+        seconds until the bucket can pay for them.
+        """
+        refilled = self.refilled(now)
+        cost = int(cost * SCALE)
+        try:
+            taken = cache.incr(self.key, cost)
+        except ValueError:
+            # a new, or expired, bucket starts full
+            cache.add(self.key, refilled, self.timeout(refilled, refilled))
+            try:
+                taken = cache.incr(self.key, cost)
+            except ValueError:
+                return 0  # the cache doesn't keep counters, so don't throttle
+
+        # the checks go by the counter as incr returns it, with whatever
+        # concurrent requests have taken in the meantime
+        shortfall = self.shortfall(taken, refilled, cost)
+        if shortfall:
+            taken = cache.incr(self.key, shortfall)
+
+        wait = self.wait(taken, refilled)
+        if wait:
+            cache.decr(self.key, cost + shortfall)
+        else:
+            cache.touch(self.key, self.timeout(taken, refilled))
+        return wait
+
+    async def aconsume(self, cost, now=None):
+        """Async version of `consume`."""
+        refilled = self.refilled(now)
+        cost = int(cost * SCALE)
+        try:
+            taken = await cache.aincr(self.key, cost)
+        except ValueError:
+            await cache.aadd(self.key, refilled, self.timeout(refilled, refilled))
+            try:
+                taken = await cache.aincr(self.key, cost)
+            except ValueError:
+                return 0
+
+        shortfall = self.shortfall(taken, refilled, cost)
+        if shortfall:
+            taken = await cache.aincr(self.key, shortfall)
+
+        wait = self.wait(taken, refilled)
+        if wait:
+            await cache.adecr(self.key, cost + shortfall)
+        else:
+            await cache.atouch(self.key, self.timeout(taken, refilled))
+        return wait
+
+    def refilled(self, now=None):
+        return int((time.time() if now is None else now) * self.refill_rate)
+
+    def shortfall(self, taken, refilled, cost):
+        # how far the counter lags the refill, beyond a full bucket
+        return max(0, refilled + cost - taken)
+
+    def wait(self, taken, refilled):
+        excess = taken - refilled - self.capacity
+        return excess / self.refill_rate if excess > 0 else 0
+
+    def timeout(self, taken, refilled):
+        # seconds until the bucket is full again
+        return max(1, math.ceil((taken - refilled) / self.refill_rate))
+
+
+class CostThrottle(BaseThrottle):
+    """
+    Charges each request its estimated cost against a token bucket per
+    user, or per client IP for anonymous requests.
+
+    Views map their actions to (bucket, cost) in `throttle_costs`, or
+    override `get_throttle_cost(request)`, and the THROTTLE_BUCKETS
+    setting gives the rate of each bucket, e.g. {'read': '600/min'}.
+    Actions without a cost, or whose bucket has no rate, aren't
+    throttled. Refused requests get a 429 with a Retry-After header.
+    """
+
+    def allow_request(self, request, view):
+        bucket = self.get_bucket(request, view)
+        if bucket is None:
+            return True
+        token_bucket, cost = bucket
+        self.retry_after = token_bucket.consume(cost)
+        return not self.retry_after
+
+    async def aallow_request(self, request, view):
+        """Async version of `allow_request`."""
+        bucket = self.get_bucket(request, view)
+        if bucket is None:
+            return True
+        token_bucket, cost = bucket
+        self.retry_after = await token_bucket.aconsume(cost)
+        return not self.retry_after
+
+    def get_bucket(self, request, view):
+        """Return the (TokenBucket, cost) charged for the request, if any."""
+        if hasattr(view, 'get_throttle_cost'):
+            charge = view.get_throttle_cost(request)
+        else:
+            charge = getattr(view, 'throttle_costs', {}).get(getattr(view, 'action', None))
+        if charge is None:
+            return None
+
+        name, cost = charge
+        rate = settings.THROTTLE_BUCKETS.get(name)
+        if rate is None:
+            return None
+
+        capacity, refill_rate = parse_rate(rate)
+        key = f'{THROTTLE_KEY_PREFIX}{name}:{client_ident(request)}'
+        return TokenBucket(key, capacity, refill_rate), cost
+
+    def wait(self):
+        return math.ceil(self.retry_after)
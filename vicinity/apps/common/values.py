@@ -0,0 +1,253 @@
+import functools
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+from .serializers import RenditionsField, SparseFieldsetsMixin
+
+
+class UnsupportedField(Exception):
+    """A serializer field the values plans can't reproduce."""
+
+
+class ValuesPlan:
+    """
+    Read-only equivalent of a ModelSerializer over `.values()` rows.
+
+    Each field of the serializer is compiled, once, into a plan field
+    that names the columns it reads and rebuilds the field's
+    representation from them, so a list is rendered without model or
+    serializer instances per row and with the same output. Plan fields
+    are stateless; `bind` hands back a getter for a given page of rows,
+    after loading what the page needs (nested lists, cards) in one go.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.lookups = list(dict.fromkeys(
+            lookup for _, field in fields for lookup in field.lookups
+        ))
+
+    def values(self, queryset, *extra):
+        """`queryset` as rows holding the columns of the plan and `extra` ones."""
+        return queryset.values(*dict.fromkeys([*self.lookups, *extra]))
+
+    def represent(self, rows, context):
+        getters = self.bind(rows, context)
+        return [{name: get(row) for name, get in getters} for row in rows]
+
+    def bind(self, rows, context):
+        return [(name, field.bind(rows, context)) for name, field in self.fields]
+
+
+class Column:
+    """A field read from one column, through `convert` unless it's None."""
+
+    def __init__(self, lookup, convert=None):
+        self.lookup = lookup
+        self.lookups = [lookup]
+        self.convert = convert
+
+    def bind(self, rows, context):
+        lookup, convert = self.lookup, self.convert
+        if convert is None:
+            return lambda row: row[lookup]
+        return lambda row: None if (value := row[lookup]) is None else convert(value)
+
+
+class FileColumn(Column):
+    """A FileField or ImageField, as the absolute URL of the file."""
+
+    def __init__(self, lookup, storage):
+        super().__init__(lookup)
+        self.storage = storage
+
+    def bind(self, rows, context):
+        lookup, url = self.lookup, self.storage.url
+        absolute = _absolute_uri(context)
+        return lambda row: absolute(url(name)) if (name := row[lookup]) else None
+
+
+class RenditionsColumn(Column):
+    """See apps.common.serializers.RenditionsField."""
+
+    def bind(self, rows, context):
+        lookup, url = self.lookup, default_storage.url
+        absolute = _absolute_uri(context)
+
+        def get(row):
+            return {
+                image_format: {width: absolute(url(name)) for width, name in names.items()}
+                for image_format, names in (row[lookup] or {}).items()
+            }
+        return get
+
+
+class FullName:
+    """User.get_full_name() of the user in the `relation` foreign key."""
+
+    def __init__(self, relation):
+        self.first = f'{relation}__first_name'
+        self.last = f'{relation}__last_name'
+        self.lookups = [self.first, self.last]
+
+    def bind(self, rows, context):
+        first, last = self.first, self.last
+        return lambda row: f'{row[first]} {row[last]}'.strip()
+
+
+class NestedOne:
+    """A nested serializer of a single related object, read through a join."""
+
+    def __init__(self, key, plan):
+        self.key = key
+        self.plan = plan
+        self.lookups = [key, *plan.lookups]
+
+    def bind(self, rows, context):
+        key = self.key
+        getters = self.plan.bind(rows, context)
+        return lambda row: None if row[key] is None else {name: get(row) for name, get in getters}
+
+
+class NestedMany:
+    """
+    A nested many=True serializer of a reverse foreign key, loaded for a
+    whole page with one query and grouped by parent in Python.
+    """
+
+    def __init__(self, key, model, foreign_key, plan):
+        self.key = key
+        self.lookups = [key]
+        self.model = model
+        self.foreign_key = foreign_key
+        self.plan = plan
+
+    def bind(self, rows, context):
+        parent_ids = {row[self.key] for row in rows}
+        children = []
+        if parent_ids:
+            # the default manager's ordering, as the serializer's prefetch
+            children = list(self.plan.values(
+                self.model._default_manager.filter(**{f'{self.foreign_key}__in': parent_ids}),
+                self.foreign_key,
+            ))
+
+        grouped = {}
+        for child, data in zip(children, self.plan.represent(children, context)):
+            grouped.setdefault(child[self.foreign_key], []).append(data)
+
+        key = self.key
+        return lambda row: grouped.get(row[key], [])
+
+
+def compile_plan(serializer, prefix=''):
+    """
+    Compile the fields of a ModelSerializer instance into a ValuesPlan,
+    reading the columns of the model under `prefix`. Raises
+    UnsupportedField when a field can't be reproduced from values.
+
+    Serializers can give plan fields of their own for fields the
+    generic rules don't cover in `Meta.values_fields`, as
+    {field name: plan field}.
+    """
+    model = serializer.Meta.model
+    custom = getattr(serializer.Meta, 'values_fields', {})
+    fields = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        # not when ?expand= swapped the field for a serializer
+        if name in custom and not isinstance(field, serializers.BaseSerializer):
+            if prefix:
+                raise UnsupportedField(name)
+            fields.append((name, custom[name]))
+            continue
+        fields.append((name, _compile_field(model, field, prefix)))
+    return ValuesPlan(fields)
+
+
+@functools.lru_cache(maxsize=128)
+def get_plan(serializer_class, fields=(), expand=()):
+    """
+    The plan of `serializer_class` with the given sparse fieldset, built
+    once per process, or None when the serializer can't be planned.
+    """
+    kwargs = {}
+    if issubclass(serializer_class, SparseFieldsetsMixin):
+        kwargs = {'fields': list(fields), 'expand': list(expand)}
+    serializer = serializer_class(**kwargs)
+    try:
+        return compile_plan(serializer)
+    except UnsupportedField:
+        return None
+
+
+def _compile_field(model, field, prefix):
+    if field.source == '*' or len(field.source_attrs) > 1:
+        raise UnsupportedField(field.field_name)
+    source = field.source
+    model_field = _model_field(model, source)
+
+    if isinstance(field, serializers.ListSerializer):
+        if model_field is None or not model_field.one_to_many or prefix:
+            raise UnsupportedField(field.field_name)
+        return NestedMany(
+            model._meta.pk.name,
+            model_field.related_model,
+            model_field.field.attname,
+            compile_plan(field.child),
+        )
+
+    if isinstance(field, serializers.ModelSerializer):
+        # forward foreign keys and one-to-ones either way
+        if model_field is None or not (model_field.many_to_one or model_field.one_to_one):
+            raise UnsupportedField(field.field_name)
+        key = f'{prefix}{source}__{model_field.related_model._meta.pk.name}'
+        return NestedOne(key, compile_plan(field, prefix=f'{prefix}{source}__'))
+
+    lookup = f'{prefix}{source}'
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        if field.pk_field is not None or model_field is None or not model_field.many_to_one:
+            raise UnsupportedField(field.field_name)
+        return Column(lookup)
+    if isinstance(field, serializers.FileField):
+        if model_field is None or not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            raise UnsupportedField(field.field_name)
+        return FileColumn(lookup, model_field.storage)
+    if isinstance(field, RenditionsField):
+        return RenditionsColumn(lookup)
+    if type(field) in IDENTITY_FIELDS:
+        return Column(lookup)
+    if type(field) in CONVERTED_FIELDS:
+        return Column(lookup, field.to_representation)
+    raise UnsupportedField(field.field_name)
+
+
+# fields whose representation of a database value is the value itself
+IDENTITY_FIELDS = {
+    serializers.BooleanField, serializers.CharField, serializers.EmailField,
+    serializers.IntegerField, serializers.JSONField, serializers.ReadOnlyField,
+    serializers.SlugField, serializers.URLField,
+}
+
+# fields whose to_representation doesn't depend on the serializer context
+CONVERTED_FIELDS = {
+    serializers.ChoiceField, serializers.DateField, serializers.DateTimeField,
+    serializers.DecimalField, serializers.FloatField, serializers.TimeField,
+    serializers.UUIDField,
+}
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None  # an annotation
+
+
+def _absolute_uri(context):
+    request = context.get('request')
+    if request is None:
+        return lambda url: url
+    return request.build_absolute_uri
@@ -1,3 +1,18 @@
-from django.shortcuts import render
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+from . import metrics
 
-# Create your views here.
+
+class MetricsView(APIView):
+    """
+    Request metrics of every endpoint in the Prometheus text format,
+    for staff only.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(
+            metrics.render_prometheus(),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
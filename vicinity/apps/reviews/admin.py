@@ -1,4 +1,5 @@
 from django.contrib import admin
+from apps.common.admin import LargeTableAdmin
 from .models import Review, ReviewImage
 
 # Register your models here.
@@ -8,9 +9,11 @@ class ReviewImageInline(admin.TabularInline):
     extra = 1
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(LargeTableAdmin):
     list_display = ('business', 'user', 'rating', 'created_at', 'is_published')
     list_filter = ('rating', 'is_published', 'created_at')
+    list_select_related = ('business', 'user')
+    autocomplete_fields = ('business', 'user')
     search_fields = ('business__name', 'user__username', 'content')
     readonly_fields = ('created_at', 'updated_at')
     inlines = [ReviewImageInline]
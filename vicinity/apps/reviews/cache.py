@@ -0,0 +1,9 @@
+from apps.common.cache import bump_generations_on_commit
+
+# generation shared by review responses not scoped to one business
+REVIEW_LIST_GENERATION = 'reviews'
+
+
+def invalidate_reviews():
+    """Drop cached review responses that aren't scoped to a business."""
+    bump_generations_on_commit(REVIEW_LIST_GENERATION)
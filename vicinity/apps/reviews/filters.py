@@ -0,0 +1,14 @@
+from django_filters import rest_framework as django_filters
+from .models import Review
+
+
+class ReviewFilterSet(django_filters.FilterSet):
+    """
+    Field filters of the review list. ?business= filters on the id
+    column, rather than loading the business to validate it first.
+    """
+    business = django_filters.NumberFilter(field_name='business_id')
+
+    class Meta:
+        model = Review
+        fields = ['business', 'rating', 'is_published']
@@ -0,0 +1,110 @@
+from django.core.management import call_command
+from django.db import transaction
+from apps.accounts.models import User
+from apps.businesses.models import Business
+from apps.common.importing import ImportCommand
+from apps.reviews.cache import invalidate_reviews
+from apps.reviews.models import Review
+from apps.reviews.serializers import ReviewImportSerializer
+
+# columns a re-imported review takes from its rows, when they have them
+UPDATE_FIELDS = ['rating', 'title', 'content', 'is_published']
+
+
+class Command(ImportCommand):
+    help = (
+        "Import reviews from a CSV or NDJSON file. A user's existing review "
+        "of a business is updated in place; the rating counters of the "
+        "businesses involved are rebuilt once, at the end."
+    )
+
+    def validate_batch(self, batch):
+        valid, errors = self.validate_rows(ReviewImportSerializer(), batch)
+
+        # one query per kind of reference for the whole batch
+        businesses = _lookup(
+            Business.objects, valid, pk='business', external_id='business_external_id'
+        )
+        users = _lookup(User.objects, valid, pk='user', username='username')
+
+        items = {}
+        for number, data in valid.items():
+            business_id = _resolve(businesses, data, 'business', 'business_external_id')
+            user_id = _resolve(users, data, 'user', 'username')
+            if business_id is None:
+                errors[number] = {'business': ["No such business."]}
+            elif user_id is None:
+                errors[number] = {'user': ["No such user."]}
+            else:
+                item = {
+                    key: value for key, value in data.items()
+                    if key not in ('business', 'business_external_id', 'user', 'username')
+                }
+                # a later row for the same review updates the earlier one,
+                # as it would in a later batch
+                _, (_, previous) = items.pop((user_id, business_id), (None, ((), {})))
+                item = dict(previous, **item, business_id=business_id, user_id=user_id)
+                # an update only takes the columns of the rows, not the
+                # model defaults of the others
+                given = tuple(field for field in UPDATE_FIELDS if field in item)
+                items[(user_id, business_id)] = (number, (given, item))
+        return list(items.values()), errors
+
+    def save_batch(self, items):
+        groups = {}
+        for given, item in items:
+            groups.setdefault(given, []).append(item)
+
+        dated = []
+        for given, group in groups.items():
+            reviews = Review.objects.bulk_create(
+                [Review(**item) for item in group],
+                update_conflicts=True,
+                unique_fields=['user', 'business'],
+                update_fields=[*given, 'updated_at'],
+            )
+            # auto_now_add overrides given creation times on insert
+            for review, item in zip(reviews, group):
+                if 'created_at' in item:
+                    review.created_at = item['created_at']
+                    dated.append(review)
+        Review.objects.bulk_update(dated, ['created_at'])
+
+        # bulk_create skips Review.save(), so the counters and stats are rebuilt in finish()
+        self.context['business_ids'] = sorted(
+            set(self.context.get('business_ids', []))
+            | {item['business_id'] for _, item in items}
+        )
+
+    def finish(self, context):
+        business_ids = context.get('business_ids')
+        if not business_ids:
+            return
+
+        # which also drops the cached responses of the businesses
+        call_command('rebuild_rating_counters', business_ids=business_ids, stdout=self.stdout)
+        call_command('rebuild_rating_stats', business_ids=business_ids, stdout=self.stdout)
+        with transaction.atomic():
+            invalidate_reviews()
+
+
+def _lookup(manager, rows, **fields):
+    """
+    Map (column, value) pairs found in `rows` to the primary key of the
+    matching object, for `fields` given as {model field: column}, with
+    one query per field.
+    """
+    found = {}
+    for field, column in fields.items():
+        values = {data[column] for data in rows.values() if column in data}
+        if values:
+            for value, pk in manager.filter(**{f'{field}__in': values}).values_list(field, 'pk'):
+                found[(column, value)] = pk
+    return found
+
+
+def _resolve(found, data, *columns):
+    for column in columns:
+        if column in data:
+            return found.get((column, data[column]))
+    return None
@@ -0,0 +1,78 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+from apps.businesses.cache import (
+    BUSINESS_LIST_GENERATION, BUSINESS_RATING_LIST_GENERATION, invalidate_businesses,
+)
+from apps.businesses.discovery import discovery_score, review_volume
+from apps.businesses.models import Business
+from apps.common.cache import bump_generations_on_commit
+from apps.reviews.models import Review
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute rating_sum, review_count, average_rating and the "
+        "discovery score of every business from its published reviews, "
+        "decaying the review volumes to now. Run it daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            dest='business_ids',
+            help="Only rebuild the given business id (may be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.all()
+        if options['business_ids']:
+            businesses = businesses.filter(pk__in=options['business_ids'])
+
+        published = Review.objects.filter(
+            business=OuterRef('pk'),
+            is_published=True,
+        ).order_by().values('business')
+        now = timezone.now()
+
+        with transaction.atomic():
+            business_ids = list(businesses.values_list('pk', flat=True))
+            # one set-based UPDATE for the counters...
+            updated = businesses.update(
+                rating_sum=Coalesce(
+                    Subquery(published.annotate(total=Sum('rating')).values('total')), 0
+                ),
+                review_count=Coalesce(
+                    Subquery(published.annotate(total=Count('pk')).values('total')), 0
+                ),
+                review_volume=Coalesce(
+                    Subquery(
+                        published.annotate(total=review_volume('created_at', now)).values('total')
+                    ),
+                    0.0,
+                ),
+                volume_at=Value(now),
+            )
+            # ...and one for the averages derived from them
+            businesses.update(
+                average_rating=Coalesce(
+                    Cast(
+                        F('rating_sum') * 1.0 / NullIf(F('review_count'), 0),
+                        models.DecimalField(max_digits=3, decimal_places=2)
+                    ),
+                    Decimal('0.00')
+                ),
+                discovery_score=discovery_score(
+                    F('rating_sum'), F('review_count'), F('review_volume')
+                ),
+            )
+            # cached responses and cards show the counters
+            bump_generations_on_commit(BUSINESS_LIST_GENERATION, BUSINESS_RATING_LIST_GENERATION)
+            invalidate_businesses(business_ids)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating counters for {updated} businesses."))
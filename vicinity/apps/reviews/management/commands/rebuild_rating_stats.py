@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, OuterRef
+from apps.businesses.models import Business, BusinessRatingStats
+from apps.businesses.ratings import (
+    create_missing_rating_stats, rating_average, rating_stats_columns, recent_window_start,
+)
+from apps.reviews.models import Review
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the rating stats (star distribution, last review time and "
+        "recent average) of every business from its published reviews, and "
+        "move the recent window to the last days. Run it daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            dest='business_ids',
+            help="Only rebuild the given business id (may be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.all()
+        stats = BusinessRatingStats.objects.all()
+        if options['business_ids']:
+            businesses = businesses.filter(pk__in=options['business_ids'])
+            stats = stats.filter(pk__in=options['business_ids'])
+
+        since = recent_window_start()
+        published = Review.published.filter(business=OuterRef('pk'))
+
+        with transaction.atomic():
+            created = create_missing_rating_stats(BusinessRatingStats, businesses, since)
+            # one set-based UPDATE for the counters...
+            updated = stats.update(**rating_stats_columns(published, since))
+            # ...and one for the average derived from them
+            stats.update(recent_average=rating_average(F('recent_rating_sum'), F('recent_count')))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rating stats for {updated} businesses ({created} created)."
+        ))
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0012_business_active_city_category_index'),
+        ('reviews', '0003_reviewimage_processing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='review',
+            name='review_business_created_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['business', '-created_at', 'id'], name='review_published_business_idx'),
+        ),
+    ]
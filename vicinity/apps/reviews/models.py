@@ -1,10 +1,17 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
-from apps.businesses.models import Business
+from apps.businesses.models import Business, BusinessRatingStats
 
 # Create your models here.
 
+class PublishedReviewManager(models.Manager):
+    """The reviews shown on the public API: the published ones."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_published=True)
+
+
 class Review(models.Model):
     """
     Model for storing business reviews and ratings
@@ -33,10 +40,23 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = models.Manager()
+    published = PublishedReviewManager()
+
     class Meta:
         verbose_name = 'Review'
         verbose_name_plural = 'Reviews'
         ordering = ['-created_at']
+        # keyset pagination over the list orderings
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='review_created_id_idx'),
+            # the public reviews of a business, newest first
+            models.Index(
+                fields=['business', '-created_at', 'id'],
+                condition=models.Q(is_published=True),
+                name='review_published_business_idx',
+            ),
+        ]
         # ensure unique reviews per user per business
         constraints = [
             models.UniqueConstraint(
@@ -48,22 +68,54 @@ class Review(models.Model):
     def __str__(self):
         return f"Review by {self.user.username} for {self.business.name}."
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_rating_state()
+        return instance
+
+    def _remember_rating_state(self):
+        # keep track of what this review currently contributes to the
+        # business rating counters, so saves only apply the difference
+        self._stored_business_id = self.__dict__.get('business_id')
+        self._stored_contribution = self._rating_contribution()
+
+    def _rating_contribution(self):
+        """Return the (rating, count) this review adds to its business."""
+        if self.__dict__.get('is_published') and self.__dict__.get('rating') is not None:
+            return self.rating, 1
+        return 0, 0
+
     def save(self, *args, **kwargs):
-        # update business average rating
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
+        stored_business_id = getattr(self, '_stored_business_id', None)
+        stored_rating, stored_count = getattr(self, '_stored_contribution', (0, 0))
+        rating, count = self._rating_contribution()
 
-        # recalculate business average rating
-        business = self.business
-        avg_rating = business.reviews.filter(is_published=True).aggregate(
-            models.Avg('rating'))['rating__avg'] or 0
-        business.average_rating = round(avg_rating, 2)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
-        # update review count for new reviews
-        if is_new:
-            business.review_count = business.reviews.filter(is_published=True).count()
+            # update business rating counters with deltas, not a full aggregate
+            removed = stored_rating if stored_count else None
+            added = rating if count else None
+            if stored_business_id == self.business_id:
+                Business.apply_rating_delta(
+                    self.business_id, rating - stored_rating, count - stored_count, self.created_at
+                )
+                BusinessRatingStats.apply_review_delta(
+                    self.business_id, self.created_at, removed=removed, added=added
+                )
+            else:
+                if stored_business_id is not None:
+                    Business.apply_rating_delta(
+                        stored_business_id, -stored_rating, -stored_count, self.created_at
+                    )
+                    BusinessRatingStats.apply_review_delta(
+                        stored_business_id, self.created_at, removed=removed
+                    )
+                Business.apply_rating_delta(self.business_id, rating, count, self.created_at)
+                BusinessRatingStats.apply_review_delta(self.business_id, self.created_at, added=added)
 
-        business.save()
+        self._remember_rating_state()
 
 class ReviewImage(models.Model):
     """
@@ -75,6 +127,11 @@ class ReviewImage(models.Model):
         related_name="images",
     )
     image = models.ImageField(upload_to="review_images/")
+    # filled in off-request by apps.common.images
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_blurhash = models.CharField(max_length=64, blank=True, editable=False)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     caption = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -1,16 +1,53 @@
+from django.db import models, transaction
 from rest_framework import serializers
+from .cache import invalidate_reviews
 from .models import Review, ReviewImage
-from apps.businesses.serializers import BusinessSerializer
+from apps.businesses.cache import invalidate_business_rating
+from apps.businesses.cards import get_business_cards
+from apps.businesses.models import Business, BusinessRatingStats
+from apps.businesses.serializers import BusinessCardColumn, BusinessCardField, BusinessSerializer
+from apps.common.images import process_image_later
+from apps.common.serializers import (
+    EagerLoadingMixin, RenditionsField, SparseFieldsetsMixin, TimedSerializerMixin,
+)
+from apps.common.values import FullName
 
 class ReviewImageSerializer(serializers.ModelSerializer):
+    width = serializers.IntegerField(source='image_width', read_only=True)
+    height = serializers.IntegerField(source='image_height', read_only=True)
+    blurhash = serializers.CharField(source='image_blurhash', read_only=True)
+    renditions = RenditionsField(source='image_renditions')
+
     class Meta:
         model = ReviewImage
-        fields = ['id', 'image', 'caption', 'created_at']
+        fields = [
+            'id', 'image', 'width', 'height', 'blurhash', 'renditions',
+            'caption', 'created_at'
+        ]
+
+class ReviewListSerializer(serializers.ListSerializer):
+    """
+    Loads the business cards of a whole page in one go before the
+    reviews are rendered.
+    """
 
-class ReviewSerializer(serializers.ModelSerializer):
+    def to_representation(self, data):
+        reviews = list(data.all() if isinstance(data, models.Manager) else data)
+        if isinstance(self.child.fields.get('business_details'), BusinessCardField):
+            business_ids = {review.business_id for review in reviews}
+            # async views load the cards before serializing
+            if not business_ids <= self.context.get('business_cards', {}).keys():
+                self.context['business_cards'] = get_business_cards(business_ids)
+        return super().to_representation(reviews)
+
+
+class ReviewSerializer(
+    TimedSerializerMixin, SparseFieldsetsMixin, EagerLoadingMixin, serializers.ModelSerializer
+):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     images = ReviewImageSerializer(many=True, read_only=True)
-    business_details = BusinessSerializer(source='business', read_only=True)
+    # compact by default, ?expand=business_details for the full business
+    business_details = BusinessCardField(source='business_id')
 
     class Meta:
         model = Review
@@ -20,9 +57,20 @@ class ReviewSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at', 'images'
         ]
         read_only_fields = ['user', 'is_edited', 'created_at', 'updated_at']
+        list_serializer_class = ReviewListSerializer
+        expandable_fields = {
+            'business_details': (BusinessSerializer, {'source': 'business'}),
+        }
+        # plan fields of the fast read path, see apps.common.values
+        values_fields = {
+            'user_name': FullName('user'),
+            'business_details': BusinessCardColumn('business_id'),
+        }
 
 class ReviewCreateSerializer(ReviewSerializer):
     """Separate serializer for review creation with image uploads."""
+    # inactive businesses can't be reviewed
+    business = serializers.PrimaryKeyRelatedField(queryset=Business.public.all())
     images = serializers.ListField(
         child=serializers.ImageField(),
         write_only=True,
@@ -31,13 +79,101 @@ class ReviewCreateSerializer(ReviewSerializer):
 
     def create(self, validated_data):
         images_data = validated_data.pop('images', [])
-        review = Review.objects.create(**validated_data)
 
-        # handle image uploads
-        for image_data in images_data:
-            ReviewImage.objects.create(
-                review=review,
-                image=image_data
+        with transaction.atomic():
+            review = Review.objects.create(**validated_data)
+
+            # handle image uploads, all in a single INSERT
+            images = ReviewImage.objects.bulk_create([
+                ReviewImage(review=review, image=image_data)
+                for image_data in images_data
+            ])
+            for image in images:
+                process_image_later(image, 'image')
+
+        return review
+
+
+class ReviewUpsertSerializer(ReviewSerializer):
+    """
+    Creates or edits the review of a user for a business with a single
+    INSERT ... ON CONFLICT statement. Expects `business` and `user` to be
+    passed to save().
+    """
+
+    class Meta(ReviewSerializer.Meta):
+        read_only_fields = ReviewSerializer.Meta.read_only_fields + ['business']
+
+    def create(self, validated_data):
+        business = validated_data['business']
+        user = validated_data['user']
+        validated_data.setdefault('is_published', True)
+
+        with transaction.atomic():
+            # FOR UPDATE on the business blocks concurrent review inserts for
+            # it (their foreign key check takes a KEY SHARE lock), so the
+            # stored review read below can't change before the upsert
+            list(Business.objects.select_for_update().filter(pk=business.pk).values_list('pk'))
+            stored = Review.objects.filter(business=business, user=user).values_list(
+                'rating', 'is_published', 'created_at'
+            ).first()
+
+            review = Review(is_edited=stored is not None, **validated_data)
+            Review.objects.bulk_create(
+                [review],
+                update_conflicts=True,
+                unique_fields=['user', 'business'],
+                update_fields=[
+                    'rating', 'title', 'content', 'is_published', 'is_edited', 'updated_at'
+                ],
             )
 
+            # bulk_create skips Review.save() and its signals
+            stored_rating, stored_count = (0, 0)
+            if stored is not None and stored[1]:
+                stored_rating, stored_count = stored[0], 1
+            rating, count = review._rating_contribution()
+            # an update keeps the created_at of the stored review
+            created_at = stored[2] if stored is not None else review.created_at
+            Business.apply_rating_delta(
+                business.pk, rating - stored_rating, count - stored_count, created_at
+            )
+            BusinessRatingStats.apply_review_delta(
+                business.pk,
+                created_at,
+                removed=stored_rating if stored_count else None,
+                added=rating if count else None,
+            )
+            invalidate_business_rating(business.pk)
+            invalidate_reviews()
+
+        self.created = stored is None
         return review
+
+
+class ReviewImportSerializer(serializers.ModelSerializer):
+    """
+    Validates a row of the import_reviews command. The business is given
+    by `business` (id) or `business_external_id`, the user by `user` (id)
+    or `username`; the command resolves them for the whole batch at once.
+    """
+    business = serializers.IntegerField(required=False)
+    business_external_id = serializers.CharField(required=False)
+    user = serializers.IntegerField(required=False)
+    username = serializers.CharField(required=False)
+    created_at = serializers.DateTimeField(required=False)
+
+    class Meta:
+        model = Review
+        fields = [
+            'business', 'business_external_id', 'user', 'username', 'rating',
+            'title', 'content', 'is_published', 'created_at',
+        ]
+        # user and business conflicts are upserts, not errors
+        validators = []
+
+    def validate(self, attrs):
+        for id_field, key_field in (('business', 'business_external_id'), ('user', 'username')):
+            if (id_field in attrs) == (key_field in attrs):
+                raise serializers.ValidationError(f"Give either {id_field} or {key_field}.")
+        return attrs
@@ -0,0 +1,40 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.businesses.cache import invalidate_business, invalidate_business_rating
+from apps.businesses.models import Business, BusinessRatingStats
+from .cache import invalidate_reviews
+from .models import Review, ReviewImage
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    """
+    Take a deleted review out of its business rating counters and stats.
+
+    Handled as a signal rather than in Review.delete so that queryset
+    deletes and cascades (e.g. from a deleted user) are covered too.
+    """
+    business_id = getattr(instance, '_stored_business_id', instance.business_id)
+    rating, count = getattr(instance, '_stored_contribution', instance._rating_contribution())
+    Business.apply_rating_delta(business_id, -rating, -count, instance.created_at)
+    BusinessRatingStats.apply_review_delta(
+        business_id, instance.created_at, removed=rating if count else None
+    )
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_cache(sender, instance, **kwargs):
+    # reviews change the rating of their business, and possibly moved from another one
+    business_ids = {instance.business_id, getattr(instance, '_stored_business_id', None)}
+    for business_id in business_ids - {None}:
+        invalidate_business_rating(business_id)
+    invalidate_reviews()
+
+
+@receiver(post_save, sender=ReviewImage)
+@receiver(post_delete, sender=ReviewImage)
+def invalidate_review_image_cache(sender, instance, **kwargs):
+    # the review lists of a business are cached under its generation
+    invalidate_business(instance.review.business_id)
+    invalidate_reviews()
@@ -1,3 +1,655 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from apps.businesses.models import Business, BusinessImage, BusinessRatingStats
+from apps.businesses.tests import create_business
+from apps.common.values import get_plan
+from .models import Review, ReviewImage
+from .serializers import ReviewSerializer
 
 # Create your tests here.
+
+
+class ReviewQueryCountTests(TestCase):
+    """
+    The review list nests the user, the review images and a business
+    card per review; all of them must be loaded per page, not per review.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user('owner')
+        self.businesses = []
+        for i in range(3):
+            business = create_business(self.owner, name=f'Business {i}')
+            BusinessImage.objects.create(business=business, image='business_images/a.jpg')
+            self.businesses.append(business)
+        self.user_count = 0
+
+    def create_reviews(self, count):
+        # run the cache invalidation hooks as if the transaction committed
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                self.user_count += 1
+                user = User.objects.create_user(f'reviewer{self.user_count}')
+                review = Review.objects.create(
+                    business=self.businesses[self.user_count % 3],
+                    user=user,
+                    rating=4,
+                    title='Good',
+                    content='Would visit again.',
+                )
+                ReviewImage.objects.create(review=review, image='review_images/a.jpg')
+
+    def assertListQueries(self, expected):
+        with self.assertNumQueries(expected):
+            response = self.client.get(reverse('reviews:review-list'), format='json')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_query_count_is_constant(self):
+        # reviews, review images, then business cards
+        self.create_reviews(1)
+        self.assertListQueries(3)
+
+        self.create_reviews(10)
+        response = self.assertListQueries(3)
+        self.assertEqual(len(response.json()['results']), 11)
+
+
+class ReviewRepresentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        owner = User.objects.create_user('owner')
+        self.business = create_business(owner)
+        BusinessImage.objects.create(business=self.business, image='business_images/a.jpg', is_primary=True)
+        self.review = Review.objects.create(
+            business=self.business,
+            user=User.objects.create_user('reviewer'),
+            rating=4,
+            title='Good',
+            content='Would visit again.',
+        )
+        self.url = reverse('reviews:review-list')
+
+    def test_business_details_is_a_compact_card(self):
+        card = self.client.get(self.url, format='json').json()['results'][0]['business_details']
+        self.assertEqual(card, {
+            'id': self.business.pk,
+            'name': 'Test Business',
+            'city': 'Dublin',
+            'category': 'restaurant',
+            'average_rating': '4.00',
+            'review_count': 1,
+            'primary_image': 'http://testserver/media/business_images/a.jpg',
+        })
+
+    def test_expand_returns_the_full_business(self):
+        response = self.client.get(self.url, {'expand': 'business_details'}, format='json')
+        details = response.json()['results'][0]['business_details']
+        self.assertEqual(details['description'], 'A place to eat.')
+        self.assertEqual(len(details['images']), 1)
+
+    def test_fields_limits_the_representation(self):
+        response = self.client.get(self.url, {'fields': 'id,rating'}, format='json')
+        self.assertEqual(response.json()['results'], [{'id': self.review.pk, 'rating': 4}])
+
+
+class ReviewResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        owner = User.objects.create_user('owner')
+        self.business = create_business(owner)
+        self.other = create_business(owner, name='Other')
+        self.url = reverse('reviews:review-list')
+
+    def create_review(self, business, username):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Review.objects.create(
+                business=business,
+                user=User.objects.create_user(username),
+                rating=5,
+                title='Great',
+                content='Loved it.',
+            )
+
+    def test_new_review_invalidates_its_business_list(self):
+        params = {'business': self.business.pk}
+        self.assertEqual(self.client.get(self.url, params, format='json').json()['results'], [])
+
+        self.create_review(self.business, 'reviewer')
+        results = self.client.get(self.url, params, format='json').json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['business_details']['review_count'], 1)
+
+    def test_other_business_review_keeps_cached_list(self):
+        params = {'business': self.business.pk}
+        self.client.get(self.url, params, format='json')
+
+        self.create_review(self.other, 'reviewer')
+        with self.assertNumQueries(0):
+            self.client.get(self.url, params, format='json')
+
+    def test_business_changes_only_invalidate_lists_embedding_them(self):
+        self.create_review(self.business, 'reviewer')
+        self.client.get(self.url, format='json')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.name = 'Renamed'
+            self.other.save()
+        with self.assertNumQueries(0):
+            self.client.get(self.url, format='json')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.business.name = 'Renamed'
+            self.business.save()
+        results = self.client.get(self.url, format='json').json()['results']
+        self.assertEqual(results[0]['business_details']['name'], 'Renamed')
+
+
+class ReviewAsyncReadTests(TestCase):
+    """
+    Review reads served through ASGI run on the async views; writes on
+    the same routes fall back to the sync ones.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        owner = User.objects.create_user('owner')
+        self.business = create_business(owner)
+        BusinessImage.objects.create(business=self.business, image='business_images/a.jpg', is_primary=True)
+        self.user = User.objects.create_user('reviewer', first_name='Rev')
+        self.review = Review.objects.create(
+            business=self.business,
+            user=self.user,
+            rating=4,
+            title='Good',
+            content='Would visit again.',
+        )
+
+    async def assertSameAsSync(self, url, params=None):
+        response = await self.async_client.get(url, params)
+        self.assertTrue(iscoroutinefunction(response.asgi_request.resolver_match.func))
+
+        await cache.aclear()
+        expected = await sync_to_async(self.client.get)(url, params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    async def test_list_matches_sync_response(self):
+        url = reverse('reviews:review-list')
+        response = await self.assertSameAsSync(url, {'business': self.business.pk})
+        self.assertEqual(response.json()['results'][0]['business_details']['id'], self.business.pk)
+        await self.assertSameAsSync(url, {'expand': 'business_details'})
+
+    async def test_detail_matches_sync_response(self):
+        response = await self.assertSameAsSync(reverse('reviews:review-detail', args=[self.review.pk]))
+        self.assertEqual(response.json()['business_details']['name'], 'Test Business')
+
+    async def test_logged_in_reads_are_authenticated(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('reviews:review-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.asgi_request.user, self.user)
+
+    async def test_writes_fall_back_to_the_sync_views(self):
+        other = await sync_to_async(create_business)(self.business.owner, name='Other')
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            reverse('reviews:review-list'),
+            {'business': other.pk, 'rating': 5, 'title': 'Great', 'content': 'Loved it.'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await Review.objects.filter(business=other, user=self.user).aexists())
+
+
+class ReviewExportTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('owner')
+        self.business, other = create_business(owner), create_business(owner, name='Other')
+        for index, target in enumerate([self.business, self.business, other]):
+            Review.objects.create(
+                business=target,
+                user=User.objects.create_user(f'reviewer{index}'),
+                rating=index + 3,
+                title='Good',
+                content='Would visit again.',
+            )
+        self.url = reverse('reviews:review-export')
+
+    def test_export_streams_the_filtered_reviews(self):
+        response = APIClient().get(self.url, {'business': self.business.pk})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual([row['rating'] for row in rows], [4, 3])
+        self.assertEqual({row['business'] for row in rows}, {self.business.pk})
+
+    async def test_async_export_streams_from_an_async_iterator(self):
+        response = await self.async_client.get(self.url, {'business': self.business.pk})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([json.loads(line)['rating'] for line in content.splitlines()], [4, 3])
+
+
+class ReviewImportTests(TestCase):
+    def test_import_upserts_reviews_and_rebuilds_the_counters(self):
+        business = create_business(User.objects.create_user('owner'), external_id='ext-1')
+        for username in ('alice', 'bob'):
+            User.objects.create_user(username)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f'{directory}/reviews.csv'
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['business_external_id', 'business', 'username', 'rating', 'title', 'content', 'created_at'])
+            writer.writerow(['ext-1', '', 'alice', 5, 'Great', 'Loved it.', '2024-01-01T12:00:00Z'])
+            writer.writerow(['ext-1', '', 'bob', 2, 'Meh', 'Not for me.', ''])
+            writer.writerow(['', business.pk, 'alice', 3, 'Changed', 'Second thoughts.', ''])
+            writer.writerow(['missing', '', 'bob', 4, 'Good', 'Fine.', ''])
+
+        err = io.StringIO()
+        call_command('import_reviews', path, stdout=io.StringIO(), stderr=err)
+        self.assertIn('Row 4: {"business": ["No such business."]}', err.getvalue())
+
+        reviews = dict(Review.objects.values_list('user__username', 'rating'))
+        self.assertEqual(reviews, {'alice': 3, 'bob': 2})
+        business.refresh_from_db()
+        self.assertEqual((business.review_count, business.rating_sum), (2, 5))
+        self.assertEqual(
+            Review.objects.get(user__username='alice').created_at.year, 2024
+        )
+
+    def test_reimports_keep_hidden_reviews_hidden(self):
+        business = create_business(User.objects.create_user('owner'), external_id='ext-1')
+        review = Review.objects.create(
+            business=business, user=User.objects.create_user('alice'),
+            rating=1, title='Rude', content='Rude staff.', is_published=False,
+        )
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f'{directory}/reviews.csv'
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['business_external_id', 'username', 'rating', 'title', 'content'])
+            writer.writerow(['ext-1', 'alice', 2, 'Rude', 'Very rude staff.'])
+        call_command('import_reviews', path, stdout=io.StringIO(), stderr=io.StringIO())
+
+        review.refresh_from_db()
+        self.assertEqual((review.rating, review.is_published), (2, False))
+        business.refresh_from_db()
+        self.assertEqual(business.review_count, 0)
+
+
+class ReviewWriteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.business = create_business(User.objects.create_user('owner'))
+        self.user = User.objects.create_user('reviewer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.my_review_url = reverse('reviews:my-review', args=[self.business.pk])
+
+    def review_data(self, **kwargs):
+        data = {'rating': 4, 'title': 'Good', 'content': 'Would visit again.'}
+        data.update(kwargs)
+        return data
+
+    def test_duplicate_review_is_a_validation_error(self):
+        url = reverse('reviews:review-list')
+        data = self.review_data(business=self.business.pk)
+        self.assertEqual(self.client.post(url, data, format='json').status_code, 201)
+
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), ["You have already reviewed this business."])
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.review_count, 1)
+
+    def test_my_review_creates_then_edits_the_review(self):
+        response = self.client.put(self.my_review_url, self.review_data(), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.json()['is_edited'])
+
+        response = self.client.put(self.my_review_url, self.review_data(rating=2), format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_edited'])
+        self.assertEqual(response.json()['rating'], 2)
+
+        self.assertEqual(Review.objects.filter(business=self.business).count(), 1)
+        self.business.refresh_from_db()
+        self.assertEqual((self.business.review_count, self.business.rating_sum), (1, 2))
+        self.assertEqual(str(self.business.average_rating), '2.00')
+
+    def test_unpublishing_my_review_removes_its_rating(self):
+        self.client.put(self.my_review_url, self.review_data(), format='json')
+        self.client.put(self.my_review_url, self.review_data(is_published=False), format='json')
+
+        self.business.refresh_from_db()
+        self.assertEqual((self.business.review_count, self.business.rating_sum), (0, 0))
+
+
+class ReviewRatingCounterTests(TestCase):
+    """
+    Review writes move the rating counters of their business by deltas,
+    which agree with a rebuild and survive saves of stale businesses.
+    """
+    COUNTER_FIELDS = ('rating_sum', 'review_count', 'average_rating')
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner')
+        self.business = create_business(self.owner)
+        self.other = create_business(self.owner, name='Other')
+        self.users = [User.objects.create_user(f'reviewer{i}') for i in range(3)]
+
+    def counters(self, business):
+        return Business.objects.values_list(*self.COUNTER_FIELDS).get(pk=business.pk)
+
+    def assertCounters(self, business, rating_sum, review_count, average_rating):
+        counters = self.counters(business)
+        self.assertEqual(counters, (rating_sum, review_count, Decimal(average_rating)))
+        call_command(
+            'rebuild_rating_counters', business_ids=[business.pk], stdout=io.StringIO()
+        )
+        self.assertEqual(counters, self.counters(business))
+
+    def review(self, user, rating, **kwargs):
+        return Review.objects.create(
+            business=self.business, user=user, rating=rating, title='Good', content='...', **kwargs
+        )
+
+    def test_create_edit_and_delete(self):
+        first = self.review(self.users[0], 5)
+        second = self.review(self.users[1], 2)
+        self.review(self.users[2], 1, is_published=False)
+        self.assertCounters(self.business, 7, 2, '3.50')
+
+        second.rating = 4
+        second.save()
+        self.assertCounters(self.business, 9, 2, '4.50')
+
+        first.is_published = False
+        first.save()
+        self.assertCounters(self.business, 4, 1, '4.00')
+
+        second.business = self.other
+        second.save()
+        self.assertCounters(self.business, 0, 0, '0.00')
+        self.assertCounters(self.other, 4, 1, '4.00')
+
+        second.delete()
+        self.assertCounters(self.other, 0, 0, '0.00')
+
+    def test_queryset_deletes_are_counted(self):
+        self.review(self.users[0], 5)
+        self.review(self.users[1], 3)
+        Review.objects.filter(user=self.users[0]).delete()
+        self.assertCounters(self.business, 3, 1, '3.00')
+
+    def test_rebuilds_invalidate_the_cached_counters(self):
+        client = APIClient()
+        detail_url = reverse('businesses:business-detail', args=[self.business.pk])
+        reviews_url = reverse('reviews:review-list')
+        # counters drifted by a write that skipped the deltas
+        review = self.review(self.users[0], 5)
+        Review.objects.filter(pk=review.pk).update(rating=1)
+        self.assertEqual(client.get(detail_url).json()['average_rating'], '5.00')
+        self.assertEqual(
+            client.get(reviews_url).json()['results'][0]['business_details']['average_rating'], '5.00'
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_rating_counters', stdout=io.StringIO())
+        self.assertEqual(client.get(detail_url).json()['average_rating'], '1.00')
+        self.assertEqual(
+            client.get(reviews_url).json()['results'][0]['business_details']['average_rating'], '1.00'
+        )
+
+    def test_saving_a_stale_business_keeps_the_counters(self):
+        stale = Business.objects.get(pk=self.business.pk)
+        review = self.review(self.users[0], 5)
+
+        stale.name = 'Renamed'
+        stale.save()
+        self.assertCounters(self.business, 5, 1, '5.00')
+        self.assertEqual(Business.objects.get(pk=self.business.pk).name, 'Renamed')
+
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.patch(
+            reverse('businesses:business-detail', args=[self.business.pk]),
+            {'description': 'Edited.'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertCounters(self.business, 5, 1, '5.00')
+
+        # the delta taking the review out still has something to take
+        review.delete()
+        self.assertCounters(self.business, 0, 0, '0.00')
+
+
+class ReviewRatingStatsTests(TestCase):
+    """
+    The rating stats of a business follow its reviews through deltas and
+    agree with a rebuild from scratch.
+    """
+    STATS_FIELDS = (
+        'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+        'last_review_at', 'recent_count', 'recent_rating_sum', 'recent_average',
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.business = create_business(User.objects.create_user('owner'))
+        self.users = [User.objects.create_user(f'reviewer{i}') for i in range(3)]
+        self.summary_url = reverse('businesses:business-rating-summary', args=[self.business.pk])
+
+    def stats(self):
+        return BusinessRatingStats.objects.values(*self.STATS_FIELDS).get(business=self.business)
+
+    def assertMatchesRebuild(self):
+        stats = self.stats()
+        call_command('rebuild_rating_stats', business_ids=[self.business.pk], stdout=io.StringIO())
+        self.assertEqual(stats, self.stats())
+        return stats
+
+    def review(self, user, rating, **kwargs):
+        return Review.objects.create(
+            business=self.business, user=user, rating=rating, title='Good', content='...', **kwargs
+        )
+
+    def test_stats_follow_review_writes(self):
+        first = self.review(self.users[0], 5)
+        second = self.review(self.users[1], 3)
+        self.review(self.users[2], 4, is_published=False)
+        stats = self.assertMatchesRebuild()
+        self.assertEqual(
+            [stats[f'rating_{stars}'] for stars in range(1, 6)], [0, 0, 1, 0, 1]
+        )
+        self.assertEqual(stats['last_review_at'], second.created_at)
+        self.assertEqual(str(stats['recent_average']), '4.00')
+
+        first.rating = 1
+        first.save()
+        self.assertEqual(self.assertMatchesRebuild()['rating_1'], 1)
+
+        second.is_published = False
+        second.save()
+        stats = self.assertMatchesRebuild()
+        self.assertEqual(stats['last_review_at'], first.created_at)
+
+        first.delete()
+        stats = self.assertMatchesRebuild()
+        self.assertEqual((stats['last_review_at'], stats['recent_average']), (None, None))
+
+    def test_my_review_upserts_move_the_stats(self):
+        self.client.force_authenticate(self.users[0])
+        url = reverse('reviews:my-review', args=[self.business.pk])
+        data = {'rating': 4, 'title': 'Good', 'content': 'Would visit again.'}
+        self.client.put(url, data, format='json')
+        self.client.put(url, dict(data, rating=2), format='json')
+        stats = self.assertMatchesRebuild()
+        self.assertEqual((stats['rating_2'], stats['rating_4'], stats['recent_count']), (1, 0, 1))
+
+    def test_old_reviews_are_left_out_of_the_recent_average(self):
+        old = self.review(self.users[0], 1)
+        # as if written long ago, then counted by a rebuild
+        Review.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=60))
+        call_command('rebuild_rating_stats', stdout=io.StringIO())
+        self.review(self.users[1], 5)
+
+        stats = self.assertMatchesRebuild()
+        self.assertEqual((stats['rating_1'], stats['recent_count']), (1, 1))
+        self.assertEqual(str(stats['recent_average']), '5.00')
+
+    def test_rating_summary_endpoint(self):
+        self.review(self.users[0], 4)
+        response = self.client.get(self.summary_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rating_4'], 1)
+        self.assertEqual(response.json()['recent_average'], '4.00')
+
+        # a new review invalidates the cached summary
+        with self.captureOnCommitCallbacks(execute=True):
+            self.review(self.users[1], 2)
+        self.assertEqual(self.client.get(self.summary_url).json()['rating_2'], 1)
+
+        detail = self.client.get(reverse('businesses:business-detail', args=[self.business.pk]))
+        self.assertEqual(detail.json()['rating_summary'], self.client.get(self.summary_url).json())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.business.is_active = False
+            self.business.save()
+        self.assertEqual(self.client.get(self.summary_url).status_code, 404)
+
+    def test_rebuild_creates_missing_rows(self):
+        self.review(self.users[0], 3)
+        BusinessRatingStats.objects.all().delete()
+        call_command('rebuild_rating_stats', stdout=io.StringIO())
+        self.assertEqual(self.stats()['rating_3'], 1)
+
+
+class ReviewVisibilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user('reviewer')
+        self.business = create_business(User.objects.create_user('owner'))
+        self.hidden = Review.objects.create(
+            business=self.business, user=self.user, rating=1, title='Draft', content='...',
+            is_published=False,
+        )
+        self.shown = Review.objects.create(
+            business=self.business, user=User.objects.create_user('other'), rating=5,
+            title='Great', content='...',
+        )
+
+    def test_unpublished_reviews_are_not_served(self):
+        response = self.client.get(reverse('reviews:review-list'), {'business': self.business.pk})
+        self.assertEqual([review['id'] for review in response.json()['results']], [self.shown.pk])
+        self.assertEqual(
+            self.client.get(reverse('reviews:review-detail', args=[self.hidden.pk])).status_code, 404
+        )
+
+    def test_reviews_of_inactive_businesses_are_not_served(self):
+        self.business.is_active = False
+        self.business.save()
+        response = self.client.get(reverse('reviews:review-list'))
+        self.assertEqual(response.json()['results'], [])
+        self.assertEqual(
+            self.client.get(reverse('reviews:review-detail', args=[self.shown.pk])).status_code, 404
+        )
+
+    def test_authors_can_still_edit_unpublished_reviews(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.patch(
+            reverse('reviews:review-detail', args=[self.hidden.pk]),
+            {'is_published': True},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.client.get(reverse('reviews:review-detail', args=[self.hidden.pk])).status_code, 200
+        )
+
+    def test_business_reviews_use_the_partial_index(self):
+        queryset = Review.published.filter(business=self.business).order_by('-created_at', '-id')
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn('review_published_business_idx', plan)
+
+
+class ReviewValuesReadTests(TestCase):
+    """
+    Lists and details read through the values plans must be byte for
+    byte what the serializers render.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        owner = User.objects.create_user('owner')
+        self.business = create_business(owner)
+        BusinessImage.objects.create(business=self.business, image='business_images/a.jpg', is_primary=True)
+        self.reviews = []
+        for i in range(4):
+            review = Review.objects.create(
+                business=self.business,
+                user=User.objects.create_user(f'reviewer{i}', first_name='Rev' if i % 2 else ''),
+                rating=i + 1,
+                title='Good',
+                content='Would visit again.',
+            )
+            ReviewImage.objects.create(review=review, image='review_images/a.jpg')
+            self.reviews.append(review)
+
+    def assertSameAsSerializers(self, url, params=None):
+        response = self.client.get(url, params, format='json')
+        cache.clear()
+        with override_settings(VALUES_READS=False):
+            expected = self.client.get(url, params, format='json')
+        cache.clear()
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_plan_covers_the_serializer(self):
+        self.assertIsNotNone(get_plan(ReviewSerializer))
+        # the full business nests a list under a relation
+        self.assertIsNone(get_plan(ReviewSerializer, expand=('business_details',)))
+
+    def test_list_matches_the_serializers(self):
+        url = reverse('reviews:review-list')
+        response = self.assertSameAsSerializers(url, {'page_size': 3})
+        self.assertSameAsSerializers(response.json()['next'])
+        self.assertSameAsSerializers(url, {'business': self.business.pk, 'ordering': 'rating'})
+        self.assertSameAsSerializers(url, {'fields': 'id,user_name,business_details'})
+        self.assertSameAsSerializers(url, {'expand': 'business_details'})
+
+    def test_detail_matches_the_serializers(self):
+        response = self.assertSameAsSerializers(reverse('reviews:review-detail', args=[self.reviews[0].pk]))
+        self.assertEqual(response.json()['business_details']['id'], self.business.pk)
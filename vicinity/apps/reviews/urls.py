@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from apps.common.async_views import async_routes
 from . import views
 
 router = DefaultRouter()
@@ -7,6 +8,19 @@ router.register(r'reviews', views.ReviewViewSet)
 
 app_name = 'reviews'
 
+my_review = path(
+    'businesses/<int:business_pk>/my-review/',
+    views.ReviewViewSet.as_view({'put': 'my_review'}),
+    name='my-review',
+)
+
 urlpatterns = [
     path('', include(router.urls)),
+    my_review,
+]
+
+# served under ASGI instead, see config.urls_async
+async_urlpatterns = [
+    path('', include(async_routes(router.urls))),
+    my_review,
 ]
@@ -1,29 +1,96 @@
-from rest_framework import viewsets, permissions, filters
+from django.db import IntegrityError
+from django.shortcuts import get_object_or_404
+from rest_framework import viewsets, permissions, filters, status
 from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from .permissions import IsReviewOwner
+from .filters import ReviewFilterSet
 
 from .models import Review
-from .serializers import ReviewSerializer, ReviewCreateSerializer
+from .serializers import ReviewSerializer, ReviewCreateSerializer, ReviewUpsertSerializer
+from .cache import REVIEW_LIST_GENERATION
+from apps.businesses.cache import business_generation
+from apps.businesses.cards import aget_business_cards
+from apps.businesses.models import Business
+from apps.businesses.serializers import BusinessCardField
+from apps.common.async_views import AsyncReadMixin
+from apps.common.mixins import (
+    CachedResponseMixin, ExportMixin, PublicQuerysetMixin, ReplicaReadMixin,
+    SparseFieldsetsViewMixin, ValuesReadMixin,
+)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(
+    CachedResponseMixin, ReplicaReadMixin, ValuesReadMixin, AsyncReadMixin, ExportMixin,
+    PublicQuerysetMixin, SparseFieldsetsViewMixin, viewsets.ModelViewSet,
+):
     """
     ViewSet for viewing and editing reviews.
     """
     queryset = Review.objects.all()
+    # reviews of deactivated businesses are hidden with their business
+    public_queryset = Review.published.filter(business__is_active=True)
     filter_backends = [
         DjangoFilterBackend,
         filters.OrderingFilter,
     ]
-    filterset_fields = ['business', 'rating', 'is_published']
+    filterset_class = ReviewFilterSet
     ordering_fields = ['created_at', 'rating']
     ordering = ['-created_at']
+    async_actions = ('list', 'retrieve', 'export')
+    export_fields = (
+        'id', 'business', 'user', 'rating', 'title', 'content', 'is_published',
+        'is_edited', 'created_at', 'updated_at',
+    )
+    export_filename = 'reviews'
+    # (bucket, tokens) charged per action, see apps.common.throttling
+    throttle_costs = {
+        'retrieve': ('read', 1),
+        'list': ('read', 2),
+        'export': ('read', 20),
+        'create': ('write', 1),
+        'my_review': ('write', 1),
+        'update': ('write', 1),
+        'partial_update': ('write', 1),
+        'destroy': ('write', 1),
+    }
+
+    def get_queryset(self):
+        # load the relations the serializer reads up front
+        return self.get_serializer().apply_eager_loading(super().get_queryset())
 
     def get_serializer_class(self):
         if self.action == 'create':
             return ReviewCreateSerializer
+        if self.action == 'my_review':
+            return ReviewUpsertSerializer
         return ReviewSerializer
     
+    def get_cache_generations(self):
+        # review lists of a single business only depend on that business
+        business_ids = self.request.query_params.getlist('business')
+        if self.action == 'list' and len(business_ids) == 1 and business_ids[0].isdigit():
+            return [business_generation(business_ids[0])]
+        return [REVIEW_LIST_GENERATION]
+
+    def get_embedded_generations(self, data):
+        if self.action == 'retrieve':
+            reviews = [data]
+        else:
+            reviews = data['results'] if isinstance(data, dict) else data
+        # the embedded business details follow their business
+        return sorted({
+            business_generation(review['business_details']['id'])
+            for review in reviews if review.get('business_details')
+        })
+
+    async def aprepare_serializer(self, serializer, instances):
+        fields = getattr(serializer, 'child', serializer).fields
+        if isinstance(fields.get('business_details'), BusinessCardField):
+            serializer.context['business_cards'] = await aget_business_cards(
+                {review.business_id for review in instances}
+            )
+
     def get_permissions(self):
         """
         Custom permissions:
@@ -33,22 +100,46 @@ class ReviewViewSet(viewsets.ModelViewSet):
         """
         if self.action in ['update', 'partial_update', 'destroy']:
             permission_classes = [permissions.IsAuthenticated, IsReviewOwner]
-        elif self.action == 'create':
+        elif self.action in ['create', 'my_review']:
             permission_classes = [permissions.IsAuthenticated]
         else:
             permission_classes = [permissions.AllowAny]
         return [permission() for permission in permission_classes]
     
     def perform_create(self, serializer):
-        # Check if user already reviewed this business
-        business = serializer.validated_data['business']
-        if Review.objects.filter(user=self.request.user, business=business).exists():
+        # insert first and let the unique constraint catch duplicates,
+        # rather than racing a separate exists() query
+        try:
+            serializer.save(
+                user=self.request.user,
+                is_edited=False
+            )
+        except IntegrityError as exc:
+            if _constraint_name(exc) != 'unique_user_business_review':
+                raise
             raise ValidationError("You have already reviewed this business.")
-        
-        serializer.save(
-            user=self.request.user,
-            is_edited=False
-        )
 
     def perform_update(self, serializer):
         serializer.save(is_edited=True)
+
+    def my_review(self, request, business_pk=None):
+        """
+        Create or replace the caller's review of a business, routed as
+        PUT /api/businesses/{id}/my-review/.
+        """
+        business = get_object_or_404(Business.public, pk=business_pk)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        review = serializer.save(business=business, user=request.user)
+
+        review = self.get_queryset().get(pk=review.pk)
+        return Response(
+            ReviewSerializer(review, context=self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED if serializer.created else status.HTTP_200_OK,
+        )
+
+
+def _constraint_name(exc):
+    # psycopg exposes the violated constraint on the wrapped error
+    diag = getattr(exc.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None)
@@ -41,6 +41,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_filters',
 ]
 
@@ -54,6 +55,8 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'apps.common.middleware.RequestMetricsMiddleware',
+    'apps.common.middleware.ASGIURLConfMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,6 +68,9 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'config.urls'
 
+# requests served through ASGI resolve here, with async read views
+ASGI_ROOT_URLCONF = 'config.urls_async'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -97,10 +103,44 @@ DATABASES = {
         'PORT': os.getenv('DB_PORT'),
         'OPTIONS': {
             'connect_timeout': 5,
+            # a per-process psycopg pool, so requests don't pay for the
+            # TCP and authentication handshake of a new connection
+            'pool': {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+            },
         },
     }
 }
 
+# Read replicas, as a comma separated list of hosts: they serve the read
+# requests of the API viewsets (apps.common.routers), except for clients
+# that wrote in the last DB_REPLICA_PIN_SECONDS, which read their own
+# writes from the primary while the replicas catch up
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['apps.common.routers.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vicinity',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -123,6 +163,41 @@ AUTH_PASSWORD_VALIDATORS = [
 AUTH_USER_MODEL = 'accounts.User'
 
 
+# Django REST framework
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'apps.common.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+    'DEFAULT_THROTTLE_CLASSES': ['apps.common.throttling.CostThrottle'],
+    'DEFAULT_RENDERER_CLASSES': [
+        'apps.common.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Serve list and retrieve actions from .values() rows through compiled
+# serializer plans (apps.common.mixins.ValuesReadMixin); 0 turns it off
+VALUES_READS = os.getenv('VALUES_READS', '1') == '1'
+
+# /api/businesses/autocomplete/ answers from an in-process prefix index
+# (apps.businesses.autocomplete), built by a background thread which patches
+# in the businesses changed by any process every AUTOCOMPLETE_REFRESH_SECONDS
+# and rebuilds it every AUTOCOMPLETE_REBUILD_SECONDS; 0 answers from the
+# database. With AUTOCOMPLETE_REFRESH_SECONDS 0 there is no thread, and the
+# index is only built by calls to its refresh()
+AUTOCOMPLETE_IN_PROCESS = os.getenv('AUTOCOMPLETE_IN_PROCESS', '1') == '1'
+AUTOCOMPLETE_REFRESH_SECONDS = int(os.getenv('AUTOCOMPLETE_REFRESH_SECONDS', 5))
+AUTOCOMPLETE_REBUILD_SECONDS = int(os.getenv('AUTOCOMPLETE_REBUILD_SECONDS', 300))
+
+# Token buckets of apps.common.throttling.CostThrottle, per user or client
+# IP: each holds the given number of tokens and refills over the period.
+# Views charge their actions to a bucket in `throttle_costs`
+THROTTLE_BUCKETS = {
+    'read': os.getenv('THROTTLE_READ_RATE', '600/min'),
+    'write': os.getenv('THROTTLE_WRITE_RATE', '60/min'),
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -140,6 +215,23 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# User uploaded files
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Image processing (renditions, blurhash, EXIF stripping) runs off-request
+# in a pool of 'process' or 'thread' workers, or inline with 'sync'
+IMAGE_PROCESSING_EXECUTOR = os.getenv('IMAGE_PROCESSING_EXECUTOR', 'process')
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 2))
+
+# Request metrics (apps.common.middleware): requests slower than
+# REQUEST_METRICS_SLOW_MS are logged with their SQL, percentiles cover the
+# last REQUEST_METRICS_WINDOW requests of each endpoint and processes share
+# their metrics through the cache every REQUEST_METRICS_FLUSH_INTERVAL seconds
+REQUEST_METRICS_SLOW_MS = int(os.getenv('REQUEST_METRICS_SLOW_MS', 500))
+REQUEST_METRICS_WINDOW = int(os.getenv('REQUEST_METRICS_WINDOW', 1024))
+REQUEST_METRICS_FLUSH_INTERVAL = int(os.getenv('REQUEST_METRICS_FLUSH_INTERVAL', 10))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -1,3 +1,13 @@
+import os
 from .base import *
 
 DEBUG = False
+
+# Shared cache so every worker sees the same response cache generations
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
@@ -7,4 +7,5 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('apps.businesses.urls')),
     path('api/', include('apps.reviews.urls')),
+    path('api/', include('apps.common.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
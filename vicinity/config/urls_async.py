@@ -0,0 +1,19 @@
+"""
+URL configuration of requests served through ASGI (see
+apps.common.middleware.ASGIURLConfMiddleware): the same URLs as
+config.urls, with the read endpoints of businesses and reviews served by
+their async views.
+"""
+from django.contrib import admin
+from django.urls import path, include
+from django.conf import settings
+from django.conf.urls.static import static
+from apps.businesses import urls as business_urls
+from apps.reviews import urls as review_urls
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/', include((business_urls.async_urlpatterns, business_urls.app_name))),
+    path('api/', include((review_urls.async_urlpatterns, review_urls.app_name))),
+    path('api/', include('apps.common.urls')),
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)